@@ -0,0 +1,909 @@
+# Copyright (c) 2022 Sandeep Kanekal
+# Process-wide caches of data which is read far more often than it is written
+import asyncio
+import datetime
+import discord
+import enum
+import os
+import time
+from collections import deque
+from typing import Callable
+from sql_tools import AsyncSQL
+
+DEFAULT_PREFIX = '-'
+
+
+class Feature(enum.IntFlag):
+    # Features which on_message only has to handle in the guilds which use them
+    NONE = 0
+    AFK = enum.auto()
+    TRIGGERS = enum.auto()
+
+
+class GuildFeatures(object):
+
+    def __init__(self) -> None:
+        """
+        Holds a bitmap of the features each guild uses, kept up to date by the caches owning the features.
+        """
+        self._features: dict[int, Feature] = {}
+
+    def get(self, guild_id: int) -> Feature:
+        """
+        Returns the features used by a guild.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+
+        Returns
+        -------
+        Feature
+        """
+        return self._features.get(guild_id, Feature.NONE)
+
+    def set(self, guild_id: int, feature: Feature, enabled: bool) -> None:
+        """
+        Marks a feature as used or unused by a guild.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+        feature : Feature
+            The feature.
+        enabled : bool
+            Whether the guild uses the feature.
+
+        Returns
+        -------
+        None
+        """
+        features = self.get(guild_id) | feature if enabled else self.get(guild_id) & ~feature
+        if features:
+            self._features[guild_id] = features
+        else:
+            self._features.pop(guild_id, None)
+
+    def reset(self, feature: Feature, guild_ids) -> None:
+        """
+        Marks a feature as used by exactly the given guilds.
+
+        Parameters
+        ----------
+        feature : Feature
+            The feature.
+        guild_ids : Iterable[int]
+            The IDs of the guilds using the feature.
+
+        Returns
+        -------
+        None
+        """
+        for guild_id in list(self._features):
+            self.set(guild_id, feature, False)
+        for guild_id in guild_ids:
+            self.set(guild_id, feature, True)
+
+
+guild_features = GuildFeatures()
+
+
+class ModlogEvent(enum.IntFlag):
+    # Categories of events which can be logged, stored as a bitmask in modlogs.events
+    # A new category needs a migration setting its bit in modlogs.events and in the default of the column
+    MEMBERS = enum.auto()
+    MESSAGES = enum.auto()
+    BANS = enum.auto()
+    CHANNELS = enum.auto()
+    ROLES = enum.auto()
+    SERVER = enum.auto()
+    VOICE = enum.auto()
+    THREADS = enum.auto()
+    INVITES = enum.auto()
+    SCHEDULED_EVENTS = enum.auto()
+    ALL = MEMBERS | MESSAGES | BANS | CHANNELS | ROLES | SERVER | VOICE | THREADS | INVITES | SCHEDULED_EVENTS
+
+
+class PrefixCache(object):
+
+    def __init__(self) -> None:
+        """
+        Holds the prefix of every guild. The database remains the source of truth, every write goes to both.
+        """
+        self._prefixes: dict[int, str] = {}
+        self._lock = asyncio.Lock()
+        self.loaded = False
+
+    async def load(self, sql: AsyncSQL) -> None:
+        """
+        Loads the prefixes of all the guilds from the database.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+
+        Returns
+        -------
+        None
+        """
+        self._prefixes = {int(guild_id): prefix for guild_id, prefix in
+                          await sql.select(elements=['guild_id', 'prefix'], table='prefixes')}
+        self.loaded = True
+
+    async def ensure_loaded(self, sql: AsyncSQL) -> None:
+        """
+        Loads the prefixes unless they are loaded already. Concurrent calls wait for a single load.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+
+        Returns
+        -------
+        None
+        """
+        if self.loaded:
+            return
+        async with self._lock:
+            if not self.loaded:  # Otherwise loaded while waiting for the lock
+                await self.load(sql)
+
+    def get(self, guild_id: int) -> str:
+        """
+        Returns the prefix of a guild, the default prefix if the guild has none.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+
+        Returns
+        -------
+        str
+        """
+        return self._prefixes.get(guild_id, DEFAULT_PREFIX)
+
+    async def set(self, sql: AsyncSQL, guild_id: int, prefix: str) -> None:
+        """
+        Sets the prefix of a guild in the database and in the cache.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+        guild_id : int
+            The ID of the guild.
+        prefix : str
+            The new prefix.
+
+        Returns
+        -------
+        None
+        """
+        await sql.upsert(table='prefixes', key_columns=['guild_id'], columns=['guild_id', 'prefix'],
+                         values=[guild_id, prefix])
+        self._prefixes[guild_id] = prefix
+
+    def remove(self, guild_id: int) -> None:
+        """
+        Removes a guild from the cache. The caller deletes its row from the database.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+
+        Returns
+        -------
+        None
+        """
+        self._prefixes.pop(guild_id, None)
+
+
+prefixes = PrefixCache()
+
+
+class GuildConfig(object):
+
+    def __init__(self, modlog_channel_id: int | None = None, modlog_events: ModlogEvent = ModlogEvent.ALL,
+                 member_role_id: int | None = None, bot_role_id: int | None = None, serverjoin: bool = False,
+                 verification: tuple[int, int, int | None, int] | None = None) -> None:
+        """
+        The configuration of a guild.
+
+        Parameters
+        ----------
+        modlog_channel_id : int | None, optional
+            The ID of the modlogs channel, None if modlogs are disabled. The default is None.
+        modlog_events : ModlogEvent, optional
+            The categories of events logged. The default is ModlogEvent.ALL.
+        member_role_id : int | None, optional
+            The ID of the role added to members on joining. The default is None.
+        bot_role_id : int | None, optional
+            The ID of the role added to bots on joining. The default is None.
+        serverjoin : bool, optional
+            Whether the guild has a serverjoin configuration. The default is False.
+        verification : tuple[int, int, int | None, int] | None, optional
+            The message ID, role ID, unverified role ID and channel ID of the verification system, None if it is
+            not set up. The default is None.
+        """
+        self.modlog_channel_id = modlog_channel_id
+        self.modlog_events = modlog_events
+        self.member_role_id = member_role_id
+        self.bot_role_id = bot_role_id
+        self.serverjoin = serverjoin
+        self.verification = verification
+
+    @property
+    def modlogs_enabled(self) -> bool:
+        return self.modlog_channel_id is not None
+
+    def logs(self, event: ModlogEvent) -> bool:
+        # Whether events of this category are logged
+        return self.modlogs_enabled and bool(self.modlog_events & event)
+
+
+class GuildConfigCache(object):
+
+    def __init__(self) -> None:
+        """
+        Holds the modlogs, serverjoin and verification configuration of every guild.
+        Commands which change a configuration write to the database and then refresh the guild.
+        """
+        self._configs: dict[int, GuildConfig] = {}
+
+    @staticmethod
+    def _build(modlogs: list, serverjoin: list, verifications: list) -> dict[int, GuildConfig]:
+        # Builds the configurations from rows whose first column is the guild ID
+        configs: dict[int, GuildConfig] = {}
+        for guild_id, channel_id, events in modlogs:
+            config = configs.setdefault(int(guild_id), GuildConfig())
+            config.modlog_channel_id = int(channel_id)
+            config.modlog_events = ModlogEvent(events) & ModlogEvent.ALL
+        for guild_id, member_role_id, bot_role_id in serverjoin:
+            config = configs.setdefault(int(guild_id), GuildConfig())
+            config.serverjoin = True
+            config.member_role_id = int(member_role_id) if member_role_id is not None else None
+            config.bot_role_id = int(bot_role_id) if bot_role_id is not None else None
+        for guild_id, message_id, role_id, unverified_role_id, channel_id in verifications:
+            configs.setdefault(int(guild_id), GuildConfig()).verification = (
+                int(message_id), int(role_id), int(unverified_role_id) if unverified_role_id is not None else None,
+                int(channel_id)
+            )
+        return configs
+
+    @staticmethod
+    async def _select(sql: AsyncSQL, where: dict = None) -> tuple[list, list, list]:
+        return (
+            await sql.select(elements=['guild_id', 'channel_id', 'events'], table='modlogs', where=where),
+            await sql.select(elements=['guild_id', 'member_role_id', 'bot_role_id'], table='serverjoin', where=where),
+            await sql.select(elements=['guild_id', 'message_id', 'role_id', 'unverified_role_id', 'channel_id'],
+                             table='verifications', where=where),
+        )
+
+    async def load(self, sql: AsyncSQL) -> None:
+        """
+        Loads the configurations of all the guilds from the database.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+
+        Returns
+        -------
+        None
+        """
+        self._configs = self._build(*await self._select(sql))
+
+    async def refresh(self, sql: AsyncSQL, guild_id: int) -> None:
+        """
+        Reloads the configuration of a guild, to be called after it has been changed in the database.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+        guild_id : int
+            The ID of the guild.
+
+        Returns
+        -------
+        None
+        """
+        configs = self._build(*await self._select(sql, {'guild_id': guild_id}))
+        self._configs[guild_id] = configs.get(guild_id, GuildConfig())
+
+    def get(self, guild_id: int) -> GuildConfig:
+        """
+        Returns the configuration of a guild, an empty configuration if the guild has none.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+
+        Returns
+        -------
+        GuildConfig
+        """
+        return self._configs.get(guild_id) or GuildConfig()
+
+    def remove(self, guild_id: int) -> None:
+        """
+        Removes a guild from the cache. The caller deletes its rows from the database.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+
+        Returns
+        -------
+        None
+        """
+        self._configs.pop(guild_id, None)
+
+
+guild_configs = GuildConfigCache()
+
+
+class AfkRegistry(object):
+
+    def __init__(self) -> None:
+        """
+        Holds the AFK members of every guild with their reasons. The database only persists them across restarts.
+        """
+        self._afks: dict[int, dict[int, str]] = {}
+
+    async def load(self, sql: AsyncSQL) -> None:
+        """
+        Loads the AFK members of all the guilds from the database.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+
+        Returns
+        -------
+        None
+        """
+        afks: dict[int, dict[int, str]] = {}
+        for guild_id, member_id, reason in await sql.select(elements=['guild_id', 'member_id', 'reason'],
+                                                            table='afks'):
+            afks.setdefault(int(guild_id), {})[int(member_id)] = reason
+        self._afks = afks
+        guild_features.reset(Feature.AFK, afks)
+
+    def get(self, guild_id: int, member_id: int) -> str | None:
+        """
+        Returns the AFK reason of a member, None if the member is not AFK.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+        member_id : int
+            The ID of the member.
+
+        Returns
+        -------
+        str | None
+        """
+        if afks := self._afks.get(guild_id):
+            return afks.get(member_id)
+        return None
+
+    async def add(self, sql: AsyncSQL, member: discord.Member, reason: str) -> None:
+        """
+        Marks a member as AFK in the database and in the registry.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+        member : discord.Member
+            The member going AFK.
+        reason : str
+            The reason for being AFK.
+
+        Returns
+        -------
+        None
+        """
+        async with sql.transaction() as transaction:
+            where = {'member_id': member.id, 'guild_id': member.guild.id}
+            transaction.delete(table='afks', where=where)
+            transaction.insert(table='afks', columns=['member', 'member_id', 'guild_id', 'reason'],
+                               values=[f'{member.name}#{member.discriminator}', member.id, member.guild.id, reason])
+        self._afks.setdefault(member.guild.id, {})[member.id] = reason
+        guild_features.set(member.guild.id, Feature.AFK, True)
+
+    async def remove(self, sql: AsyncSQL, guild_id: int, member_id: int) -> str | None:
+        """
+        Removes the AFK of a member from the registry and the database.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+        guild_id : int
+            The ID of the guild.
+        member_id : int
+            The ID of the member.
+
+        Returns
+        -------
+        str | None
+            The AFK reason, None if the member was not AFK.
+        """
+        afks = self._afks.get(guild_id)
+        if not afks or member_id not in afks:
+            return None
+        reason = afks.pop(member_id)
+        if not afks:
+            del self._afks[guild_id]
+            guild_features.set(guild_id, Feature.AFK, False)
+        await sql.delete(table='afks', where={'member_id': member_id, 'guild_id': guild_id})
+        return reason
+
+    def remove_guild(self, guild_id: int) -> None:
+        """
+        Removes a guild from the registry. The caller deletes its rows from the database.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+
+        Returns
+        -------
+        None
+        """
+        self._afks.pop(guild_id, None)
+        guild_features.set(guild_id, Feature.AFK, False)
+
+
+afks = AfkRegistry()
+
+
+class Snipe(object):
+
+    def __init__(self, guild_id: int, channel_id: int, author_id: int, content: str, attachments: list[str],
+                 deleted_at: datetime.datetime, expires_at: float) -> None:
+        """
+        A deleted message held by the snipe buffer.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+        channel_id : int
+            The ID of the channel.
+        author_id : int
+            The ID of the author.
+        content : str
+            The content of the message.
+        attachments : list[str]
+            The URLs of the attachments.
+        deleted_at : datetime.datetime
+            The time of deletion.
+        expires_at : float
+            The time.monotonic() value after which the snipe is dropped.
+        """
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.author_id = author_id
+        self.content = content
+        self.attachments = attachments
+        self.deleted_at = deleted_at
+        self.expires_at = expires_at
+        # Rough number of bytes held, counted against the memory cap of the buffer
+        self.size = 200 + len(content.encode()) + sum(len(url) for url in attachments)
+
+
+class SnipeBuffer(object):
+
+    def __init__(self, depth: int = 10, max_bytes: int = 8 * 1024 * 1024, ttl: float = 60.0,
+                 persist: bool = False) -> None:
+        """
+        Holds the most recently deleted messages of each channel in a ring buffer of `depth` messages.
+        Snipes are dropped after `ttl` seconds, and the oldest ones across every channel are dropped when the
+        buffer holds more than `max_bytes`. With `persist`, the latest snipe of each channel is also written to
+        the snipes table so that it survives a restart.
+
+        Parameters
+        ----------
+        depth : int, optional
+            Number of snipes kept per channel. The default is 10.
+        max_bytes : int, optional
+            Approximate memory cap of the buffer. The default is 8 MiB.
+        ttl : float, optional
+            Seconds a snipe is kept for. The default is 60.0.
+        persist : bool, optional
+            Whether to write the snipes to the database. The default is False.
+        """
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.persist = persist
+        self._channels: dict[int, deque[Snipe]] = {}
+        self._order: deque[Snipe] = deque()  # Every snipe in order of deletion, to expire and evict the oldest
+        self._bytes = 0  # Size of the snipes in _order, including those already pushed out of their channel
+
+    async def load(self, sql: AsyncSQL) -> None:
+        """
+        Loads the persisted snipes which have not expired yet. Does nothing unless the buffer persists snipes.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+
+        Returns
+        -------
+        None
+        """
+        if not self.persist:
+            return
+        now = datetime.datetime.now()
+        rows = await sql.select(elements=['guild_id', 'channel_id', 'author_id', 'message', 'attachments', 'time'],
+                                table='snipes')
+        snipes = []
+        for guild_id, channel_id, author_id, content, attachments, deleted_at in rows:
+            deleted_at = datetime.datetime.strptime(deleted_at, '%Y-%m-%d %H:%M:%S:%f')
+            if (age := (now - deleted_at).total_seconds()) < self.ttl:
+                snipes.append(Snipe(guild_id, channel_id, author_id, content,
+                                    [url for url in attachments if url != 'None'], deleted_at,
+                                    time.monotonic() + self.ttl - age))
+        for snipe in sorted(snipes, key=lambda snipe: snipe.deleted_at):
+            self._push(snipe)
+
+    async def add(self, sql: AsyncSQL, message: discord.Message) -> None:
+        """
+        Adds a deleted message to the buffer of its channel.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+        message : discord.Message
+            The deleted message.
+
+        Returns
+        -------
+        None
+        """
+        snipe = Snipe(message.guild.id, message.channel.id, message.author.id, message.content,
+                      [attachment.url for attachment in message.attachments], datetime.datetime.now(),
+                      time.monotonic() + self.ttl)
+        self._push(snipe)
+
+        if self.persist:  # One row is kept per channel
+            await sql.upsert(table='snipes', key_columns=['guild_id', 'channel_id'],
+                             columns=['author_id', 'message', 'channel_id', 'time', 'guild_id', 'attachments'],
+                             values=[snipe.author_id, snipe.content, snipe.channel_id,
+                                     snipe.deleted_at.strftime('%Y-%m-%d %H:%M:%S:%f'), snipe.guild_id,
+                                     snipe.attachments or ['None']])
+
+    def get(self, channel_id: int) -> list[Snipe]:
+        """
+        Returns the snipes of a channel, the most recent first.
+
+        Parameters
+        ----------
+        channel_id : int
+            The ID of the channel.
+
+        Returns
+        -------
+        list[Snipe]
+        """
+        self._expire()
+        return list(reversed(self._channels.get(channel_id, ())))
+
+    def remove_channel(self, channel_id: int) -> None:
+        """
+        Drops the snipes of a channel. The caller deletes its row from the database.
+
+        Parameters
+        ----------
+        channel_id : int
+            The ID of the channel.
+
+        Returns
+        -------
+        None
+        """
+        self._channels.pop(channel_id, None)
+        self._drop(lambda snipe: snipe.channel_id == channel_id)
+
+    def remove_guild(self, guild_id: int) -> None:
+        """
+        Drops the snipes of a guild. The caller deletes its rows from the database.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+
+        Returns
+        -------
+        None
+        """
+        for channel_id in [channel_id for channel_id, snipes in self._channels.items()
+                           if snipes and snipes[0].guild_id == guild_id]:
+            del self._channels[channel_id]
+        self._drop(lambda snipe: snipe.guild_id == guild_id)
+
+    def _push(self, snipe: Snipe) -> None:
+        snipes = self._channels.setdefault(snipe.channel_id, deque())
+        if len(snipes) >= self.depth:
+            snipes.popleft()  # Still counted in _bytes until it leaves _order
+        snipes.append(snipe)
+        self._order.append(snipe)
+        self._bytes += snipe.size
+        self._expire()
+
+    def _expire(self) -> None:
+        # Drops the oldest snipes while they have expired or the buffer is over its memory cap
+        now = time.monotonic()
+        while self._order and (self._order[0].expires_at <= now or self._bytes > self.max_bytes):
+            snipe = self._order.popleft()
+            self._bytes -= snipe.size
+            snipes = self._channels.get(snipe.channel_id)
+            if snipes and snipes[0] is snipe:  # Otherwise already pushed out of its channel
+                snipes.popleft()
+                if not snipes:
+                    del self._channels[snipe.channel_id]
+
+    def _drop(self, dropped: Callable[[Snipe], bool]) -> None:
+        # Drops the snipes of a removed channel or guild from _order, so that they are not kept until they expire
+        self._bytes -= sum(snipe.size for snipe in self._order if dropped(snipe))
+        self._order = deque(snipe for snipe in self._order if not dropped(snipe))
+
+
+snipes = SnipeBuffer(int(os.getenv('snipe_depth', 10)), int(os.getenv('snipe_max_bytes', 8 * 1024 * 1024)),
+                     float(os.getenv('snipe_ttl', 60.0)), os.getenv('snipe_persist', 'false').lower() == 'true')
+
+
+class WebhookRegistry(object):
+
+    def __init__(self) -> None:
+        """
+        Holds the webhooks the bot sends through, keyed by channel ID and webhook name.
+        A webhook is fetched or created once, and forgotten when the webhooks of its channel change or it is not
+        found anymore.
+        """
+        self._webhooks: dict[tuple[int, str], discord.Webhook] = {}
+        self._locks: dict[tuple[int, str], asyncio.Lock] = {}
+
+    async def get(self, channel: discord.TextChannel, name: str) -> discord.Webhook:
+        """
+        Returns the webhook of a channel with the given name, creating it if it does not exist.
+
+        Parameters
+        ----------
+        channel : discord.TextChannel
+            The channel.
+        name : str
+            The name of the webhook.
+
+        Returns
+        -------
+        discord.Webhook
+        """
+        key = (channel.id, name)
+        if (webhook := self._webhooks.get(key)) is not None:
+            return webhook
+
+        # Concurrent senders wait for a single fetch instead of each creating a webhook
+        async with self._locks.setdefault(key, asyncio.Lock()):
+            if (webhook := self._webhooks.get(key)) is None:
+                webhook = discord.utils.get(await channel.webhooks(), name=name)
+                if webhook is None:
+                    webhook = await channel.create_webhook(name=name)
+                self._webhooks[key] = webhook
+        return webhook
+
+    async def send(self, channel: discord.TextChannel, name: str, **kwargs) -> None:
+        """
+        Sends a message through the webhook of a channel with the given name.
+
+        Parameters
+        ----------
+        channel : discord.TextChannel
+            The channel.
+        name : str
+            The name of the webhook.
+        **kwargs
+            The arguments of discord.Webhook.send.
+
+        Returns
+        -------
+        None
+        """
+        try:
+            await (await self.get(channel, name)).send(**kwargs)
+        except discord.NotFound:
+            # The webhook was deleted since it was cached
+            self.invalidate(channel.id)
+            await (await self.get(channel, name)).send(**kwargs)
+
+    def invalidate(self, channel_id: int) -> None:
+        """
+        Forgets the webhooks of a channel.
+
+        Parameters
+        ----------
+        channel_id : int
+            The ID of the channel.
+
+        Returns
+        -------
+        None
+        """
+        for key in [key for key in self._webhooks if key[0] == channel_id]:
+            del self._webhooks[key]
+
+
+webhook_handles = WebhookRegistry()
+
+
+class MentionIndex(object):
+
+    def __init__(self, depth: int = 1000, max_entries: int = 200000) -> None:
+        """
+        Indexes the recent messages mentioning members, as the message ID and the IDs of the mentioned members.
+        Each channel keeps its `depth` most recent entries, and the oldest entries across every channel are dropped
+        once the index holds `max_entries`. Messages are indexed as they are sent, and a channel is backfilled once
+        from its recent history, after which it is warm and served from memory alone.
+
+        Parameters
+        ----------
+        depth : int, optional
+            Number of messages kept per channel. The default is 1000.
+        max_entries : int, optional
+            Number of messages kept in total. The default is 200000.
+        """
+        self.depth = depth
+        self.max_entries = max_entries
+        self._channels: dict[int, deque[tuple[int, tuple[int, ...]]]] = {}
+        self._order: deque[tuple[int, tuple[int, tuple[int, ...]]]] = deque()  # (channel_id, entry), oldest first
+        self._warm: set[int] = set()
+
+    def add(self, message: discord.Message) -> None:
+        """
+        Indexes a message if it mentions members.
+
+        Parameters
+        ----------
+        message : discord.Message
+            The message.
+
+        Returns
+        -------
+        None
+        """
+        if not message.raw_mentions:
+            return
+        entry = (message.id, tuple(message.raw_mentions))
+        entries = self._channels.setdefault(message.channel.id, deque(maxlen=self.depth))
+        entries.append(entry)
+        self._order.append((message.channel.id, entry))
+        self._evict()
+
+    def is_warm(self, channel_id: int) -> bool:
+        """
+        Returns whether a channel has been backfilled, in which case its mentions are all indexed.
+
+        Parameters
+        ----------
+        channel_id : int
+            The ID of the channel.
+
+        Returns
+        -------
+        bool
+        """
+        return channel_id in self._warm
+
+    def backfill(self, channel_id: int, messages: list[discord.Message]) -> None:
+        """
+        Indexes the recent history of a channel and marks it warm. The messages indexed since the bot started are
+        kept, so messages sent while the history was read are neither lost nor indexed twice.
+
+        Parameters
+        ----------
+        channel_id : int
+            The ID of the channel.
+        messages : list[discord.Message]
+            The recent messages of the channel, in any order.
+
+        Returns
+        -------
+        None
+        """
+        entries = self._channels.get(channel_id, ())
+        indexed = {message_id for message_id, _ in entries}
+        backfilled = [(message.id, tuple(message.raw_mentions)) for message in messages
+                      if message.raw_mentions and message.id not in indexed]
+        if backfilled:
+            self._channels[channel_id] = deque(sorted([*entries, *backfilled]), maxlen=self.depth)
+            self._order.extend((channel_id, entry) for entry in sorted(backfilled))
+        self._warm.add(channel_id)
+        self._evict()
+
+    def _evict(self) -> None:
+        # Entries dropped by the depth of their channel are still counted until they reach the front
+        while len(self._order) > self.max_entries:
+            channel_id, oldest = self._order.popleft()
+            entries = self._channels.get(channel_id)
+            if entries and entries[0] is oldest:
+                entries.popleft()
+                if not entries:
+                    del self._channels[channel_id]
+                    self._warm.discard(channel_id)  # Backfilled again on its next lookup
+
+    def get(self, channel_id: int, member_id: int) -> list[int]:
+        """
+        Returns the IDs of the indexed messages of a channel mentioning a member, the most recent first.
+
+        Parameters
+        ----------
+        channel_id : int
+            The ID of the channel.
+        member_id : int
+            The ID of the member.
+
+        Returns
+        -------
+        list[int]
+        """
+        return [message_id for message_id, mentioned in reversed(self._channels.get(channel_id, ()))
+                if member_id in mentioned]
+
+    def remove(self, channel_id: int, message_ids: set[int]) -> None:
+        """
+        Removes deleted messages from the index.
+
+        Parameters
+        ----------
+        channel_id : int
+            The ID of the channel.
+        message_ids : set[int]
+            The IDs of the deleted messages.
+
+        Returns
+        -------
+        None
+        """
+        if entries := self._channels.get(channel_id):
+            kept = [entry for entry in entries if entry[0] not in message_ids]
+            if len(kept) != len(entries):
+                entries.clear()
+                entries.extend(kept)
+
+    def remove_channel(self, channel_id: int) -> None:
+        """
+        Removes a channel from the index.
+
+        Parameters
+        ----------
+        channel_id : int
+            The ID of the channel.
+
+        Returns
+        -------
+        None
+        """
+        self._channels.pop(channel_id, None)
+        self._warm.discard(channel_id)
+
+
+mention_index = MentionIndex(int(os.getenv('mention_depth', 1000)), int(os.getenv('mention_max_entries', 200000)))
@@ -1,14 +1,22 @@
 # Copyright (c) 2022 Sandeep Kanekal
 # Contains all bot events
+import asyncio
 import contextlib
 import os
+import re
 import discord
 import random
 import datetime
-from sql_tools import SQL
+from sql_tools import AsyncSQL
+from cache import prefixes, guild_configs, afks, snipes, mention_index, guild_features, webhook_handles, Feature, DEFAULT_PREFIX
+from triggers import triggers
+from scheduler import scheduler
 from discord.ext import commands, tasks
-from tools import update_nick_name, translate
-import scrapetube as youtube
+from tools import update_nick_name
+from youtube_poller import youtube_poller, poll_schedule, ChannelUploads
+
+# A Markdown link, [text](http(s)://domain.tld...)
+MARKDOWN_LINK = re.compile(r'\[[^\]]+\]\(https?://[^\s()]+\.[^\s()]+\)')
 
 
 class Events(commands.Cog):
@@ -43,18 +51,28 @@ class Events(commands.Cog):
             # Start background tasks
             self.check_for_videos.start()
 
+        sql = AsyncSQL(os.getenv('sql_db_name'))
+
+        # Warm the caches
+        await prefixes.load(sql)
+        await guild_configs.load(sql)
+        await afks.load(sql)
+        await triggers.load(sql)
+        await snipes.load(sql)
+        await scheduler.load(sql)  # Restore the pending unmutes
+
         # Clear the data in the music tables
-        sql = SQL(os.getenv('sql_db_name'))
-        sql.delete(table='queue')
-        sql.delete(table='loop')
-        sql.delete(table='playlist')
+        async with sql.transaction() as transaction:
+            transaction.delete(table='queue')
+            transaction.delete(table='loop')
+            transaction.delete(table='playlist')
 
     # Bot activity on receiving a message
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message) -> None:
-        # sourcery skip: low-code-quality
         """
         Bot activity on receiving a message
+        Only the features used by the guild, or whose cheap prefilter matches, are handled.
 
         :param message: The message
 
@@ -63,90 +81,132 @@ class Events(commands.Cog):
         :return: None
         :rtype: None
         """
-        sql = SQL(os.getenv('sql_db_name'))  # type: SQL
-        if message.author.bot:  # Ignore bots
+        if not message.guild:
             return
 
-        if not message.guild:
+        # Index the mentions of every message, including those sent by bots
+        mention_index.add(message)
+
+        if message.author.bot:  # Ignore bots
             return
 
-        message.content = message.content.replace("'", "''")  # Replace single quotes with double quotes
-
-        # AFKs
-        if sql.select(elements=['member_id', 'guild_id', 'reason'], table='afks',
-                      where=f'member_id = \'{message.author.id}\' AND guild_id = \'{message.guild.id}\''):
-            # Check if the user is afk
-            sql.delete(table='afks',
-                       where=f'member_id = \'{message.author.id}\' and guild_id = \'{message.guild.id}\'')  # Remove
-            # the afk
-
-            with contextlib.suppress(discord.Forbidden):
-                await message.author.edit(nick=update_nick_name(message.author.display_name))  # Remove the AFK tag
-
-            await message.reply(
-                embed=discord.Embed(
-                    description=f'Welcome back {message.author.mention}, I removed your AFK!',
-                    colour=discord.Colour.green()
-                )
-            )  # Reply to the user
-
-        # If an AFK user is mentioned, inform the author
-        if message.mentions:
-            for mention in message.mentions:
-                if afk_user := sql.select(
-                        elements=['member_id', 'guild_id', 'reason'],
-                        table='afks',
-                        where=f'member_id = \'{mention.id}\' and guild_id = \'{message.guild.id}\'',
-                ):  # Check if the mentions contains an afk user
-                    member = discord.utils.get(message.guild.members, id=int(afk_user[0][0]))  # Get the member
-
-                    if member in message.mentions and message.guild.id == int(
-                            afk_user[0][1]):  # Check if the member is mentioned
-
-                        await message.reply(
-                            embed=discord.Embed(
-                                description=f'{message.author.mention}, {member.mention} is AFK!\nAFK note: {afk_user[0][2]}',
-                                colour=discord.Colour.red()
-                            ).set_thumbnail(url=member.display_avatar.url)
-                        )  # Reply to the user
-
-        # Ping reply
+        features = guild_features.get(message.guild.id)
+        handlers = []
+
+        if features & Feature.AFK:
+            handlers.append(self.remove_afk(message))
+            if message.mentions:
+                handlers.append(self.inform_afk_mentions(message))
+
         if self.bot.user.id in message.raw_mentions and message.content != '@everyone' and message.content != '@here':
-            # Ping response
-            command_prefix = sql.select(elements=['prefix'], table='prefixes', where=f"guild_id = '{message.guild.id}'")
-            embed = discord.Embed(
-                description=f'Hi! I am **{self.bot.user.name}**! I was coded by **Dose#7204**. My prefix is **{command_prefix[0][0]}**',
-                colour=0x0c1e4a)
-            embed.set_author(name=self.bot.user.name, icon_url=self.bot.user.avatar.url)
-            await message.reply(embed=embed)
-
-        # Messageresponse
-        with contextlib.suppress(IndexError):
-            if response := sql.select(elements=['response'], table='message_responses',
-                                      where=f"message = '{message.content.lower()}' AND guild_id = '{message.guild.id}'"
-                                      )[0][0]:
-                # Check for chat triggers
-                await message.reply(response)
-
-        # Markdown
-        with contextlib.suppress(discord.HTTPException):
-            if '[' in message.content and \
-                    ']' in message.content \
-                    and '(' in message.content \
-                    and ')' in message.content \
-                    and (message.content.split('(')[1].startswith('https://')
-                         or message.content.split('(')[1].startswith('http://')) \
-                    and '.' in message.content \
-                    and (message.content.split('https://')[1] or message.content.split('http://')[1]):
-                # Check for Markdown syntax
-
-                webhooks = await message.channel.webhooks()
-                webhook = discord.utils.get(webhooks, name='Markdown webhook')
-                if webhook is None:
-                    webhook = await message.channel.create_webhook(name='Markdown webhook')
-                await webhook.send(message.content.replace("''", "'"), username=message.author.display_name,
+            handlers.append(self.ping_reply(message))
+
+        if features & Feature.TRIGGERS:
+            handlers.append(self.message_response(message))
+
+        # The replies are independent of each other
+        if handlers:
+            await asyncio.gather(*handlers)
+
+        # Markdown deletes the message, so it runs after the replies
+        if MARKDOWN_LINK.search(message.content):
+            with contextlib.suppress(discord.HTTPException):
+                await self.relay_markdown(message)
+
+    @staticmethod
+    async def remove_afk(message: discord.Message) -> None:
+        """
+        Removes the AFK of the author of a message, if the author is AFK
+
+        :param message: The message
+
+        :type message: discord.Message
+
+        :return: None
+        :rtype: None
+        """
+        if await afks.remove(AsyncSQL(os.getenv('sql_db_name')), message.guild.id, message.author.id) is None:
+            return
+
+        with contextlib.suppress(discord.Forbidden):
+            await message.author.edit(nick=update_nick_name(message.author.display_name))  # Remove the AFK tag
+
+        await message.reply(
+            embed=discord.Embed(
+                description=f'Welcome back {message.author.mention}, I removed your AFK!',
+                colour=discord.Colour.green()
+            )
+        )  # Reply to the user
+
+    @staticmethod
+    async def inform_afk_mentions(message: discord.Message) -> None:
+        """
+        Informs the author of a message about the AFK members mentioned in it
+
+        :param message: The message
+
+        :type message: discord.Message
+
+        :return: None
+        :rtype: None
+        """
+        for member in message.mentions:
+            if (reason := afks.get(message.guild.id, member.id)) is not None:  # Check if the mention is an afk user
+                await message.reply(
+                    embed=discord.Embed(
+                        description=f'{message.author.mention}, {member.mention} is AFK!\nAFK note: {reason}',
+                        colour=discord.Colour.red()
+                    ).set_thumbnail(url=member.display_avatar.url)
+                )  # Reply to the user
+
+    async def ping_reply(self, message: discord.Message) -> None:
+        """
+        Replies to a message pinging the bot
+
+        :param message: The message
+
+        :type message: discord.Message
+
+        :return: None
+        :rtype: None
+        """
+        embed = discord.Embed(
+            description=f'Hi! I am **{self.bot.user.name}**! I was coded by **Dose#7204**. My prefix is **{prefixes.get(message.guild.id)}**',
+            colour=0x0c1e4a)
+        embed.set_author(name=self.bot.user.name, icon_url=self.bot.user.avatar.url)
+        await message.reply(embed=embed)
+
+    @staticmethod
+    async def message_response(message: discord.Message) -> None:
+        """
+        Replies to a message matching a chat trigger of the guild
+
+        :param message: The message
+
+        :type message: discord.Message
+
+        :return: None
+        :rtype: None
+        """
+        if response := triggers.match(message.guild.id, message.content.lower()):
+            await message.reply(response)
+
+    @staticmethod
+    async def relay_markdown(message: discord.Message) -> None:
+        """
+        Resends a message containing a Markdown link through a webhook, so that the link is rendered
+
+        :param message: The message
+
+        :type message: discord.Message
+
+        :return: None
+        :rtype: None
+        """
+        await webhook_handles.send(message.channel, 'Markdown webhook', content=message.content,
+                                   username=message.author.display_name,
                                    avatar_url=message.author.avatar.url)  # Send the message to the webhook
-                await message.delete()  # Delete original message
+        await message.delete()  # Delete original message
 
     @commands.Cog.listener()
     async def on_command(self, ctx: commands.Context) -> None:
@@ -164,8 +224,7 @@ class Events(commands.Cog):
         # Inform the user about other commands.
         if random.choice([True, False, False, False, False, False, False, False, False,
                           False]) and ctx.command != self.bot.get_command('clear'):
-            sql = SQL(os.getenv('sql_db_name'))  # type: SQL
-            prefix = sql.select(elements=['prefix'], table='prefixes', where=f"guild_id = '{ctx.guild.id}'")[0][0]
+            prefix = prefixes.get(ctx.guild.id)
 
             response = random.choice(
                 [
@@ -187,15 +246,14 @@ class Events(commands.Cog):
         :return: None
         :rtype: None
         """
-        sql = SQL(os.getenv('sql_db_name'))
+        sql = AsyncSQL(os.getenv('sql_db_name'))
 
         # Add the guild to the database
-        sql.insert(table='prefixes', columns=['guild_id', 'prefix'], values=[f'\'{guild.id}\'', '\'-\''])
+        await prefixes.set(sql, guild.id, DEFAULT_PREFIX)
 
         if guild.system_channel:  # Send an informative embed to the guild's system channel
-            command_prefix = sql.select(elements=['prefix'], table='prefixes', where=f"guild_id = '{guild.id}'")
             embed = discord.Embed(
-                description=f'Hi! I am **{self.bot.user.name}**! I was coded by **Dose#7204**. My prefix is **{command_prefix[0][0]}**. You can change my prefix using the slash command: {self.bot.get_application_command("prefix", type=discord.SlashCommand).mention}!',
+                description=f'Hi! I am **{self.bot.user.name}**! I was coded by **Dose#7204**. My prefix is **{prefixes.get(guild.id)}**. You can change my prefix using the slash command: {self.bot.get_application_command("prefix", type=discord.SlashCommand).mention}!',
                 colour=0x0c1e4a)
             embed.set_author(name=self.bot.user.name, icon_url=self.bot.user.avatar.url)
             await guild.system_channel.send(embed=embed)
@@ -213,18 +271,26 @@ class Events(commands.Cog):
         :rtype: None
         """
         # Delete all the data of the guild from the database
-        sql = SQL(os.getenv('sql_db_name'))
-        sql.delete(table='prefixes', where=f'guild_id = \'{guild.id}\'')
-        sql.delete(table='modlogs', where=f'guild_id = \'{guild.id}\'')
-        sql.delete(table='afks', where=f'guild_id = \'{guild.id}\'')
-        sql.delete(table='message_responses', where=f'guild_id = \'{guild.id}\'')
-        sql.delete(table='youtube', where=f'guild_id = \'{guild.id}\'')
-        sql.delete(table='snipes', where=f'guild_id = \'{guild.id}\'')
-        sql.delete(table='warns', where=f'guild_id = \'{guild.id}\'')
-        sql.delete(table='queue', where=f'guild_id = \'{guild.id}\'')
-        sql.delete(table='loop', where=f'guild_id = \'{guild.id}\'')
-        sql.delete(table='verifications', where=f'guild_id = \'{guild.id}\'')
-        sql.delete(table='serverjoin', where=f'guild_id = \'{guild.id}\'')
+        sql = AsyncSQL(os.getenv('sql_db_name'))
+        async with sql.transaction() as transaction:
+            transaction.delete(table='prefixes', where={'guild_id': guild.id})
+            transaction.delete(table='modlogs', where={'guild_id': guild.id})
+            transaction.delete(table='afks', where={'guild_id': guild.id})
+            transaction.delete(table='message_responses', where={'guild_id': guild.id})
+            transaction.delete(table='youtube', where={'guild_id': guild.id})
+            transaction.delete(table='snipes', where={'guild_id': guild.id})
+            transaction.delete(table='warns', where={'guild_id': guild.id})
+            transaction.delete(table='queue', where={'guild_id': guild.id})
+            transaction.delete(table='loop', where={'guild_id': guild.id})
+            transaction.delete(table='verifications', where={'guild_id': guild.id})
+            transaction.delete(table='serverjoin', where={'guild_id': guild.id})
+            transaction.delete(table='scheduled_actions', where={'guild_id': guild.id})
+        prefixes.remove(guild.id)
+        guild_configs.remove(guild.id)
+        afks.remove_guild(guild.id)
+        triggers.remove_guild(guild.id)
+        scheduler.remove_guild(guild.id)
+        snipes.remove_guild(guild.id)
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
@@ -242,35 +308,26 @@ class Events(commands.Cog):
         if payload.user_id == self.bot.user.id:
             return
 
-        sql = SQL(os.getenv('sql_db_name'))
-        if not sql.select(elements=['message_id'], table='verifications',
-                          where=f'guild_id = \'{payload.guild_id}\' AND message_id = \'{payload.message_id}\''):
+        verification = guild_configs.get(payload.guild_id).verification
+        if verification is None or verification[0] != payload.message_id:
             # Check if the message is a verification message
             return
 
         if payload.emoji.name != '✅':
             return
 
-        role_id = sql.select(elements=['role_id'], table='verifications',
-                             where=f'guild_id = \'{payload.guild_id}\' AND message_id = \'{payload.message_id}\'')  # Get the role ID
-        if not role_id:
-            return
+        message_id, role_id, unverified_role_id, channel_id = verification
         guild = self.bot.get_guild(payload.guild_id)
-        role = discord.utils.get(guild.roles, id=int(role_id[0][0]))
-        channel = discord.utils.get(guild.channels, id=int(sql.select(elements=['channel_id'], table='verifications',
-                                                                      where=f'guild_id = \'{payload.guild_id}\' AND message_id = \'{payload.message_id}\'')[
-                                                               0][0]))  # Get the channel
+        role = discord.utils.get(guild.roles, id=role_id)
+        channel = discord.utils.get(guild.channels, id=channel_id)  # Get the channel
         message = await channel.fetch_message(payload.message_id)  # Get the message
 
         if role in payload.member.roles:
             await message.remove_reaction('✅', payload.member)
             return
 
-        unverified_role_id = sql.select(['unverified_role_id'], 'verifications',
-                                        f"guild_id = '{payload.guild_id}' AND message_id = '{payload.message_id}'")[0][
-            0]  # Get the unverified role ID
-        if unverified_role_id != 'None':
-            unverified_role = discord.utils.get(guild.roles, id=int(unverified_role_id))
+        if unverified_role_id is not None:
+            unverified_role = discord.utils.get(guild.roles, id=unverified_role_id)
             await payload.member.remove_roles(unverified_role)
 
         await payload.member.add_roles(role)
@@ -292,15 +349,12 @@ class Events(commands.Cog):
         :return: None
         :rtype: None
         """
-        sql = SQL(os.getenv('sql_db_name'))
-
-        if not sql.select(['*'], 'serverjoin', f"guild_id = '{member.guild.id}'"):
+        config = guild_configs.get(member.guild.id)
+        if not config.serverjoin:
             return
 
-        member_role_id = sql.select(['member_role_id'], 'serverjoin', f"guild_id = '{member.guild.id}'")[0][
-            0]  # Get the role ID for members
-        bot_role_id = sql.select(['bot_role_id'], 'serverjoin', f"guild_id = '{member.guild.id}'")[0][
-            0]  # Get the role ID for bots
+        member_role_id = config.member_role_id  # Get the role ID for members
+        bot_role_id = config.bot_role_id  # Get the role ID for bots
 
         # Add roles accordingly
         if member.bot and bot_role_id:
@@ -310,6 +364,48 @@ class Events(commands.Cog):
             member_role = discord.utils.get(member.guild.roles, id=int(member_role_id))
             await member.add_roles(member_role)
 
+    @commands.Cog.listener()
+    async def on_webhooks_update(self, channel: discord.abc.GuildChannel) -> None:
+        """
+        Bot activity on the webhooks of a channel being created, updated or deleted
+
+        :param channel: The channel
+
+        :type channel: discord.abc.GuildChannel
+
+        :return: None
+        :rtype: None
+        """
+        webhook_handles.invalidate(channel.id)
+
+    @commands.Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent) -> None:
+        """
+        Bot activity on a message being deleted, even if it is not in the message cache
+
+        :param payload: The payload
+
+        :type payload: discord.RawMessageDeleteEvent
+
+        :return: None
+        :rtype: None
+        """
+        mention_index.remove(payload.channel_id, {payload.message_id})
+
+    @commands.Cog.listener()
+    async def on_raw_bulk_message_delete(self, payload: discord.RawBulkMessageDeleteEvent) -> None:
+        """
+        Bot activity on messages being deleted in bulk, even if they are not in the message cache
+
+        :param payload: The payload
+
+        :type payload: discord.RawBulkMessageDeleteEvent
+
+        :return: None
+        :rtype: None
+        """
+        mention_index.remove(payload.channel_id, payload.message_ids)
+
     @commands.Cog.listener()
     async def on_guild_channel_delete(self, channel: discord.TextChannel) -> None:
         """
@@ -322,22 +418,129 @@ class Events(commands.Cog):
         :return: None
         :rtype: None
         """
-        sql = SQL(os.getenv('sql_db_name'))
-        sql.delete(table='youtube', where=f'channel_id = \'{channel.id}\'')
-        sql.delete(table='snipes', where=f'channel_id = \'{channel.id}\'')
-        sql.delete(table='modlogs', where=f'channel_id = \'{channel.id}\'')
+        sql = AsyncSQL(os.getenv('sql_db_name'))
+        async with sql.transaction() as transaction:
+            transaction.delete(table='youtube', where={'text_channel_id': channel.id})
+            transaction.delete(table='snipes', where={'channel_id': channel.id})
+            transaction.delete(table='modlogs', where={'channel_id': channel.id})
+        webhook_handles.invalidate(channel.id)
+        snipes.remove_channel(channel.id)
+        mention_index.remove_channel(channel.id)
+        if guild_configs.get(channel.guild.id).modlog_channel_id == channel.id:
+            await guild_configs.refresh(sql, channel.guild.id)
+
+    async def notify_uploads(self, sql: AsyncSQL, channel: tuple, uploads: ChannelUploads | Exception) -> None:
+        """
+        Notifies a guild of the new videos of a YouTube channel it follows
+
+        :param sql: The AsyncSQL object of the database
+        :param channel: The row of the youtube table
+        :param uploads: The latest uploads of the YouTube channel, or the exception raised while fetching them
+
+        :type sql: AsyncSQL
+        :type channel: tuple
+        :type uploads: ChannelUploads | Exception
+
+        :return: None
+        :rtype: None
+        """
+        if isinstance(uploads, Exception):
+            raise uploads
+
+        notifiable_videos = uploads.new_videos(channel[1])
+        if not notifiable_videos:
+            return
+
+        guild: discord.Guild = discord.utils.get(self.bot.guilds, id=int(channel[2]))
+        text_channel: discord.TextChannel = discord.utils.get(guild.text_channels, id=int(channel[3]))
+        ping_role: discord.Role | None = discord.utils.get(guild.roles, id=channel[5]) if channel[
+                                                                                                5] is not None else None
+
+        if isinstance(ping_role, discord.Role):
+            ping_string = "@everyone" if 'everyone' in ping_role.name else ping_role.mention
+        else:
+            ping_string = "everyone"
+
+        for video_id in list(reversed(notifiable_videos)):
+            await text_channel.send(
+                f'Hey {ping_string}! New video uploaded by **{channel[4]}**!\nhttps://youtube.com/watch?v={video_id}')
+
+        await sql.update(table='youtube', column='latest_video_id', value=notifiable_videos[0],
+                         where={'channel_id': channel[0], 'guild_id': guild.id})  # Update the latest video id
+
+    async def reschedule_polls(self, sql: AsyncSQL, subscriptions: dict[str, list[tuple]],
+                               uploads: dict[str, ChannelUploads | Exception]) -> None:
+        """
+        Schedules the next poll of the YouTube channels just polled from their latest uploads
+        The poll interval and the time of the latest upload are stored in the youtube rows of the channel
+
+        :param sql: The AsyncSQL object of the database
+        :param subscriptions: The rows of the youtube table of each channel polled
+        :param uploads: The latest uploads of each channel, or the exception raised while fetching them
+
+        :type sql: AsyncSQL
+        :type subscriptions: dict[str, list[tuple]]
+        :type uploads: dict[str, ChannelUploads | Exception]
+
+        :return: None
+        :rtype: None
+        """
+        async with sql.transaction() as transaction:
+            for channel_id, subscribers in subscriptions.items():
+                poll_interval, last_upload_at = subscribers[0][6], subscribers[0][7]
+                channel_uploads = uploads[channel_id]
+
+                if isinstance(channel_uploads, Exception):  # Retried after the same interval
+                    poll_schedule.schedule(channel_id, poll_interval)
+                    continue
 
-    @tasks.loop(minutes=5)
+                # Only a video which no subscription has seen yet is a new upload, the first poll takes the latest one
+                if channel_uploads.video_ids and channel_uploads.published_at is not None and (
+                        last_upload_at is None or channel_uploads.video_ids[0] not in
+                        {subscriber[1] for subscriber in subscribers}):
+                    published_at = channel_uploads.published_at
+                    last_upload_at = published_at if last_upload_at is None else max(last_upload_at, published_at)
+
+                interval = poll_schedule.interval(last_upload_at)
+                poll_schedule.schedule(channel_id, interval)
+                if interval != poll_interval or last_upload_at != subscribers[0][7]:
+                    transaction.update(table='youtube', column='poll_interval', value=interval,
+                                       where={'channel_id': channel_id})
+                    transaction.update(table='youtube', column='last_upload_at', value=last_upload_at,
+                                       where={'channel_id': channel_id})
+
+    @tasks.loop(minutes=1)
     async def check_for_videos(self) -> None:  # sourcery skip: low-code-quality
         """
-        Check for new videos every few minutes
+        Check for new videos of the channels whose poll is due
+        Each channel has its own poll interval, see youtube_poller.PollSchedule
 
         :return: None
         :rtype: None
         """
+        sql = AsyncSQL(os.getenv('sql_db_name'))
+        try:
+            channels = await sql.select(
+                elements=['channel_id', 'latest_video_id', 'guild_id', 'text_channel_id', 'channel_name', 'ping_role',
+                          'poll_interval', 'last_upload_at'],
+                table='youtube')
+        except Exception as e:  # An exception would stop the loop
+            print(f'An error occurred in check_for_videos: {e} @ {datetime.datetime.now()}')
+            return
+
+        # Group the subscriptions by YouTube channel, so that a channel followed by several guilds is fetched once
+        subscriptions: dict[str, list[tuple]] = {}
+        for channel in channels:
+            subscriptions.setdefault(channel[0], []).append(channel)
+
+        due = poll_schedule.due({channel_id: (subscribers[0][6], subscribers[0][7])
+                                 for channel_id, subscribers in subscriptions.items()})
+        if not due:
+            return
+        subscriptions = {channel_id: subscriptions[channel_id] for channel_id in due}
+
         status: str = ''
         try:
-            sql = SQL(os.getenv('sql_db_name'))
             status += 'Checking for videos...'
 
             await self.bot.change_presence(
@@ -345,54 +548,19 @@ class Events(commands.Cog):
                 activity=discord.Activity(name='for YouTube video uploads', type=discord.ActivityType.watching)
             )
 
-            channels = sql.select(
-                elements=['channel_id', 'latest_video_id', 'guild_id', 'text_channel_id', 'channel_name', 'ping_role'],
-                table='youtube')
-
-            for channel in channels:
-                videos = youtube.get_channel(channel[0], limit=20)
-                notifiable_videos = []
-                publish_dates = []
-
-                for video in videos:
-                    if video['videoId'] == channel[1]:
-                        break
-                    notifiable_videos.append(video['videoId'])
-                    with contextlib.suppress(KeyError):
-                        publish_dates.append(video['publishedTimeText']['simpleText'])
-
-                if not notifiable_videos:
-                    continue
-                           
-                with contextlib.suppress((TypeError, IndexError)):
-                    if 'second' not in translate(publish_dates[0]).lower() and 'seconds' not in translate(
-                            publish_dates[0]).lower() and 'minute' not in translate(
-                            publish_dates[0]).lower() and 'minutes' not in translate(
-                            publish_dates[0]).lower() and 'hour' not in translate(
-                            publish_dates[0]).lower() and 'hours' not in translate(publish_dates[0]).lower():
-                        continue
-
-                guild: discord.Guild = discord.utils.get(self.bot.guilds, id=int(channel[2]))
-                text_channel: discord.TextChannel = discord.utils.get(guild.text_channels, id=int(channel[3]))
-                ping_role: discord.Role | None = discord.utils.get(guild.roles, id=int(channel[5])) if channel[
-                                                                                                        5] != 'None' else None
-
-                # webhooks = await text_channel.webhooks()
-                # webhook = discord.utils.get(webhooks, name=f'{self.bot.user.name} YouTube Notifier')
-                # if webhook is None:
-                #     webhook = await text_channel.create_webhook(name=f'{self.bot.user.name} YouTube Notifier')
-
-                if isinstance(ping_role, discord.Role):
-                    ping_string = "@everyone" if 'everyone' in ping_role.name else ping_role.mention
-                else:
-                    ping_string = "everyone"
-
-                for video_id in list(reversed(notifiable_videos)):
-                    await text_channel.send(
-                        f'Hey {ping_string}! New video uploaded by **{channel[4]}**!\nhttps://youtube.com/watch?v={video_id}')
-
-                sql.update(table='youtube', column='latest_video_id', value=f"'{notifiable_videos[0]}'",
-                        where=f'channel_id = \'{channel[0]}\' AND guild_id = \'{guild.id}\'')  # Update the latest video id
+            # Fetch the channels due concurrently, then notify each subscription from its own latest video
+            uploads = await youtube_poller.poll(list(subscriptions))
+            channels = [channel for subscribers in subscriptions.values() for channel in subscribers]
+            results = await asyncio.gather(*(self.notify_uploads(sql, channel, uploads[channel[0]])
+                                             for channel in channels), return_exceptions=True)
+            failures = [(channel, result) for channel, result in zip(channels, results) if isinstance(result, Exception)]
+            for channel, error in failures:
+                print(f'Could not check {channel[4]} for videos: {error!r}')
+            if failures:
+                status += f' {len(failures)} of {len(channels)} subscriptions could not be checked.'
+            status += f' {len(subscriptions)} channels fetched for {len(channels)} subscriptions.'
+
+            await self.reschedule_polls(sql, subscriptions, uploads)
 
         except Exception as e:
             status = f'An error occurred in check_for_videos: {e}'
@@ -2,8 +2,7 @@
 # Contains the help commands
 import discord
 import datetime
-import os
-from sql_tools import SQL
+from cache import prefixes
 from discord.ext import commands
 from ui_components import HelpView
 
@@ -41,8 +40,7 @@ class Help(commands.Cog):
         :return: None
         :rtype: None
         """
-        sql = SQL(os.getenv('sql_db_name'))
-        prefix = sql.select(elements=['prefix'], table='prefixes', where=f'guild_id = \'{ctx.guild.id}\'')[0][0]
+        prefix = prefixes.get(ctx.guild.id)
 
         if command is None:
             # Create embed
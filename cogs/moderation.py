@@ -4,8 +4,12 @@ import contextlib
 import discord
 import datetime
 import os
-import asyncio
-from sql_tools import SQL
+from sql_tools import SQL, AsyncSQL
+from cache import guild_configs, ModlogEvent
+from modlog_sink import modlog_sink
+from scheduler import scheduler, ScheduledAction
+from muted_role import muted_roles
+from purge import purge_engine
 from tools import convert_to_unix_time
 from discord.ext import commands
 
@@ -29,19 +33,20 @@ async def send_embed(ctx, description: str, colour: discord.Colour = discord.Col
     await ctx.send(embed=discord.Embed(description=description, colour=colour))
 
 
-def modlog_enabled(guild_id: int) -> bool:
+def modlog_enabled(guild_id: int, event: ModlogEvent) -> bool:
     """
-    Checks if the modlog is enabled for the guild
+    Checks if the modlog is enabled for the guild and logs the category of the event
     
     :param guild_id: The id of the guild
+    :param event: The category of the event
 
     :type guild_id: int
+    :type event: ModlogEvent
 
-    :return: True if the modlog is enabled, False otherwise
+    :return: True if the event is to be logged, False otherwise
     :rtype: bool
     """
-    sql = SQL(os.getenv('sql_db_name'))
-    return bool(sql.select(elements=['channel_id'], table='modlogs', where=f"guild_id='{guild_id}'"))
+    return guild_configs.get(guild_id).logs(event)
 
 
 def get_mod_channel(guild: discord.Guild) -> discord.TextChannel:
@@ -55,31 +60,97 @@ def get_mod_channel(guild: discord.Guild) -> discord.TextChannel:
     :return: The modlog channel
     :rtype: discord.TextChannel
     """
-    sql = SQL(os.getenv('sql_db_name'))
-    return discord.utils.get(guild.text_channels, id=int(
-        sql.select(elements=['channel_id'], table='modlogs', where=f"guild_id='{guild.id}'")[0][0]))
+    return discord.utils.get(guild.text_channels, id=guild_configs.get(guild.id).modlog_channel_id)
 
 
-async def send_webhook(channel: discord.TextChannel, embed: discord.Embed, bot: commands.Bot) -> None:
+async def send_webhook(channel: discord.TextChannel, embed: discord.Embed | None, bot: commands.Bot, **kwargs) -> None:
     """
     Sends a webhook to the specified channel
 
     :param channel: The channel to send the webhook to
-    :param embed: The embed to send to the webhook
+    :param embed: The embed to send to the webhook, None if the message is given in kwargs
     :param bot: The bot
+    :param kwargs: Other arguments of discord.Webhook.send, like content or embeds
     
     :type channel: discord.TextChannel
-    :type embed: discord.Embed
+    :type embed: discord.Embed | None
     :type bot: commands.Bot
+    :type kwargs: Any
     
     :return: None
     :rtype: None
     """
-    webhooks = await channel.webhooks()
-    webhook = discord.utils.get(webhooks, name=f'{bot.user.name} Logging')
-    if webhook is None:
-        webhook = await channel.create_webhook(name=f'{bot.user.name} Logging')
-    await webhook.send(embed=embed, username=f'{bot.user.name} Logging', avatar_url=bot.user.avatar.url)
+    name = f'{bot.user.name} Logging'
+    if embed is not None:
+        kwargs['embeds'] = [embed, *kwargs.get('embeds', [])]
+
+    if 'content' in kwargs:
+        # Messages with content are sent on their own, in order with the other modlogs of the channel
+        await modlog_sink.put(channel, kwargs, name, bot.user.avatar.url)
+        return
+
+    # Embeds are batched with the other modlogs of the channel
+    for embed in kwargs.get('embeds', []):
+        await modlog_sink.put(channel, embed, name, bot.user.avatar.url)
+
+
+async def get_muted_role(ctx: commands.Context) -> discord.Role:
+    """
+    Gets the muted role of the guild, creating it if not present
+    The progress of setting up the role in the channels is reported in a message
+
+    :param ctx: The context of the command
+
+    :type ctx: commands.Context
+
+    :return: The muted role
+    :rtype: discord.Role
+    """
+    if muted_role := muted_roles.get(ctx.guild):
+        return muted_role
+
+    message = await ctx.send(embed=discord.Embed(description='Setting up the Muted role...',
+                                                 colour=discord.Colour.orange()))
+
+    async def report(done: int, total: int) -> None:
+        with contextlib.suppress(discord.HTTPException):
+            await message.edit(embed=discord.Embed(description=f'Setting up the Muted role: {done}/{total} channels',
+                                                   colour=discord.Colour.orange()))
+
+    return await muted_roles.get_or_create(ctx.guild, report)
+
+
+def purge_embed(channel: discord.TextChannel, messages: list[discord.Message]) -> discord.Embed:
+    """
+    Makes the modlog embed of messages deleted together
+    The messages which do not fit in the embed are counted at its end
+
+    :param channel: The channel of the messages
+    :param messages: The messages that were deleted
+
+    :type channel: discord.TextChannel
+    :type messages: list[discord.Message]
+
+    :return: The embed
+    :rtype: discord.Embed
+    """
+    lines, length = [], 0
+    for message in messages:
+        line = f'{message.author.mention}: {message.content}\n'
+        if length + len(line) > 4000:  # Embed descriptions are limited to 4096 characters
+            lines.append(f'...and {len(messages) - len(lines)} more')
+            break
+        lines.append(line)
+        length += len(line)
+
+    embed = discord.Embed(
+        title=f'{len(messages)} messages purged in #{channel}',
+        description=''.join(lines),
+        colour=discord.Colour.red(),
+        timestamp=datetime.datetime.now()
+    )
+    embed.set_author(name=channel.guild.name, icon_url=channel.guild.icon or discord.Embed.Empty)
+    return embed
 
 
 class Moderation(commands.Cog):
@@ -95,6 +166,36 @@ class Moderation(commands.Cog):
         :rtype: None
         """
         self.bot = bot  # type: commands.Bot
+        scheduler.register('unmute', self.lift_mute)
+
+    async def lift_mute(self, action: ScheduledAction) -> None:
+        """
+        Unmutes a member once a temporary mute ends
+        Called by the scheduler, also after a restart
+
+        :param action: The scheduled unmute
+
+        :type action: ScheduledAction
+
+        :return: None
+        :rtype: None
+        """
+        guild = self.bot.get_guild(action.guild_id)
+        if not guild:
+            return
+        member = guild.get_member(action.member_id)
+        muted_role = muted_roles.get(guild)
+        if not member or muted_role not in member.roles:  # Left the guild or already unmuted
+            return
+
+        await member.remove_roles(muted_role, reason=action.reason)
+
+        if channel := guild.get_channel(action.channel_id):
+            with contextlib.suppress(discord.HTTPException):
+                await channel.send(embed=discord.Embed(description=f'{member} has been unmuted',
+                                                       colour=discord.Colour.green()))
+        with contextlib.suppress(discord.HTTPException):  # A DM cannot be sent to a bot, hence the suppression
+            await member.send(f'You were unmuted in {guild.name}')
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member) -> None:
@@ -108,7 +209,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(member.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(member.guild.id, ModlogEvent.MEMBERS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(member.guild)  # Get the modlog channel
@@ -138,7 +239,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(member.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(member.guild.id, ModlogEvent.MEMBERS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(member.guild)  # Get the modlog channel
@@ -172,7 +273,10 @@ class Moderation(commands.Cog):
         if not message.guild:
             return
 
-        if not modlog_enabled(message.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(message.guild.id, ModlogEvent.MESSAGES):  # Check if modlog is enabled
+            return
+
+        if purge_engine.suppressed(message.id):  # Logged with the rest of the purge
             return
 
         channel = get_mod_channel(message.guild)  # Get the modlog channel
@@ -180,7 +284,7 @@ class Moderation(commands.Cog):
         # Make embed
         embed = discord.Embed(
             title=f'Message Deleted in #{message.channel}',
-            description=message.content.replace("''", "'") or 'No content',
+            description=message.content or 'No content',
             colour=discord.Colour.green(),
             timestamp=datetime.datetime.now()
         )
@@ -195,12 +299,7 @@ class Moderation(commands.Cog):
         await send_webhook(channel, embed, self.bot)
 
         if message.embeds:
-            webhooks = await channel.webhooks()
-            webhook = discord.utils.get(webhooks, name=f'{self.bot.user.name} Logging')
-            if webhook is None:
-                webhook = await channel.create_webhook(name=f'{self.bot.user.name} Logging')
-            await webhook.send(content='Message contained embeds', embeds=message.embeds,
-                               username=f'{self.bot.user.name} Logging', avatar_url=self.bot.user.avatar.url)
+            await send_webhook(channel, None, self.bot, content='Message contained embeds', embeds=message.embeds)
 
     @commands.Cog.listener()
     async def on_message_edit(self, before: discord.Message, after: discord.Message) -> None:
@@ -220,7 +319,7 @@ class Moderation(commands.Cog):
         if not before.guild:
             return
 
-        if not modlog_enabled(before.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(before.guild.id, ModlogEvent.MESSAGES):  # Check if modlog is enabled
             return
 
         # Get modlog channel
@@ -229,11 +328,10 @@ class Moderation(commands.Cog):
         if before.content == after.content:
             return
 
-        before_content, after_content = before.content.replace("''", "'"), after.content.replace("''", "'")
         # Make embed
         embed = discord.Embed(
             title=f'Message Edited in #{before.channel}',
-            description=f'{before.author.mention} has edited a message\n**Before**: {before_content}\n**After**: {after_content}',
+            description=f'{before.author.mention} has edited a message\n**Before**: {before.content}\n**After**: {after.content}',
             colour=discord.Colour.green(),
             timestamp=datetime.datetime.now()
         )
@@ -244,11 +342,7 @@ class Moderation(commands.Cog):
         await send_webhook(channel, embed, self.bot)
 
         if after.embeds:
-            webhooks = await channel.webhooks()
-            webhook = discord.utils.get(webhooks, name=f'{self.bot.user.name} Logging')
-            if webhook is None:
-                webhook = await channel.create_webhook(name=f'{self.bot.user.name} Logging')
-            await webhook.send('Edited message contains embeds', embeds=after.embeds)
+            await send_webhook(channel, None, self.bot, content='Edited message contains embeds', embeds=after.embeds)
 
     @commands.Cog.listener()
     async def on_member_ban(self, guild: discord.Guild, user: discord.User) -> None:
@@ -264,7 +358,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(guild.id, ModlogEvent.BANS):  # Check if modlog is enabled
             return
 
         # Get modlog channel
@@ -297,7 +391,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(guild.id, ModlogEvent.BANS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(guild)  # Get modlog channel
@@ -327,7 +421,11 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(channel.guild.id):  # Check if modlog is enabled
+        # Keep the muted role muted in the new channel
+        with contextlib.suppress(discord.HTTPException):
+            await muted_roles.apply(channel)
+
+        if not modlog_enabled(channel.guild.id, ModlogEvent.CHANNELS):  # Check if modlog is enabled
             return
 
         mod_channel = get_mod_channel(channel.guild)  # Get modlog channel
@@ -357,7 +455,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(channel.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(channel.guild.id, ModlogEvent.CHANNELS):  # Check if modlog is enabled
             return
 
         mod_channel = get_mod_channel(channel.guild)  # Get modlog channel
@@ -389,7 +487,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(before.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(before.guild.id, ModlogEvent.CHANNELS):  # Check if modlog is enabled
             return
 
         mod_channel = get_mod_channel(before.guild)  # Get modlog channel
@@ -416,12 +514,7 @@ class Moderation(commands.Cog):
         embed.set_footer(text=f'ID: {before.id}')
 
         # Send webhook
-        webhooks = await mod_channel.webhooks()
-        webhook = discord.utils.get(webhooks, name=f'{self.bot.user.name} Logging')
-        if webhook is None:
-            webhook = await mod_channel.create_webhook(name=f'{self.bot.user.name} Logging')
-        await webhook.send(embed=embed, username=f'{self.bot.user.name} Logging',
-                           avatar_url=self.bot.user.avatar.url)
+        await send_webhook(mod_channel, embed, self.bot)
 
     @commands.Cog.listener()
     async def on_guild_role_create(self, role: discord.Role) -> None:
@@ -435,7 +528,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(role.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(role.guild.id, ModlogEvent.ROLES):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(role.guild)  # Get modlog channel
@@ -463,7 +556,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(role.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(role.guild.id, ModlogEvent.ROLES):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(role.guild)  # Get modlog channel
@@ -493,7 +586,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(before.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(before.guild.id, ModlogEvent.ROLES):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(before.guild)  # Get the modlog channel
@@ -551,7 +644,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(before.id):  # Check if modlog is enabled
+        if not modlog_enabled(before.id, ModlogEvent.SERVER):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(before)  # Get the modlog channel
@@ -587,12 +680,7 @@ class Moderation(commands.Cog):
             embed.set_footer(text=f'ID: {before.id}')
 
         # Send webhook
-        webhooks = await channel.webhooks()
-        webhook = discord.utils.get(webhooks, name=f'{self.bot.user.name} Logging')
-        if webhook is None:
-            webhook = await channel.create_webhook(name=f'{self.bot.user.name} Logging')
-        await webhook.send(embeds=embeds, username=f'{self.bot.user.name} Logging',
-                           avatar_url=self.bot.user.avatar.url)
+        await send_webhook(channel, None, self.bot, embeds=embeds)
 
     @commands.Cog.listener()
     async def on_guild_emojis_update(self, guild: discord.Guild, before: list[discord.Emoji],
@@ -611,7 +699,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(guild.id, ModlogEvent.SERVER):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(guild)
@@ -650,7 +738,7 @@ class Moderation(commands.Cog):
     @commands.Cog.listener()
     async def on_voice_state_update(self, member: discord.Member, before: discord.VoiceState,
                                     after: discord.VoiceState) -> None:
-        if not modlog_enabled(member.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(member.guild.id, ModlogEvent.VOICE):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(member.guild)
@@ -674,11 +762,7 @@ class Moderation(commands.Cog):
 
         if embed.description:
             # Send webhook
-            webhooks = await channel.webhooks()
-            webhook = discord.utils.get(webhooks, name=f'{self.bot.user.name} Logging')
-            if webhook is None:
-                webhook = await channel.create_webhook(name=f'{self.bot.user.name} Logging')
-            await webhook.send(embed=embed, username=f'{self.bot.user.name} Logging', avatar_url=self.bot.user.avatar.url)
+            await send_webhook(channel, embed, self.bot)
 
     @commands.Cog.listener()
     async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
@@ -695,7 +779,7 @@ class Moderation(commands.Cog):
         :rtype: None
         """
         # sourcery skip: low-code-quality
-        if not modlog_enabled(before.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(before.guild.id, ModlogEvent.MEMBERS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(before.guild)  # Get the modlog channel
@@ -731,11 +815,7 @@ class Moderation(commands.Cog):
             embed.set_footer(text=f'ID: {before.id}')
 
             # Send webhook
-            webhooks = await channel.webhooks()
-            webhook = discord.utils.get(webhooks, name=f'{self.bot.user.name} Logging')
-            if webhook is None:
-                webhook = await channel.create_webhook(name=f'{self.bot.user.name} Logging')
-            await webhook.send(embed=embed, username=f'{self.bot.user.name} Logging', avatar_url=self.bot.user.avatar.url)
+            await send_webhook(channel, embed, self.bot)
 
         if before.nick != after.nick:  # Check if nickname was changed
             # Make embed
@@ -752,11 +832,7 @@ class Moderation(commands.Cog):
             embed.set_footer(text=f'ID: {before.id}')
 
             # Send webhook
-            webhooks = await channel.webhooks()
-            webhook = discord.utils.get(webhooks, name=f'{self.bot.user.name} Logging')
-            if webhook is None:
-                webhook = await channel.create_webhook(name=f'{self.bot.user.name} Logging')
-            await webhook.send(embed=embed, username=f'{self.bot.user.name} Logging', avatar_url=self.bot.user.avatar.url)
+            await send_webhook(channel, embed, self.bot)
 
     @commands.Cog.listener()
     async def on_user_update(self, before: discord.User, after: discord.User) -> None:
@@ -772,6 +848,12 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
+        # The guilds of the user which log member events
+        guilds = [guild for guild in self.bot.guilds
+                  if modlog_enabled(guild.id, ModlogEvent.MEMBERS) and guild.get_member(before.id)]
+        if not guilds:
+            return
+
         embeds = []
         # Make embed
         if before.name != after.name:
@@ -806,23 +888,15 @@ class Moderation(commands.Cog):
         if not embeds:
             return
 
-        for guild in list(filter(lambda g: before in g.members, self.bot.guilds)):
-            if not modlog_enabled(guild.id):
-                continue
+        for embed in embeds:
+            embed.set_author(name=after.name, icon_url=after.display_avatar.url)
+            embed.set_footer(text=f'ID: {before.id}')
 
+        for guild in guilds:
             channel = get_mod_channel(guild)
 
-            for embed in embeds:
-                embed.set_author(name=after.name, icon_url=after.display_avatar.url)
-                embed.set_footer(text=f'ID: {before.id}')
-
             # Send webhook
-            webhooks = await guild.webhooks()
-            webhook = discord.utils.get(webhooks, name=f'{self.bot.user.name} Logging')
-            if webhook is None:
-                webhook = await channel.create_webhook(name=f'{self.bot.user.name} Logging')
-            await webhook.send(embeds=embeds, username=f'{self.bot.user.name} Logging',
-                               avatar_url=self.bot.user.avatar.url)
+            await send_webhook(channel, None, self.bot, embeds=embeds)
 
     @commands.Cog.listener()
     async def on_bulk_message_delete(self, messages: list[discord.Message]) -> None:
@@ -836,26 +910,37 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(messages[0].guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(messages[0].guild.id, ModlogEvent.MESSAGES):  # Check if modlog is enabled
             return
 
-        channel = get_mod_channel(messages[0].guild)  # Get modlog channel
+        if purge_engine.suppressed(messages[0].id):  # A batch of a purge, which is logged as a whole
+            return
 
-        # Make embed
-        embed = discord.Embed(
-            title=f'{len(messages)} messages purged in #{messages[0].channel}',
-            description='',
-            colour=discord.Colour.red(),
-            timestamp=datetime.datetime.now()
-        )
-        for message in messages:
-            content = message.content.replace("''", "'")
-            embed.description += f'{message.author.mention}: {content}\n'
+        await send_webhook(get_mod_channel(messages[0].guild), purge_embed(messages[0].channel, messages), self.bot)
 
-        embed.set_author(name=messages[0].guild.name, icon_url=messages[0].guild.icon or discord.Embed.Empty)
+    @commands.Cog.listener()
+    async def on_purge_complete(self, channel: discord.TextChannel, messages: list[discord.Message],
+                                moderator: discord.Member) -> None:
+        """
+        Event listener for when the clear command finishes purging a channel
+        
+        :param channel: The channel that was purged
+        :param messages: The messages that were deleted
+        :param moderator: The member who purged the channel
+        
+        :type channel: discord.TextChannel
+        :type messages: list[discord.Message]
+        :type moderator: discord.Member
+        
+        :return: None
+        :rtype: None
+        """
+        if not messages or not modlog_enabled(channel.guild.id, ModlogEvent.MESSAGES):  # Check if modlog is enabled
+            return
 
-        # Send webhook
-        await send_webhook(channel, embed, self.bot)
+        embed = purge_embed(channel, messages)
+        embed.set_footer(text=f'Purged by {moderator}')
+        await send_webhook(get_mod_channel(channel.guild), embed, self.bot)
 
     @commands.Cog.listener()
     async def on_guild_stickers_update(self, guild: discord.Guild, before: list[discord.Sticker],
@@ -874,7 +959,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(guild.id, ModlogEvent.SERVER):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(guild)
@@ -916,7 +1001,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(thread.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(thread.guild.id, ModlogEvent.THREADS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(thread.guild)  # Get the modlog channel
@@ -945,7 +1030,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(thread.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(thread.guild.id, ModlogEvent.THREADS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(thread.guild)  # Get the modlog channel
@@ -976,7 +1061,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(before.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(before.guild.id, ModlogEvent.THREADS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(before.guild)  # Get the modlog channel
@@ -1013,7 +1098,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(thread.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(thread.guild.id, ModlogEvent.THREADS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(thread.guild)  # Get the modlog channel
@@ -1042,7 +1127,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(thread.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(thread.guild.id, ModlogEvent.THREADS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(thread.guild)  # Get the modlog channel
@@ -1071,7 +1156,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(member.thread.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(member.thread.guild.id, ModlogEvent.THREADS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(member.thread.guild)
@@ -1100,7 +1185,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(member.thread.guild.id):
+        if not modlog_enabled(member.thread.guild.id, ModlogEvent.THREADS):
             return
 
         channel = get_mod_channel(member.thread.guild)
@@ -1129,7 +1214,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(invite.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(invite.guild.id, ModlogEvent.INVITES):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(invite.guild)  # Get the modlog channel
@@ -1158,7 +1243,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(invite.guild.id):
+        if not modlog_enabled(invite.guild.id, ModlogEvent.INVITES):
             return
 
         channel = get_mod_channel(invite.guild)  # Get the modlog channel
@@ -1187,7 +1272,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(event.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(event.guild.id, ModlogEvent.SCHEDULED_EVENTS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(event.guild)  # Get the modlog channel
@@ -1217,7 +1302,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(event.guild.id):  # Check if modlog is enabled
+        if not modlog_enabled(event.guild.id, ModlogEvent.SCHEDULED_EVENTS):  # Check if modlog is enabled
             return
 
         channel = get_mod_channel(event.guild)  # Get the modlog channel
@@ -1248,7 +1333,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(event.guild.id):
+        if not modlog_enabled(event.guild.id, ModlogEvent.SCHEDULED_EVENTS):
             return
 
         channel = get_mod_channel(event.guild)  # Get the modlog channel
@@ -1279,7 +1364,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(event.guild.id):
+        if not modlog_enabled(event.guild.id, ModlogEvent.SCHEDULED_EVENTS):
             return
 
         channel = get_mod_channel(event.guild)  # Get the modlog channel
@@ -1308,7 +1393,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(channel.guild.id):
+        if not modlog_enabled(channel.guild.id, ModlogEvent.SERVER):
             return
 
         mod_channel = get_mod_channel(channel.guild)  # Get the modlog channel
@@ -1337,7 +1422,7 @@ class Moderation(commands.Cog):
         :return: None
         :rtype: None
         """
-        if not modlog_enabled(integration.guild.id):
+        if not modlog_enabled(integration.guild.id, ModlogEvent.SERVER):
             return
 
         mod_channel = get_mod_channel(integration.guild)  # Get the modlog channel
@@ -1574,17 +1659,13 @@ class Moderation(commands.Cog):
             return
 
         guild = ctx.guild
-        muted_role = discord.utils.get(guild.roles, name='Muted')  # Get the muted role
-
-        if not muted_role:
-            muted_role = await guild.create_role(name='Muted')  # Create a muted role if not present
-            for channel in guild.channels:
-                await channel.set_permissions(muted_role, speak=False,
-                                              send_messages=False)  # Set permissions of the muted role
+        muted_role = await get_muted_role(ctx)  # Get the muted role, create it if not present
 
         # Mute users
         try:
             await member.add_roles(muted_role, reason=reason)  # Add muted role
+            # The mute is permanent, a pending unmute of an earlier tempmute must not lift it
+            await scheduler.cancel(AsyncSQL(os.getenv('sql_db_name')), guild.id, member.id, 'unmute')
             await send_embed(ctx, description=f'{member} has been muted for {reason}', colour=discord.Colour.red())
             with contextlib.suppress(discord.HTTPException):  # A DM cannot be sent to a bot, hence the suppression
                 await member.send(f'You were muted in {guild.name} for {reason}')
@@ -1649,11 +1730,7 @@ class Moderation(commands.Cog):
             return
 
         guild = ctx.guild
-        muted_role = discord.utils.get(guild.roles, name='Muted')  # Get the muted role
-        if not muted_role:
-            muted_role = await guild.create_role(name='Muted')
-            for channel in guild.channels:
-                await channel.set_permissions(muted_role, speak=False, send_messages=False)
+        muted_role = await get_muted_role(ctx)  # Get the muted role, create it if not present
 
         # Mute user
         try:
@@ -1664,12 +1741,10 @@ class Moderation(commands.Cog):
             with contextlib.suppress(discord.HTTPException):  # A DM cannot be sent to a bot, hence the suppression
                 await member.send(f'You were muted in {guild.name} for {reason} for {duration} seconds')
 
-            await asyncio.sleep(duration * 60)
-            await member.remove_roles(muted_role, reason=reason)
-
-            await send_embed(ctx, description=f'{member} has been unmuted', colour=discord.Colour.green())
-            with contextlib.suppress(discord.HTTPException):  # A DM cannot be sent to a bot, hence the suppression
-                await member.send(f'You were unmuted in {guild.name}')
+            # The scheduler unmutes the member, even if the bot restarts meanwhile
+            due_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=duration)
+            await scheduler.schedule(AsyncSQL(os.getenv('sql_db_name')),
+                                     ScheduledAction(guild.id, member.id, 'unmute', due_at, ctx.channel.id, reason))
 
         except discord.Forbidden:  # Permission error
             await send_embed(ctx, description='I do not have permission to perform this action!')
@@ -1727,11 +1802,12 @@ class Moderation(commands.Cog):
             await send_embed(ctx, description='You cannot unmute this user', colour=discord.Colour.red())
             return
 
-        muted_role = discord.utils.get(ctx.guild.roles, name='Muted')  # Get muted role
+        muted_role = muted_roles.get(ctx.guild)  # Get muted role
 
         # Unmute user
         try:
             await member.remove_roles(muted_role)  # Remove role
+            await scheduler.cancel(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id, member.id, 'unmute')
             await send_embed(ctx, description=f'{member} was unmuted', colour=discord.Colour.green())
             with contextlib.suppress(discord.HTTPException):  # A DM cannot be sent to a bot, hence the suppression
                 await member.send(f'You have been unmuted in {ctx.guild.name}')
@@ -1809,9 +1885,10 @@ class Moderation(commands.Cog):
 
         # Update modlogs channel in database if provided channel was used for modlogs
         if sql.select(elements=['*'], table='modlogs',
-                      where=f"guild_id = '{ctx.guild.id}' AND channel_id = '{nuke_channel.id}'"):
-            sql.update(table='modlogs', column='channel_id', value=f"'{new_channel.id}'",
-                       where=f"guild_id = '{ctx.guild.id}' AND channel_id = '{nuke_channel.id}'")
+                      where={'guild_id': ctx.guild.id, 'channel_id': nuke_channel.id}):
+            sql.update(table='modlogs', column='channel_id', value=new_channel.id,
+                       where={'guild_id': ctx.guild.id, 'channel_id': nuke_channel.id})
+            await guild_configs.refresh(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id)
             await new_channel.send(f'{new_channel.mention} will now be the modlogs channel!')
 
     # Nuke error response
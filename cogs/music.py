@@ -8,7 +8,7 @@ import os
 import asyncio
 import datetime
 import lyrics_extractor
-from sql_tools import SQL
+from sql_tools import SQL, AsyncSQL
 from discord.ext import commands
 from discord.ext.commands import CommandError
 from tools import send_error_embed, get_video_stats, format_time, inform_owner
@@ -81,6 +81,7 @@ class Music(commands.Cog):
         self.music_view: dict[int, MusicView | None] = {}  # Stores the view object for each guild
         self.loop_limit: dict[int, int | None] = {}  # Stores the number of times the track must be looped
         self.sql: SQL = SQL(os.getenv('sql_db_name'))
+        self.async_sql: AsyncSQL = AsyncSQL(os.getenv('sql_db_name'))  # Used by listeners
         self._ydl_options: dict[str, bool | str] = {
             "format": "bestaudio/best",
             "outtmpl": "%(extractor)s-%(id)s-%(title)s.%(ext)s",
@@ -138,9 +139,10 @@ class Music(commands.Cog):
                 del self.music_view[member.guild.id]
                 del self.loop_limit[member.guild.id]
 
-            self.sql.delete('queue', f"guild_id = '{member.guild.id}'")
-            self.sql.delete('loop', f"guild_id = '{member.guild.id}'")
-            self.sql.delete('playlist', f"guild_id = '{member.guild.id}'")
+            async with self.async_sql.transaction() as transaction:
+                transaction.delete('queue', {'guild_id': member.guild.id})
+                transaction.delete('loop', {'guild_id': member.guild.id})
+                transaction.delete('playlist', {'guild_id': member.guild.id})
 
         # Move to author's voice channel
         elif before.channel and not list(filter(lambda m: not m.bot, vc.channel.members)):
@@ -207,18 +209,18 @@ class Music(commands.Cog):
 
         if self.loop_limit[ctx.guild.id] == 0:
             self.loop_limit[ctx.guild.id] = None
-            self.sql.delete('loop', f"guild_id = '{ctx.guild.id}'")
+            self.sql.delete('loop', {'guild_id': ctx.guild.id})
 
         # Loop track
-        if self.sql.select(elements=['*'], table='loop', where=f"guild_id = '{ctx.guild.id}'"):
-            track = self.sql.select(elements=['title', 'url'], table='loop', where=f"guild_id = '{ctx.guild.id}'")[0]
+        if self.sql.select(elements=['*'], table='loop', where={'guild_id': ctx.guild.id}):
+            track = self.sql.select(elements=['title', 'url'], table='loop', where={'guild_id': ctx.guild.id})[0]
             embed = discord.Embed(title='Now Playing', description=f"[{track[0]}]({track[1]})",
                                   colour=discord.Colour.green())
             view = MusicView(ctx, self.bot, ctx.guild.voice_client, track[0][0], timeout=None)
 
         # Queued track
-        elif self.sql.select(elements=['*'], table='queue', where=f"guild_id = '{ctx.guild.id}'"):
-            track = self.sql.select(elements=['title', 'url'], table='queue', where=f"guild_id = '{ctx.guild.id}'")[0]
+        elif self.sql.select(elements=['*'], table='queue', where={'guild_id': ctx.guild.id}):
+            track = self.sql.select(elements=['title', 'url'], table='queue', where={'guild_id': ctx.guild.id})[0]
             embed = discord.Embed(title='Now Playing', description=f"[{track[0]}]({track[1]})",
                                   colour=discord.Colour.green())
             view = MusicView(ctx, self.bot, ctx.guild.voice_client, track[0][0], timeout=None)
@@ -287,7 +289,7 @@ class Music(commands.Cog):
             return
 
         if playlist_track := self.sql.select(elements=['source', 'title', 'url', 'position'], table='playlist',
-                                             where=f"guild_id = '{ctx.guild.id}'"):
+                                             where={'guild_id': ctx.guild.id}):
             # Update index properly
             index = 0
             for track_details in playlist_track:
@@ -301,9 +303,9 @@ class Music(commands.Cog):
                 index = 0
 
             # Update database
-            self.sql.update('loop', 'source', f"'{playlist_track[index][0]}'", f"guild_id = '{ctx.guild.id}'")
-            self.sql.update('loop', 'title', f"'{playlist_track[index][1]}'", f"guild_id = '{ctx.guild.id}'")
-            self.sql.update('loop', 'url', f"'{playlist_track[index][2]}'", f"guild_id = '{ctx.guild.id}'")
+            self.sql.update('loop', 'source', playlist_track[index][0], {'guild_id': ctx.guild.id})
+            self.sql.update('loop', 'title', playlist_track[index][1], {'guild_id': ctx.guild.id})
+            self.sql.update('loop', 'url', playlist_track[index][2], {'guild_id': ctx.guild.id})
 
     def play_next(self, ctx: commands.Context):  # sourcery skip: extract-method
         """
@@ -319,8 +321,8 @@ class Music(commands.Cog):
         vc = ctx.guild.voice_client  # Get the voice client
         self.update_playlist(ctx)  # Update the playlist to be looped if it exists
         asyncio.run_coroutine_threadsafe(self._send_embed_after_track(ctx), self.bot.loop)  # Send the embed
-        if self.sql.select(['title'], 'queue', f"guild_id = '{ctx.guild.id}'") or self.sql.select(['title'], 'loop',
-                                                                                                  f"guild_id = '{ctx.guild.id}'"):  # Check if there are any tracks queued or looped
+        if self.sql.select(['title'], 'queue', {'guild_id': ctx.guild.id}) or self.sql.select(['title'], 'loop',
+                                                                                                  {'guild_id': ctx.guild.id}):  # Check if there are any tracks queued or looped
             self._play_next(ctx, vc)
         else:
             # If no track is present to play, all the variables store None
@@ -346,8 +348,8 @@ class Music(commands.Cog):
         """
         # Get the url to be played from the loop or queue table
         track = self.sql.select(elements=['source', 'title', 'url'], table='loop',
-                                where=f"guild_id = '{ctx.guild.id}'") or self.sql.select(
-            elements=['source', 'title', 'url'], table='queue', where=f"guild_id = '{ctx.guild.id}'")
+                                where={'guild_id': ctx.guild.id}) or self.sql.select(
+            elements=['source', 'title', 'url'], table='queue', where={'guild_id': ctx.guild.id})
 
         m_url = track[0][0]
         self.now_playing[ctx.guild.id] = track[0][1]
@@ -360,10 +362,8 @@ class Music(commands.Cog):
         vc.source = discord.PCMVolumeTransformer(vc.source, volume=self.volume[ctx.guild.id] / 100)
 
         # Delete the track from the queue
-        if not self.sql.select(elements=['*'], table='loop', where=f"guild_id = '{ctx.guild.id}'"):
-            title = track[0][1]
-            title = title.replace("'", "''")
-            self.sql.delete(table='queue', where=f"guild_id = '{ctx.guild.id}' AND title = '{title}'")
+        if not self.sql.select(elements=['*'], table='loop', where={'guild_id': ctx.guild.id}):
+            self.sql.delete(table='queue', where={'guild_id': ctx.guild.id, 'title': track[0][1]})
 
     async def play_music(self, ctx: commands.Context):
         """
@@ -379,12 +379,12 @@ class Music(commands.Cog):
         vc = ctx.guild.voice_client  # Get the voice client
         voice_channel = ctx.author.voice.channel  # Get the voice channel
 
-        if track := self.sql.select(['source', 'title', 'url'], 'loop', f"guild_id = '{ctx.guild.id}'"):
+        if track := self.sql.select(['source', 'title', 'url'], 'loop', {'guild_id': ctx.guild.id}):
             self.start_time[ctx.guild.id] = datetime.datetime.now()
         else:
             track = \
                 self.sql.select(elements=['source', 'title', 'url'], table='queue',
-                                where=f"guild_id = '{ctx.guild.id}'")
+                                where={'guild_id': ctx.guild.id})
 
         m_url = track[0][0]
         self.now_playing[ctx.guild.id] = track[0][1]
@@ -403,10 +403,8 @@ class Music(commands.Cog):
         vc.source = discord.PCMVolumeTransformer(vc.source, volume=self.volume[ctx.guild.id] / 100)
 
         # Delete the track as it is being played
-        if not self.sql.select(elements=['*'], table='loop', where=f"guild_id = '{ctx.guild.id}'"):
-            title = track[0][1]
-            title = title.replace("'", "''")
-            self.sql.delete(table='queue', where=f"guild_id = '{ctx.guild.id}' AND title = '{title}'")
+        if not self.sql.select(elements=['*'], table='loop', where={'guild_id': ctx.guild.id}):
+            self.sql.delete(table='queue', where={'guild_id': ctx.guild.id, 'title': track[0][1]})
 
     @commands.command(aliases=['j', 'summon'], description='Joins the voice channel you are in', usage='join')
     async def join(self, ctx: commands.Context):
@@ -494,21 +492,17 @@ class Music(commands.Cog):
                 self.volume[ctx.guild.id] = 100
             if ctx.guild.id not in self.loop_limit:
                 self.loop_limit[ctx.guild.id] = None
-            song["title"] = song["title"].replace("'", "''")  # Single quotes cause problems
-
             self.sql.insert(
                 table='queue',
                 columns=['guild_id', 'source', 'title', 'url'],
                 values=[
-                    f"'{ctx.guild.id}'",
-                    f"'{song['source']}'",
-                    f"'{song['title']}'",
-                    f"'{song['url']}'"
+                    ctx.guild.id,
+                    song['source'],
+                    song['title'],
+                    song['url']
                 ]
             )
 
-            song['title'] = song['title'].replace("''", "'")
-
         await self._send_confirmation(ctx, song)
 
         if not ctx.voice_client.is_playing():
@@ -566,13 +560,13 @@ class Music(commands.Cog):
         embed.set_author(name=self.bot.user.name, icon_url=self.bot.user.avatar.url)
 
         # Playlist
-        if track := self.sql.select(elements=['title', 'url'], table='playlist', where=f"guild_id = '{ctx.guild.id}'"):
+        if track := self.sql.select(elements=['title', 'url'], table='playlist', where={'guild_id': ctx.guild.id}):
             embed.title = 'Looping Playlist'
             for index, song in enumerate(track):
                 embed.add_field(name=f'Track Number {index + 1}', value=f'[{song[0]}]({song[1]})', inline=False)
 
         # Looping
-        elif track := self.sql.select(elements=['title', 'url'], table='loop', where=f"guild_id = '{ctx.guild.id}'"):
+        elif track := self.sql.select(elements=['title', 'url'], table='loop', where={'guild_id': ctx.guild.id}):
             embed.add_field(
                 name='Looping',
                 value=f'[{track[0][0]}]({track[0][1]})'
@@ -584,7 +578,7 @@ class Music(commands.Cog):
 
         # Queue
         else:
-            queue = self.sql.select(elements=['title', 'url'], table='queue', where=f"guild_id = '{ctx.guild.id}'")
+            queue = self.sql.select(elements=['title', 'url'], table='queue', where={'guild_id': ctx.guild.id})
             embed.add_field(name='Now Playing:',
                             value=f'[{self.now_playing[ctx.guild.id]}]({self.now_playing_url[ctx.guild.id]})',
                             inline=False)
@@ -823,9 +817,10 @@ class Music(commands.Cog):
         await ctx.send(embed=embed)
 
         # Clearing the queue for the guild
-        self.sql.delete(table='queue', where=f"guild_id = '{ctx.guild.id}'")
-        self.sql.delete(table='loop', where=f"guild_id = '{ctx.guild.id}'")
-        self.sql.delete(table='playlist', where=f"guild_id = '{ctx.guild.id}'")
+        with self.sql.transaction() as transaction:
+            transaction.delete(table='queue', where={'guild_id': ctx.guild.id})
+            transaction.delete(table='loop', where={'guild_id': ctx.guild.id})
+            transaction.delete(table='playlist', where={'guild_id': ctx.guild.id})
 
         # Stopping the player
         vc.stop()
@@ -893,9 +888,10 @@ class Music(commands.Cog):
             del self.loop_limit[ctx.guild.id]
 
         # Clearing the queue for the guild
-        self.sql.delete(table='queue', where=f"guild_id = '{ctx.guild.id}'")
-        self.sql.delete(table='loop', where=f"guild_id = '{ctx.guild.id}'")
-        self.sql.delete(table='playlist', where=f"guild_id = '{ctx.guild.id}'")
+        with self.sql.transaction() as transaction:
+            transaction.delete(table='queue', where={'guild_id': ctx.guild.id})
+            transaction.delete(table='loop', where={'guild_id': ctx.guild.id})
+            transaction.delete(table='playlist', where={'guild_id': ctx.guild.id})
 
     @disconnect.error
     async def disconnect_error(self, ctx: commands.Context, error: commands.CommandError):
@@ -1045,7 +1041,7 @@ class Music(commands.Cog):
         if vc.channel != ctx.author.voice.channel:
             raise AuthorInDifferentVoiceChannel('You are not connected to the same voice channel as the player')
 
-        queue_len = len(self.sql.select(elements=['title'], table='queue', where=f"guild_id = '{ctx.guild.id}'"))
+        queue_len = len(self.sql.select(elements=['title'], table='queue', where={'guild_id': ctx.guild.id}))
         if queue_len == 0:
             raise NoTrack('There are no tracks in the queue')
         if track_number < 1 or track_number > queue_len:
@@ -1053,17 +1049,16 @@ class Music(commands.Cog):
 
         # Removing the track from the queue
         remove = self.sql.select(elements=['title', 'url', 'source'], table='queue',
-                                 where=f"guild_id = '{ctx.guild.id}'")
-        remove_title = remove[track_number - 1][0].replace("'", "''")
+                                 where={'guild_id': ctx.guild.id})
+        remove_title = remove[track_number - 1][0]
         remove_url = remove[track_number - 1][1]
         if len(remove) > 1:
             self.sql.delete(table='queue',
-                            where=f"guild_id = '{ctx.guild.id}' AND source = '{remove[track_number - 1][2]}' AND title = '{remove_title}'")
+                            where={'guild_id': ctx.guild.id, 'source': remove[track_number - 1][2], 'title': remove_title})
         else:
-            self.sql.delete(table='queue', where=f"guild_id = '{ctx.guild.id}' AND title = '{remove_title}'")
+            self.sql.delete(table='queue', where={'guild_id': ctx.guild.id, 'title': remove_title})
 
         # Response embed
-        remove_title = remove_title.replace("''", "'")
         embed = discord.Embed(description=f'Removed **[{remove_title}]({remove_url})** from the queue',
                               colour=discord.Colour.random())
         await ctx.send(embed=embed)
@@ -1223,7 +1218,7 @@ class Music(commands.Cog):
             raise AuthorInDifferentVoiceChannel('You are not connected to the same voice channel as the player')
 
         # Check if loop is already enabled
-        if self.sql.select(['*'], 'loop', f"guild_id = '{ctx.guild.id}'"):
+        if self.sql.select(['*'], 'loop', {'guild_id': ctx.guild.id}):
             await ctx.respond('Loop is already enabled!', ephemeral=True)
             return
 
@@ -1232,23 +1227,21 @@ class Music(commands.Cog):
         # Insert only in loop
         if mode == 'Track':
             self.sql.insert('loop', ['guild_id', 'source', 'title', 'url'],
-                            [f"'{ctx.guild.id}'", f"'{self.source[ctx.guild.id]}'",
-                             f"'{self.now_playing[ctx.guild.id]}'", f"'{self.now_playing_url[ctx.guild.id]}'"])
+                            [ctx.guild.id, self.source[ctx.guild.id],
+                             self.now_playing[ctx.guild.id], self.now_playing_url[ctx.guild.id]])
 
         # Insert in playlist and loop
         else:
-            items = self.sql.select(['source', 'title', 'url'], 'queue', f"guild_id='{ctx.guild.id}'")
+            items = self.sql.select(['source', 'title', 'url'], 'queue', {'guild_id': ctx.guild.id})
             self.sql.insert('loop', ['guild_id', 'source', 'title', 'url'],
-                            [f"'{ctx.guild.id}'", f"'{self.source[ctx.guild.id]}'",
-                             f"'{self.now_playing[ctx.guild.id]}'", f"'{self.now_playing_url[ctx.guild.id]}'"])
+                            [ctx.guild.id, self.source[ctx.guild.id],
+                             self.now_playing[ctx.guild.id], self.now_playing_url[ctx.guild.id]])
 
-            self.sql.insert('playlist', ['guild_id', 'source', 'title', 'url', 'position'],
-                            [f"'{ctx.guild.id}'", f"'{self.source[ctx.guild.id]}'",
-                             f"'{self.now_playing[ctx.guild.id]}'", f"'{self.now_playing_url[ctx.guild.id]}'", "'0'"])
-
-            for index, item in enumerate(items):
-                self.sql.insert('playlist', ['guild_id', 'source', 'title', 'url', 'position'],
-                                [f"'{ctx.guild.id}'", f"'{item[0]}'", f"'{item[1]}'", f"'{item[2]}'", f"'{index + 1}'"])
+            # The current track is at position 0, followed by the queue
+            rows = [[ctx.guild.id, self.source[ctx.guild.id],
+                     self.now_playing[ctx.guild.id], self.now_playing_url[ctx.guild.id], 0]]
+            rows.extend([ctx.guild.id, item[0], item[1], item[2], index + 1] for index, item in enumerate(items))
+            self.sql.insert_many('playlist', ['guild_id', 'source', 'title', 'url', 'position'], rows)
 
         await ctx.respond(
             embed=discord.Embed(description=f'Loop enabled for {mode}', colour=discord.Colour.blue()).set_footer(
@@ -1307,17 +1300,15 @@ class Music(commands.Cog):
             raise AuthorInDifferentVoiceChannel('You are not connected to the same voice channel as the player')
 
         # Check if loop is enabled first
-        if not self.sql.select(['*'], 'loop', f"guild_id = '{ctx.guild.id}'"):
+        if not self.sql.select(['*'], 'loop', {'guild_id': ctx.guild.id}):
             await ctx.respond('Loop is not enabled!', ephemeral=True)
             return
 
         # Delete from database
-        sources = self.sql.select(['source'], 'queue', f"guild_id = '{ctx.guild.id}'")
-        for source in sources:
-            self.sql.delete('queue', f"guild_id = '{ctx.guild.id}' AND source = '{source[0]}'")
-
-        self.sql.delete('loop', f"guild_id = '{ctx.guild.id}'")
-        self.sql.delete('playlist', f"guild_id = '{ctx.guild.id}'")
+        with self.sql.transaction() as transaction:
+            transaction.delete('queue', {'guild_id': ctx.guild.id})
+            transaction.delete('loop', {'guild_id': ctx.guild.id})
+            transaction.delete('playlist', {'guild_id': ctx.guild.id})
 
         # Delete from memory
         del self.loop_limit[ctx.guild.id]
@@ -301,6 +301,43 @@ class Owner(commands.Cog):
         """
         await ctx.send(embed=discord.Embed(description=str(e)))
 
+    @commands.command(name='poolstats', aliases=['ps'], hidden=True)
+    @commands.is_owner()
+    async def poolstats(self, ctx: commands.Context):
+        """
+        Sends the statistics of the database connection pool
+
+        :param ctx: The context of the command
+
+        :type ctx: commands.Context
+
+        :return: None
+        :rtype: None
+        """
+        stats = SQL(os.getenv('sql_db_name')).pool_stats()
+        await ctx.reply(
+            embed=discord.Embed(
+                title='Connection pool',
+                description='\n'.join(f'**{key}**: {value}' for key, value in stats.items())
+            )
+        )
+
+    @poolstats.error
+    async def poolstats_error(self, ctx: commands.Context, e: commands.CommandError):
+        """
+        Handles errors for the poolstats command
+
+        :param ctx: The context of the command
+        :param e: The error raised
+
+        :type ctx: commands.Context
+        :type e: commands.CommandError
+
+        :return: None
+        :rtype: None
+        """
+        await ctx.send(embed=discord.Embed(description=str(e)))
+
 
 def setup(bot: commands.Bot):
     bot.add_cog(Owner(bot))
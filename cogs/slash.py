@@ -4,11 +4,14 @@ import discord
 import datetime
 import requests
 import os
-import asyncio
 from discord.ext import commands
 from discord.commands import Option, SlashCommandGroup
 from tools import convert_to_unix_time, inform_owner
-from sql_tools import SQL
+from sql_tools import SQL, AsyncSQL
+from cache import prefixes, guild_configs, ModlogEvent
+from triggers import triggers, MATCH_TYPES
+from scheduler import scheduler, ScheduledAction
+from muted_role import muted_roles
 from googleapiclient.discovery import build
 from PIL import Image, ImageChops, UnidentifiedImageError
 from ui_components import EmbedView, MessageresponseView, ClearView
@@ -50,8 +53,7 @@ class Slash(commands.Cog):
             await ctx.respond('Prefix must be 2 characters or less')
             return
 
-        sql = SQL(os.getenv('sql_db_name'))  # type: SQL
-        sql.update(table='prefixes', column='prefix', value=f'\'{new_prefix}\'', where=f'guild_id=\'{ctx.guild.id}\'')
+        await prefixes.set(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id, new_prefix)
         await ctx.respond(f'Prefix changed to **{new_prefix}**')
 
     @prefix.error
@@ -236,7 +238,7 @@ class Slash(commands.Cog):
 
         # Check if the channel has already been added
         if sql.select(elements=['*'], table='youtube',
-                      where=f"guild_id='{ctx.guild.id}' and channel_id = '{youtube_channel_id}'"):
+                      where={'guild_id': ctx.guild.id, 'channel_id': youtube_channel_id}):
             await ctx.respond('Channel already added', ephemeral=True)
             return
 
@@ -245,15 +247,15 @@ class Slash(commands.Cog):
         latest_video_id = youtube.playlistItems().list(
             playlistId=channel['items'][0]['contentDetails']['relatedPlaylists']['uploads'],
             part='contentDetails').execute()['items'][0]['contentDetails']['videoId']
-        channel_name = channel['items'][0]['snippet']['title'].replace("'", "''")
+        channel_name = channel['items'][0]['snippet']['title']
 
         # Insert into database
         sql.insert(table='youtube',
                    columns=['guild_id', 'text_channel_id', 'channel_id', 'channel_name', 'latest_video_id',
                             'ping_role'],
-                   values=[f"'{ctx.guild.id}'", f"'{text_channel.id}'", f"'{channel['items'][0]['id']}'",
-                           f"'{channel_name}'", f"'{latest_video_id}'",
-                           f"'{ping_role.id}'" if ping_role else "'None'"])
+                   values=[ctx.guild.id, text_channel.id, channel['items'][0]['id'],
+                           channel_name, latest_video_id,
+                           ping_role.id if ping_role else None])
 
         # Respond to the user
         await ctx.respond(
@@ -317,18 +319,18 @@ class Slash(commands.Cog):
 
         # Check if the channel has been added
         if not sql.select(elements=['*'], table='youtube',
-                          where=f"guild_id='{ctx.guild.id}' and channel_id = '{youtube_channel_id}'"):
+                          where={'guild_id': ctx.guild.id, 'channel_id': youtube_channel_id}):
             await ctx.respond('Channel not added', ephemeral=True)
             return
 
         # Get the text channel ID
         text_channel_id = int(sql.select(elements=['text_channel_id'], table='youtube',
-                                         where=f'guild_id = \'{ctx.guild.id}\' AND channel_id = \'{youtube_channel_id}\'')[
+                                         where={'guild_id': ctx.guild.id, 'channel_id': youtube_channel_id})[
                                   0][0])
 
         # Remove from database
         sql.delete(table='youtube',
-                   where=f'guild_id = \'{ctx.guild.id}\' AND channel_id = \'{channel["items"][0]["id"]}\'')
+                   where={'guild_id': ctx.guild.id, 'channel_id': channel["items"][0]["id"]})
 
         text_channel = discord.utils.get(ctx.guild.text_channels, id=text_channel_id)
 
@@ -377,7 +379,7 @@ class Slash(commands.Cog):
 
         sql = SQL(os.getenv('sql_db_name'))
         channels = sql.select(elements=['channel_name', 'channel_id', 'text_channel_id'], table='youtube',
-                              where=f'guild_id = \'{ctx.guild.id}\'')
+                              where={'guild_id': ctx.guild.id})
 
         # Check if there are any channels set up
         if not channels:
@@ -437,7 +439,7 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
 
         # Check if there are any channels set up
-        if not sql.select(elements=['*'], table='youtube', where=f'guild_id = \'{ctx.guild.id}\''):
+        if not sql.select(elements=['*'], table='youtube', where={'guild_id': ctx.guild.id}):
             await ctx.respond('No channels are currently set up for notifications', ephemeral=True)
             return
 
@@ -504,23 +506,23 @@ class Slash(commands.Cog):
 
         # Check if the channel has been added
         if not sql.select(elements=['*'], table='youtube',
-                          where=f"guild_id='{ctx.guild.id}' and channel_id = '{youtube_channel_id}'"):
+                          where={'guild_id': ctx.guild.id, 'channel_id': youtube_channel_id}):
             await ctx.respond('Error: YouTube channel not configured', ephemeral=True)
             return
 
         # Update the text channel
         if text_channel and int(sql.select(elements=['text_channel_id'], table='youtube',
-                                           where=f'guild_id = \'{ctx.guild.id}\' AND channel_id = \'{youtube_channel_id}\'')[
+                                           where={'guild_id': ctx.guild.id, 'channel_id': youtube_channel_id})[
                                     0][0]) != text_channel.id:
-            sql.update(table='youtube', column='text_channel_id', value=f"'{text_channel.id}'",
-                       where=f"guild_id='{ctx.guild.id}' and channel_id = '{youtube_channel_id}'")
+            sql.update(table='youtube', column='text_channel_id', value=text_channel.id,
+                       where={'guild_id': ctx.guild.id, 'channel_id': youtube_channel_id})
 
         # Update the ping role
         elif ping_role and (sql.select(elements=['ping_role'], table='youtube',
-                                       where=f'guild_id = \'{ctx.guild.id}\' AND channel_id = \'{youtube_channel_id}\'')[
-                                0][0] != 'None' or str(ping_role.id)):
-            sql.update(table='youtube', column='ping_role', value=f"'{ping_role.id}'",
-                       where=f"guild_id='{ctx.guild.id}' and channel_id = '{youtube_channel_id}'")
+                                       where={'guild_id': ctx.guild.id, 'channel_id': youtube_channel_id})[
+                                0][0] != ping_role.id):
+            sql.update(table='youtube', column='ping_role', value=ping_role.id,
+                       where={'guild_id': ctx.guild.id, 'channel_id': youtube_channel_id})
 
         else:
             await ctx.respond('No changes made', ephemeral=True)
@@ -591,20 +593,18 @@ class Slash(commands.Cog):
         if warns := sql.select(
                 elements=['warns', 'reason'],
                 table='warns',
-                where=f"guild_id = '{ctx.guild.id}' AND member_id = '{member.id}'",
+                where={'guild_id': ctx.guild.id, 'member_id': member.id},
         ):
             reason_arr = warns[0][1]
             reason_arr.append(reason)
-            reason_str = ''.join(f'\'{r}\', ' for r in reason_arr)
-            reason_str = reason_str[:-2]
             sql.update(table='warns', column='warns', value=warns[0][0] + 1,
-                       where=f"guild_id = '{ctx.guild.id}' AND member_id = '{member.id}'")
-            sql.update(table='warns', column='reason', value=f"ARRAY[{reason_str}]",
-                       where=f"guild_id = '{ctx.guild.id}' AND member_id = '{member.id}'")
+                       where={'guild_id': ctx.guild.id, 'member_id': member.id})
+            sql.update(table='warns', column='reason', value=reason_arr,
+                       where={'guild_id': ctx.guild.id, 'member_id': member.id})
 
         else:
             sql.insert(table='warns', columns=['member_id', 'warns', 'guild_id', 'reason'],
-                       values=[f"'{member.id}'", "1", f"'{ctx.guild.id}'", f"ARRAY['{reason}']"])
+                       values=[member.id, 1, ctx.guild.id, [reason]])
         embed = discord.Embed(
             description=f'{member} has been warned for {reason}',
             colour=discord.Colour.red()
@@ -657,19 +657,17 @@ class Slash(commands.Cog):
         if warns := sql.select(
                 elements=['warns', 'reason'],
                 table='warns',
-                where=f"guild_id = '{ctx.guild.id}' AND member_id = '{member.id}'",
+                where={'guild_id': ctx.guild.id, 'member_id': member.id},
         ):
             if warns[0][0] == 1:
-                sql.delete(table='warns', where=f"guild_id = '{ctx.guild.id}' AND member_id = '{member.id}'")
+                sql.delete(table='warns', where={'guild_id': ctx.guild.id, 'member_id': member.id})
             else:
                 reason_arr = warns[0][1]
                 reason_arr.pop(0)
-                reason_str = ''.join(f'\'{r}\', ' for r in reason_arr)
-                reason_str = reason_str[:-2]
                 sql.update(table='warns', column='warns', value=warns[0][0] - 1,
-                           where=f"guild_id = '{ctx.guild.id}' AND member_id = '{member.id}'")
-                sql.update(table='warns', column='reason', value=f"ARRAY[{reason_str}]",
-                           where=f"guild_id = '{ctx.guild.id}' AND member_id = '{member.id}'")
+                           where={'guild_id': ctx.guild.id, 'member_id': member.id})
+                sql.update(table='warns', column='reason', value=reason_arr,
+                           where={'guild_id': ctx.guild.id, 'member_id': member.id})
         else:
             await ctx.respond(f'{member.mention} has no warns', ephemeral=True)
             return
@@ -721,7 +719,7 @@ class Slash(commands.Cog):
         if warns := sql.select(
                 elements=['warns', 'reason'],
                 table='warns',
-                where=f"guild_id = '{ctx.guild.id}' AND member_id = '{member.id}'",
+                where={'guild_id': ctx.guild.id, 'member_id': member.id},
         ):
             embed = discord.Embed(
                 title=f'{member} has {warns[0][0]} {("warn" if warns[0][0] == 1 else "warns")}',
@@ -778,7 +776,7 @@ class Slash(commands.Cog):
         if not sql.select(
                 elements=['warns', 'reason'],
                 table='warns',
-                where=f"guild_id = '{ctx.guild.id}' AND member_id = '{member.id}'",
+                where={'guild_id': ctx.guild.id, 'member_id': member.id},
         ):
             await ctx.respond(f'{member.mention} has no warns', ephemeral=True)
             return
@@ -814,17 +812,21 @@ class Slash(commands.Cog):
     async def messageresponse_add(self, ctx: discord.ApplicationContext,
                                   message: Option(str, desription='The message to trigger the response to',
                                                   required=True),
-                                  response: Option(str, description='The response for the message', required=True)):
+                                  response: Option(str, description='The response for the message', required=True),
+                                  match: Option(str, description='Respond to the exact message, or to messages containing it anywhere or as a word',
+                                                required=False, choices=MATCH_TYPES, default='exact')):
         """
         Adds a chat a response
 
         :param ctx: The context of the command
         :param message: The message to trigger the response to
         :param response: The response for the message
+        :param match: How the message is matched
         
         :type ctx: discord.ApplicationContext
         :type message: str
         :type response: str
+        :type match: str
         
         :return: None
         :rtype: None
@@ -838,17 +840,17 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
         original_message = message
 
-        message = message.replace("'", "''").lower()
-        response = response.replace("'", "''")
+        message = message.lower()
 
         if sql.select(elements=['message', 'response'], table='message_responses',
-                      where=f"guild_id = '{ctx.guild.id}' AND message = '{message}'"):
+                      where={'guild_id': ctx.guild.id, 'message': message}):
             await ctx.respond(f'A response for `{original_message}` already exists', ephemeral=True)
             return
 
         else:
-            sql.insert(table='message_responses', columns=['guild_id', 'message', 'response'],
-                       values=[f"'{ctx.guild.id}'", f"'{message}'", f"'{response}'"])
+            sql.insert(table='message_responses', columns=['guild_id', 'message', 'response', 'match_type'],
+                       values=[ctx.guild.id, message, response, match])
+            triggers.add(ctx.guild.id, message, response, match)
 
         await ctx.respond(f'Response for `{original_message}` added')
 
@@ -897,11 +899,12 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
         original_message = message
 
-        message = message.replace("'", "''").lower()
+        message = message.lower()
 
         if sql.select(elements=['message', 'response'], table='message_responses',
-                      where=f"guild_id = '{ctx.guild.id}' AND message = '{message}'"):
-            sql.delete(table='message_responses', where=f"guild_id = '{ctx.guild.id}' AND message = '{message}'")
+                      where={'guild_id': ctx.guild.id, 'message': message}):
+            sql.delete(table='message_responses', where={'guild_id': ctx.guild.id, 'message': message})
+            triggers.remove(ctx.guild.id, message)
         else:
             await ctx.respond(f'No response for `{original_message}` exists', ephemeral=True)
             return
@@ -961,16 +964,16 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
         original_message = message
 
-        message = message.replace("'", "''").lower()
-        response = response.replace("'", "''")
+        message = message.lower()
 
-        if not sql.select(elements=['message', 'response'], table='message_responses',
-                          where=f"guild_id = '{ctx.guild.id}' AND message = '{message}'"):
+        if not (match := sql.select(elements=['match_type'], table='message_responses',
+                                    where={'guild_id': ctx.guild.id, 'message': message})):
             await ctx.respond(f'A response for `{original_message}` does not exist', ephemeral=True)
             return
 
         else:
-            sql.update('message_responses', 'response', f'\'{response}\'', f"message = '{message}'")
+            sql.update('message_responses', 'response', response, {'guild_id': ctx.guild.id, 'message': message})
+            triggers.add(ctx.guild.id, message, response, match[0][0])
 
         await ctx.respond(f'Response for `{original_message}` updated')
 
@@ -1014,13 +1017,13 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
 
         if not sql.select(elements=['message', 'response'], table='message_responses',
-                          where=f"guild_id = '{ctx.guild.id}'"):
+                          where={'guild_id': ctx.guild.id}):
             await ctx.respond('No responses found', ephemeral=True)
             return
 
         embed = discord.Embed(title=f'Message Responses for the server {ctx.guild.name}', colour=discord.Colour.green())
         responses = sql.select(elements=['message', 'response'], table='message_responses',
-                               where=f"guild_id = '{ctx.guild.id}'")
+                               where={'guild_id': ctx.guild.id})
         for response in responses:
             embed.add_field(name=f'Message: {response[0]}', value=f'Response: {response[1]}', inline=False)
 
@@ -1069,10 +1072,11 @@ class Slash(commands.Cog):
         await ctx.interaction.response.defer()
 
         sql = SQL(os.getenv('sql_db_name'))
-        if not sql.select(['*'], 'message_responses', f"guild_id = '{ctx.guild.id}'"):
+        if not sql.select(['*'], 'message_responses', {'guild_id': ctx.guild.id}):
             await ctx.respond('No responses found', ephemeral=True)
             return
-        await ctx.respond('Are you sure you want to clear!', view=ClearView(sql, ctx.author, 'message_responses'))
+        await ctx.respond('Are you sure you want to clear!', view=ClearView(sql, ctx.author, 'message_responses',
+                                                                              on_clear=triggers.remove_guild))
 
     @messageresponse_clear.error
     async def messageresponse_clear_error(self, ctx: discord.ApplicationContext,
@@ -1136,13 +1140,15 @@ class Slash(commands.Cog):
             await ctx.respond('You cannot mute a member with the same or higher permissions', ephemeral=True)
             return
 
-        muted_role = discord.utils.get(ctx.guild.roles, name='Muted')  # Get the muted role
+        muted_role = muted_roles.get(ctx.guild)  # Get the muted role
         if not muted_role:
             await ctx.interaction.response.defer()
-            muted_role = await ctx.guild.create_role(name='Muted')  # Create a muted role if not present
-            for channel in ctx.guild.channels:
-                await channel.set_permissions(muted_role, speak=False,
-                                              send_messages=False)  # Set permissions of the muted role
+
+            async def report(done: int, total: int) -> None:
+                with contextlib.suppress(discord.HTTPException):
+                    await ctx.edit(content=f'Setting up the Muted role: {done}/{total} channels')
+
+            muted_role = await muted_roles.get_or_create(ctx.guild, report)  # Create a muted role if not present
 
         # Mute the user
         try:
@@ -1156,19 +1162,14 @@ class Slash(commands.Cog):
                 await member.send(
                     f'You were muted in {ctx.guild.name} for {reason}. Duration: {duration or "Permanent"}.')
 
-            # Wait and unmute if duration is specified
+            # Schedule the unmute if duration is specified, a permanent mute replaces a pending one
+            sql = AsyncSQL(os.getenv('sql_db_name'))
             if duration:
-                await asyncio.sleep(duration * 60)
-
-                if muted_role in member.roles:
-                    await member.remove_roles(muted_role, reason=reason)
-
-                    await ctx.respond(
-                        embed=discord.Embed(description=f'{member} has been unmuted',
-                                            colour=discord.Colour.green()))
-
-                    with contextlib.suppress(discord.HTTPException):
-                        await member.send(f'You have been unmuted in {ctx.guild.name}')
+                due_at = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(minutes=duration)
+                await scheduler.schedule(sql, ScheduledAction(ctx.guild.id, member.id, 'unmute', due_at,
+                                                              ctx.channel.id, reason))
+            else:
+                await scheduler.cancel(sql, ctx.guild.id, member.id, 'unmute')
 
         except discord.Forbidden:  # Permission error
             await ctx.respond('I do not have enough permissions to perform this action', ephemeral=True)
@@ -1227,6 +1228,7 @@ class Slash(commands.Cog):
         # Unmute the user
         try:
             await member.remove_roles(muted_role, reason='Unmuted')  # Remove muted role
+            await scheduler.cancel(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id, member.id, 'unmute')
             await ctx.respond(
                 embed=discord.Embed(description=f'{member} has been unmuted', colour=discord.Colour.green()))
         except discord.Forbidden:  # Permission error
@@ -1787,7 +1789,7 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
 
         # Check if a verification system already exists
-        if sql.select(['*'], 'verifications', where=f"guild_id = '{ctx.guild.id}'"):
+        if sql.select(['*'], 'verifications', where={'guild_id': ctx.guild.id}):
             await ctx.respond('Verification already exists', ephemeral=True)
             return
 
@@ -1808,8 +1810,9 @@ class Slash(commands.Cog):
 
         # Insert into database
         sql.insert('verifications', ['message_id', 'role_id', 'unverified_role_id', 'channel_id', 'guild_id'],
-                   [f"'{msg.id}'", f"'{verified_role.id}'", f"'{unverified_role.id}'" if unverified_role else "'None'",
-                    f"'{channel.id}'", f"'{ctx.guild.id}'"])
+                   [msg.id, verified_role.id, unverified_role.id if unverified_role else None,
+                    channel.id, ctx.guild.id])
+        await guild_configs.refresh(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id)
 
         await ctx.respond(embed=embed)
 
@@ -1853,12 +1856,13 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
 
         # Check if verification does not exist
-        if not sql.select(['*'], 'verifications', where=f"guild_id = '{ctx.guild.id}'"):
+        if not sql.select(['*'], 'verifications', where={'guild_id': ctx.guild.id}):
             await ctx.respond('Verification does not exist', ephemeral=True)
             return
 
         # Remove from database
-        sql.delete('verifications', where=f"guild_id = '{ctx.guild.id}'")
+        sql.delete('verifications', where={'guild_id': ctx.guild.id})
+        await guild_configs.refresh(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id)
 
         await ctx.respond('Verification has been removed')
 
@@ -1910,7 +1914,7 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
 
         # Check iff verification does not exist
-        if not sql.select(['*'], 'verifications', where=f"guild_id = '{ctx.guild.id}'"):
+        if not sql.select(['*'], 'verifications', where={'guild_id': ctx.guild.id}):
             await ctx.respond('Verification does not exist', ephemeral=True)
             return
 
@@ -1921,11 +1925,12 @@ class Slash(commands.Cog):
 
         # Update database
         if verified_role:
-            sql.update('verifications', 'role_id', f"'{verified_role.id}'", where=f"guild_id = '{ctx.guild.id}'")
+            sql.update('verifications', 'role_id', verified_role.id, where={'guild_id': ctx.guild.id})
 
         if unverified_role:
-            sql.update('verifications', 'unverified_role_id', f"'{unverified_role.id}'",
-                       where=f"guild_id = '{ctx.guild.id}'")
+            sql.update('verifications', 'unverified_role_id', unverified_role.id,
+                       where={'guild_id': ctx.guild.id})
+        await guild_configs.refresh(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id)
 
         await ctx.respond('Verification has been updated')
 
@@ -1978,17 +1983,18 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
 
         # Check if serverjoin already exists
-        roles = sql.select(['member_role_id', 'bot_role_id'], 'serverjoin', where=f"guild_id = '{ctx.guild.id}'")
+        roles = sql.select(['member_role_id', 'bot_role_id'], 'serverjoin', where={'guild_id': ctx.guild.id})
         if roles and (roles[0][0] or roles[0][1]):
             await ctx.respond('Server join already exists, use the update subcommand instead', ephemeral=True)
             return
 
         # Update database
         if user == 'all':
-            sql.insert('serverjoin', ['guild_id', 'member_role_id', 'bot_role_id'],
-                       [f"'{ctx.guild.id}'", f"'{role.id}'", f"'{role.id}'"])
+            sql.upsert('serverjoin', ['guild_id'], ['guild_id', 'member_role_id', 'bot_role_id'],
+                       [ctx.guild.id, role.id, role.id])
         else:
-            sql.insert('serverjoin', ['guild_id', f'{user}_role_id'], [f"'{ctx.guild.id}'", f"'{role.id}'"])
+            sql.upsert('serverjoin', ['guild_id'], ['guild_id', f'{user}_role_id'], [ctx.guild.id, role.id])
+        await guild_configs.refresh(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id)
 
         await ctx.respond('Role has been added')
 
@@ -2032,12 +2038,13 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
 
         # Check if serverjoin even exists
-        if not sql.select(['*'], 'serverjoin', where=f"guild_id = '{ctx.guild.id}'"):
+        if not sql.select(['*'], 'serverjoin', where={'guild_id': ctx.guild.id}):
             await ctx.respond('Server join does not exist', ephemeral=True)
             return
 
         # Remove from database
-        sql.delete('serverjoin', where=f"guild_id = '{ctx.guild.id}'")
+        sql.delete('serverjoin', where={'guild_id': ctx.guild.id})
+        await guild_configs.refresh(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id)
 
         await ctx.respond('Role has been removed')
 
@@ -2089,16 +2096,17 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
 
         # Check if serverjoin even exists
-        if not sql.select(['*'], 'serverjoin', where=f"guild_id = '{ctx.guild.id}'"):
+        if not sql.select(['*'], 'serverjoin', where={'guild_id': ctx.guild.id}):
             await ctx.respond('Server join does not exist', ephemeral=True)
             return
 
         # Update database
         if user == 'all':
-            sql.update('serverjoin', 'bot_role_id', f"'{role.id}'", where=f"guild_id = '{ctx.guild.id}'")
-            sql.update('serverjoin', 'member_role_id', f"'{role.id}'", where=f"guild_id = '{ctx.guild.id}'")
+            sql.upsert('serverjoin', ['guild_id'], ['guild_id', 'member_role_id', 'bot_role_id'],
+                       [ctx.guild.id, role.id, role.id])
         else:
-            sql.update('serverjoin', f'{user}_role_id', f"'{role.id}'", where=f"guild_id = '{ctx.guild.id}'")
+            sql.upsert('serverjoin', ['guild_id'], ['guild_id', f'{user}_role_id'], [ctx.guild.id, role.id])
+        await guild_configs.refresh(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id)
 
         await ctx.respond('Role has been updated')
 
@@ -2142,12 +2150,12 @@ class Slash(commands.Cog):
         sql = SQL(os.getenv('sql_db_name'))
 
         # Check if serverjoin even exists
-        if not sql.select(['*'], 'serverjoin', where=f"guild_id = '{ctx.guild.id}'"):
+        if not sql.select(['*'], 'serverjoin', where={'guild_id': ctx.guild.id}):
             await ctx.respond('Server join does not exist', ephemeral=True)
             return
 
         # Get the roles
-        roles = sql.select(['member_role_id', 'bot_role_id'], 'serverjoin', where=f"guild_id = '{ctx.guild.id}'")
+        roles = sql.select(['member_role_id', 'bot_role_id'], 'serverjoin', where={'guild_id': ctx.guild.id})
 
         member_role = discord.utils.get(ctx.guild.roles, id=int(roles[0][0])) if roles[0][0] else None
         bot_role = discord.utils.get(ctx.guild.roles, id=int(roles[0][1])) if roles[0][1] else None
@@ -2300,11 +2308,12 @@ class Slash(commands.Cog):
 
         sql = SQL(os.getenv('sql_db_name'))
 
-        if sql.select(['*'], 'modlogs', f"guild_id = '{ctx.guild.id}'"):
+        if sql.select(['*'], 'modlogs', {'guild_id': ctx.guild.id}):
             await ctx.respond('Modlogs have already been enabled. Use the update mode instead.', ephemeral=True)
             return
         
-        sql.insert('modlogs', ['guild_id', 'channel_id'], [f"'{ctx.guild.id}'", f"'{channel.id}'"])
+        sql.upsert('modlogs', ['guild_id'], ['guild_id', 'channel_id'], [ctx.guild.id, channel.id])
+        await guild_configs.refresh(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id)
 
         embed = discord.Embed(description=f'Modlog channel has been set to {channel.mention}', colour=discord.Colour.green())
 
@@ -2348,18 +2357,19 @@ class Slash(commands.Cog):
 
         sql = SQL(os.getenv('sql_db_name'))
 
-        if not sql.select(['*'], 'modlogs', f"guild_id = '{ctx.guild.id}'"):
+        if not sql.select(['*'], 'modlogs', {'guild_id': ctx.guild.id}):
             await ctx.respond('Modlogs have not been enabled!', ephemeral=True)
             return
         
-        mod_channel: discord.TextChannel = self.bot.get_channel(int(sql.select(['channel_id'], 'modlogs', f"guild_id = '{ctx.guild.id}'")[0][0]))
+        mod_channel: discord.TextChannel = self.bot.get_channel(int(sql.select(['channel_id'], 'modlogs', {'guild_id': ctx.guild.id})[0][0]))
 
         # Delete webhook
         webhooks = await mod_channel.webhooks()
         if webhook := discord.utils.get(webhooks, name=f'{self.bot.user.name} Logging'):
             await webhook.delete(reason='Modlogs disabled')
         
-        sql.delete('modlogs', f"guild_id = '{ctx.guild.id}'")
+        sql.delete('modlogs', {'guild_id': ctx.guild.id})
+        await guild_configs.refresh(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id)
 
         await ctx.respond(embed=discord.Embed(description='Modlogs have been disabled for the guild', colour=discord.Colour.red()))
     
@@ -2403,18 +2413,19 @@ class Slash(commands.Cog):
 
         sql = SQL(os.getenv('sql_db_name'))
 
-        if not sql.select(['*'], 'modlogs', f"guild_id = '{ctx.guild.id}'"):
+        if not sql.select(['*'], 'modlogs', {'guild_id': ctx.guild.id}):
             await ctx.respond('Modlogs have not been enabled!', ephemeral=True)
             return
         
-        mod_channel: discord.TextChannel = self.bot.get_channel(int(sql.select(['channel_id'], 'modlogs', f"guild_id = '{ctx.guild.id}'")[0][0]))
+        mod_channel: discord.TextChannel = self.bot.get_channel(int(sql.select(['channel_id'], 'modlogs', {'guild_id': ctx.guild.id})[0][0]))
 
         # Delete webhook
         webhooks = await mod_channel.webhooks()
         if webhook := discord.utils.get(webhooks, name=f'{self.bot.user.name} Logging'):
             await webhook.delete(reason='Modlogs channel updated')
         
-        sql.update('modlogs', 'channel_id', f"'{channel.id}'", f"guild_id = '{ctx.guild.id}'")
+        sql.upsert('modlogs', ['guild_id'], ['guild_id', 'channel_id'], [ctx.guild.id, channel.id])
+        await guild_configs.refresh(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id)
 
         await ctx.respond(embed=discord.Embed(description=f'Updated modlogs channel to {channel.mention}', colour=discord.Colour.green()))
     
@@ -2439,6 +2450,68 @@ class Slash(commands.Cog):
                           ephemeral=True)
         await inform_owner(self.bot, error)
 
+    @modlogs.command(name='events', description='Choose the categories of events logged in the modlogs channel')
+    @commands.has_permissions(manage_guild=True)
+    async def modlogs_events(self, ctx: discord.ApplicationContext,
+                             category: Option(str, description='The category of events', required=True,
+                                              choices=[name.lower() for name in ModlogEvent.__members__]),
+                             enabled: Option(bool, description='Whether the category is logged', required=True)):
+        """
+        Enables or disables logging a category of events
+
+        :param ctx: The context of the command
+        :param category: The category of events
+        :param enabled: Whether the category is logged
+
+        :type ctx: discord.ApplicationContext
+        :type category: str
+        :type enabled: bool
+
+        :return: None
+        :rtype: None
+        """
+        await ctx.defer()
+
+        config = guild_configs.get(ctx.guild.id)
+        if not config.modlogs_enabled:
+            await ctx.respond('Modlogs have not been enabled!', ephemeral=True)
+            return
+
+        event = ModlogEvent[category.upper()]
+        events = config.modlog_events | event if enabled else config.modlog_events & ~event
+
+        sql = SQL(os.getenv('sql_db_name'))
+        sql.update('modlogs', 'events', int(events), {'guild_id': ctx.guild.id})
+        await guild_configs.refresh(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id)
+
+        embed = discord.Embed(
+            title='Logged events',
+            description='\n'.join(f'{"✅" if event in events else "❌"} {name.lower().replace("_", " ")}'
+                                   for name, event in ModlogEvent.__members__.items() if event != ModlogEvent.ALL),
+            colour=discord.Colour.green()
+        )
+        await ctx.respond(embed=embed)
+
+    @modlogs_events.error
+    async def modlogs_events_error(self, ctx: discord.ApplicationContext, error: discord.ApplicationCommandInvokeError):
+        """
+        Error handler for the modlogs_events command
+
+        :param ctx: The context of the command
+        :param error: The error that occurred
+
+        :type ctx: discord.ApplicationContext
+        :type error: discord.ApplicationCommandInvokeError
+
+        :return: None
+        :rtype: None
+        """
+        if isinstance(error.original, commands.MissingPermissions):
+            await ctx.respond(str(error), ephemeral=True)
+            return
+        await ctx.respond('An error has occurred while running the modlogs command! The owner has been notified.',
+                          ephemeral=True)
+        await inform_owner(self.bot, error)
 
 
 def setup(bot: commands.Bot):
@@ -6,10 +6,15 @@ import discord
 import datetime
 import os
 import json
-from tools import send_error_embed, convert_to_unix_time, inform_owner
-from sql_tools import SQL
+from tools import send_error_embed, inform_owner
+from sql_tools import AsyncSQL
+from cache import prefixes, afks, snipes, mention_index
+from purge import purge_engine
 from discord.ext import commands
 
+MAX_MENTIONS = 25  # Number of messages listed by the mentions command, keeping the embed within its limits
+MENTIONS_BACKFILL = 500  # Number of messages read to backfill the mention index of a channel
+
 
 class Util(commands.Cog):
     def __init__(self, bot: commands.Bot):
@@ -28,97 +33,54 @@ class Util(commands.Cog):
         :return: None
         :rtype: None
         """
-        sql = SQL(os.getenv('sql_db_name'))
-
-        # Replace single quotes with double quotes
-        content = message.content.replace("'", "''")
-
-        if not isinstance(message.author, discord.Member):
+        if not isinstance(message.author, discord.Member) or purge_engine.suppressed(message.id):
             return
 
-        # Make a list of values
-        if message.attachments:
-            attachment_str = ', '.join(f"'{attachment.url}'" for attachment in message.attachments)
-            values = [f'\'{message.author.id}\'', f'\'{content}\'', f'\'{message.channel.id}\'',
-                      f'\'{datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S:%f")}\'', f"'{message.guild.id}'",
-                      f"ARRAY[{attachment_str}]"]
-
-        else:
-            values = [f'\'{message.author.id}\'', f'\'{content}\'', f'\'{message.channel.id}\'',
-                      f'\'{datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S:%f")}\'', f"'{message.guild.id}'",
-                      "ARRAY['None']"]
-            attachment_str = "ARRAY['None']"
-
-        # Update databse
-        if sql.select(elements=['*'], table='snipes',
-                      where=f'guild_id = \'{message.guild.id}\' AND channel_id = \'{message.channel.id}\''):
-            sql.update(table='snipes', column='message', value=f'\'{content}\'',
-                       where=f"guild_id = '{message.guild.id}' AND channel_id = '{message.channel.id}'")
-            sql.update(table='snipes', column='author_id', value=f'\'{message.author.id}\'',
-                       where=f"guild_id = '{message.guild.id}' AND channel_id = '{message.channel.id}'")
-            sql.update(table='snipes', column='time',
-                       value=f'\'{datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S:%f")}\'',
-                       where=f"guild_id = '{message.guild.id}' AND channel_id = '{message.channel.id}'")
-            if message.attachments:
-                sql.update(table='snipes', column='attachments', value=f"ARRAY[{attachment_str}]",
-                           where=f"guild_id = '{message.guild.id}' AND channel_id = '{message.channel.id}'")
-            else:
-                sql.update(table='snipes', column='attachments', value="ARRAY['None']",
-                           where=f"guild_id = '{message.guild.id}' AND channel_id = '{message.channel.id}'")
-
-        # Insert into database
-        else:
-            sql.insert(table='snipes',
-                       columns=['author_id', 'message', 'channel_id', 'time', 'guild_id', 'attachments'],
-                       values=values)
+        # Kept in memory, and persisted if enabled
+        await snipes.add(AsyncSQL(os.getenv('sql_db_name')), message)
 
     # Snipe command
-    @commands.command(name='snipe', description='Snipes the most recently deleted message', usage='snipe')
+    @commands.command(name='snipe', description='Snipes a recently deleted message\nThe most recent one by default',
+                      usage='snipe <n>')
     @commands.has_permissions(manage_messages=True)
-    async def snipe(self, ctx: commands.Context):
+    async def snipe(self, ctx: commands.Context, n: int = 1):
         """
-        Snipes the most recently deleted message in the channel.
+        Snipes the nth most recently deleted message in the channel.
 
         :param ctx: The context of where the command was used
+        :param n: The position of the message, 1 being the most recently deleted
 
         :type ctx: commands.Context
+        :type n: int
 
         :return: None
         :rtype: None
         """
-        sql = SQL(os.getenv('sql_db_name'))
-
-        # Get the latest message
-        if message := sql.select(
-                elements=['author_id', 'message', 'channel_id', 'time', 'attachments'],
-                table='snipes',
-                where=f'guild_id = \'{ctx.guild.id}\' AND channel_id = \'{ctx.channel.id}\''
-        ):
-            # Get the time of deletion and convert to unix time
-            del_time = message[0][3]
-            del_time = convert_to_unix_time(del_time)
-            channel = discord.utils.get(ctx.guild.channels, id=int(message[0][2]))
-            member = discord.utils.get(ctx.guild.members, id=int(message[0][0]))
-            content = message[0][1].replace("''", "'")
-
-            # Get the prefix
-            command_prefix = sql.select(elements=["prefix"], table="prefixes", where=f"guild_id = '{ctx.guild.id}'")[0][
-                0]
-
-            # Response embed
-            embed = discord.Embed(
-                title='Sniped a message!',
-                description=f'Author: {member.mention if isinstance(member, discord.Member) else member}\nDeleted message: {content}\nChannel: {channel.mention}\nTime: {del_time}',
-                colour=discord.Colour.green()
-            ).set_footer(
-                text=f'Enable modlogs for more information. Type {command_prefix}help modlogs for more information')
-            embed.set_thumbnail(url=ctx.guild.icon or discord.Embed.Empty)
-            embed.add_field(name='Attachments', value='\n\n'.join(message[0][4]))
+        deleted = snipes.get(ctx.channel.id)
+        if not deleted:
+            await send_error_embed(ctx, 'There are no messages to snipe.')
+            return
+        if not 1 <= n <= len(deleted):
+            await send_error_embed(ctx, f'Only {len(deleted)} deleted {"message" if len(deleted) == 1 else "messages"} can be sniped.')
+            return
 
-            await ctx.send(embed=embed)
+        message = deleted[n - 1]
+        member = ctx.guild.get_member(message.author_id) or f'<@{message.author_id}>'
 
-        else:
-            await send_error_embed(ctx, 'There are no messages to snipe.')
+        # Get the prefix
+        command_prefix = prefixes.get(ctx.guild.id)
+
+        # Response embed
+        embed = discord.Embed(
+            title='Sniped a message!',
+            description=f'Author: {member.mention if isinstance(member, discord.Member) else member}\nDeleted message: {message.content}\nChannel: {ctx.channel.mention}\nTime: <t:{int(message.deleted_at.timestamp())}:R>',
+            colour=discord.Colour.green()
+        ).set_footer(
+            text=f'Enable modlogs for more information. Type {command_prefix}help modlogs for more information')
+        embed.set_thumbnail(url=ctx.guild.icon or discord.Embed.Empty)
+        embed.add_field(name='Attachments', value='\n\n'.join(message.attachments) or 'None')
+
+        await ctx.send(embed=embed)
 
     @snipe.error
     async def snipe_error(self, ctx: commands.Context, error: commands.CommandError):
@@ -136,6 +98,8 @@ class Util(commands.Cog):
         """
         if isinstance(error, commands.MissingPermissions):
             await send_error_embed(ctx, 'You do not have the required permissions to use this command.')
+        elif isinstance(error, commands.BadArgument):
+            await send_error_embed(ctx, 'The position of the message must be a number.')
         else:
             await send_error_embed(ctx,
                                    'An error occurred while running the snipe command! The owner has been informed.')
@@ -157,25 +121,19 @@ class Util(commands.Cog):
         :rtype: None
         """
         member = ctx.author
-        reason = reason.replace("'", "''")
-        member_details = member.name.replace("'", "''") + '#' + member.discriminator
-
-        sql = SQL(os.getenv('sql_db_name'))
 
         with contextlib.suppress(discord.Forbidden):
             await member.edit(nick=f'[AFK] {member.display_name}')  # Changing the nickname
 
         # Adds member details to the database
-        sql.insert(table='afks', columns=['member', 'member_id', 'guild_id', 'reason'],
-                   values=[f'\'{member_details}\'', f'\'{str(member.id)}\'', f'\'{str(ctx.guild.id)}\'',
-                           f'\'{reason}\''])
+        await afks.add(AsyncSQL(os.getenv('sql_db_name')), member, reason)
 
         # Create embed
         embed = discord.Embed(title='AFK', description=f'{member.mention} has gone AFK', colour=member.colour,
                               timestamp=datetime.datetime.now())
         embed.set_thumbnail(url=member.display_avatar.url)
         embed.set_author(name=self.bot.user.name, icon_url=self.bot.user.avatar.url)
-        embed.add_field(name='AFK note', value=reason.replace("''", "'"))
+        embed.add_field(name='AFK note', value=reason)
 
         await ctx.send(embed=embed)
 
@@ -234,12 +192,26 @@ class Util(commands.Cog):
         :return: None
         :rtype: None
         """
-        # Deltet command and purge unpinned messages
+        # Delete command and purge unpinned messages
         await ctx.message.delete()
-        await ctx.channel.purge(limit=limit, check=lambda m: not m.pinned)
+        status = await ctx.send(f'Clearing {limit} messages...')
+
+        async def report(deleted: int) -> None:
+            with contextlib.suppress(discord.HTTPException):
+                await status.edit(content=f'Clearing messages: {deleted} deleted')
+
+        # The status message is not counted, and the messages deleted before a failure are still logged
+        deleted: list[discord.Message] = []
+        try:
+            await purge_engine.purge(ctx.channel, limit, check=lambda m: not m.pinned, progress=report, before=status,
+                                     deleted=deleted)
+        finally:
+            self.bot.dispatch('purge_complete', ctx.channel, deleted, ctx.author)  # A single modlog for the purge
+            with contextlib.suppress(discord.NotFound):
+                await status.delete()
 
         # Send confirmation
-        msg = await ctx.send(f'Cleared {limit} messages')
+        msg = await ctx.send(f'Cleared {len(deleted)} messages')
         await asyncio.sleep(5)
         with contextlib.suppress(discord.NotFound):
             await msg.delete()
@@ -397,8 +369,7 @@ class Util(commands.Cog):
             return
 
         # Update database
-        sql = SQL(os.getenv('sql_db_name'))
-        sql.update(table='prefixes', column='prefix', value=f'\'{new_prefix}\'', where=f'guild_id=\'{ctx.guild.id}\'')
+        await prefixes.set(AsyncSQL(os.getenv('sql_db_name')), ctx.guild.id, new_prefix)
 
         # Respond
         embed = discord.Embed(
@@ -429,11 +400,12 @@ class Util(commands.Cog):
                                    description='An error occurred while running the prefix command! The owner has been informed.')
             await inform_owner(self.bot, error)
     
-    @commands.command(name='mentions', description='Get mentions for the last 500 messages', usage='mentions <member>')
+    @commands.command(name='mentions', description='Get the recent messages mentioning a member', usage='mentions <member>')
     @commands.cooldown(1, 5, commands.BucketType.user)
     async def mentions(self, ctx: commands.Context, member: discord.Member | None = None):
         """
-        Get mentions for the last 500 messages
+        Get the recent messages mentioning a member
+        The messages are looked up in the mention index, which is backfilled from the channel history on first use
 
         :param ctx: The command Context
         :param member: The member
@@ -446,26 +418,30 @@ class Util(commands.Cog):
         """
         member = member or ctx.author
 
-        async with ctx.typing():
-            # Get messages mentioning member
-            messages = await ctx.channel.history(limit=500).flatten()
-            mentions = list(filter(lambda m: member.id in m.raw_mentions, messages))
-
-            if not mentions:
-                await ctx.reply(f'No messages found mentioning {member}!')
-                return
-
-            # Embed description with the links of the messages and the time of sending
-            embed = discord.Embed(
-                title=f'Messages mentioning {member}',
-                description='\n'.join(f'{idx+1}. [Jump to message]({msg.jump_url}) Sent: <t:{int(msg.created_at.timestamp())}:R>' for idx, msg in enumerate(mentions)),
-                colour=member.colour,
-                timestamp=datetime.datetime.now()
-            )
-            embed.set_author(name=member.name, icon_url=member.display_avatar.url)
-            embed.set_footer(text=f'Previous 500 messages mentioning {member}')
+        # The index only holds the messages sent since the bot started until the channel is backfilled
+        if not mention_index.is_warm(ctx.channel.id):
+            mention_index.backfill(ctx.channel.id,
+                                   [message async for message in ctx.channel.history(limit=MENTIONS_BACKFILL)])
 
-            await ctx.send(embed=embed)
+        # Get messages mentioning member
+        mentions = mention_index.get(ctx.channel.id, member.id)
+
+        if not mentions:
+            await ctx.reply(f'No messages found mentioning {member}!')
+            return
+
+        # Embed description with the links of the most recent messages and the time of sending
+        jump_url = f'https://discord.com/channels/{ctx.guild.id}/{ctx.channel.id}'
+        embed = discord.Embed(
+            title=f'Messages mentioning {member}',
+            description='\n'.join(f'{idx+1}. [Jump to message]({jump_url}/{message_id}) Sent: <t:{int(discord.utils.snowflake_time(message_id).timestamp())}:R>' for idx, message_id in enumerate(mentions[:MAX_MENTIONS])),
+            colour=member.colour,
+            timestamp=datetime.datetime.now()
+        )
+        embed.set_author(name=member.name, icon_url=member.display_avatar.url)
+        embed.set_footer(text=f'{min(len(mentions), MAX_MENTIONS)} of {len(mentions)} recent messages mentioning {member}')
+
+        await ctx.send(embed=embed)
     
     @mentions.error
     async def mentions_error(self, ctx: commands.Context, error: commands.CommandError):
@@ -4,21 +4,26 @@ import discord
 import os
 from dotenv import load_dotenv
 from discord.ext import commands
-from sql_tools import SQL
+from sql_tools import SQL, AsyncSQL
+from migrations import migrate
+from cache import prefixes
 
 
 load_dotenv()
-sql = SQL(os.getenv('sql_db_name'))
+sql = AsyncSQL(os.getenv('sql_db_name'))
 
 
 # noinspection PyShadowingNames,PyUnusedLocal
-def get_prefix(bot: commands.Bot, message: discord.Message) -> str:
+async def get_prefix(bot: commands.Bot, message: discord.Message) -> str:
     if message.guild is not None:
-        return sql.select(elements=['prefix'], table='prefixes', where=f'guild_id = \'{message.guild.id}\'')[0][0]
+        # Messages received before the cache is warmed in on_ready share a single load
+        await prefixes.ensure_loaded(sql)
+        return prefixes.get(message.guild.id)
 
 
 def main():
     # Pre-run requirements
+    migrate(SQL(os.getenv('sql_db_name')))
     bot = commands.Bot(command_prefix=get_prefix, case_insensitive=True, intents=discord.Intents.all())
     bot.remove_command('help')
 
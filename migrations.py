@@ -0,0 +1,150 @@
+# Copyright (c) 2022 Sandeep Kanekal
+# Versioned schema migrations, applied on startup
+from sql_tools import SQL
+
+
+def _unique_key(table: str, key_columns: list) -> list[str]:
+    # Removes duplicate rows, keeping the most recent one, before creating the unique index
+    duplicate = ' AND '.join(f'a.{column} = b.{column}' for column in key_columns)
+    return [
+        f'DELETE FROM {table} a USING {table} b WHERE a.sn < b.sn AND {duplicate}',
+        f'CREATE UNIQUE INDEX IF NOT EXISTS {table}_{"_".join(key_columns)}_key ON {table}({", ".join(key_columns)})',
+    ]
+
+
+def _index(table: str, columns: list) -> str:
+    return f'CREATE INDEX IF NOT EXISTS {table}_{"_".join(columns)}_idx ON {table}({", ".join(columns)})'
+
+
+def _bigint(table: str, columns: list, nullable: list = ()) -> list[str]:
+    # Snowflakes are stored as BIGINT, the 'None' placeholder of optional IDs becomes NULL
+    statements = [f'ALTER TABLE {table} ALTER COLUMN {column} DROP NOT NULL' for column in nullable]
+    alterations = ', '.join(
+        f"ALTER COLUMN {column} TYPE BIGINT USING NULLIF({column}, 'None')::BIGINT" if column in nullable
+        else f'ALTER COLUMN {column} TYPE BIGINT USING {column}::BIGINT'
+        for column in columns
+    )
+    statements.append(f'ALTER TABLE {table} {alterations}')
+    return statements
+
+
+# Each migration is a version, a description and its statements. Applied migrations must never be edited,
+# changes to the schema are made by appending a new one.
+MIGRATIONS = [
+    (
+        1,
+        'Unique keys for the tables holding one row per guild or channel',
+        [
+            *_unique_key('prefixes', ['guild_id']),
+            *_unique_key('modlogs', ['guild_id']),
+            *_unique_key('serverjoin', ['guild_id']),
+            *_unique_key('snipes', ['guild_id', 'channel_id']),
+        ]
+    ),
+    (
+        2,
+        'Snowflake columns as BIGINT',
+        [
+            *_bigint('afks', ['member_id', 'guild_id']),
+            *_bigint('snipes', ['author_id', 'channel_id', 'guild_id']),
+            *_bigint('prefixes', ['guild_id']),
+            *_bigint('modlogs', ['guild_id', 'channel_id']),
+            *_bigint('warns', ['guild_id', 'member_id']),
+            *_bigint('queue', ['guild_id']),
+            *_bigint('loop', ['guild_id']),
+            *_bigint('playlist', ['guild_id']),
+            *_bigint('message_responses', ['guild_id']),
+            *_bigint('youtube', ['guild_id', 'text_channel_id', 'ping_role'], nullable=['ping_role']),
+            *_bigint('verifications', ['message_id', 'role_id', 'unverified_role_id', 'channel_id', 'guild_id'],
+                     nullable=['unverified_role_id']),
+            *_bigint('serverjoin', ['guild_id', 'member_role_id', 'bot_role_id'],
+                     nullable=['member_role_id', 'bot_role_id']),
+        ]
+    ),
+    (
+        3,
+        'Indexes for the lookups made by the bot',
+        [
+            _index('afks', ['guild_id', 'member_id']),
+            _index('message_responses', ['guild_id', 'message']),
+            _index('warns', ['guild_id', 'member_id']),
+            _index('queue', ['guild_id', 'title']),
+            _index('loop', ['guild_id']),
+            _index('playlist', ['guild_id', 'position']),
+            _index('youtube', ['guild_id', 'channel_id']),
+            _index('youtube', ['text_channel_id']),
+            _index('verifications', ['guild_id', 'message_id']),
+            _index('snipes', ['channel_id']),
+            _index('modlogs', ['channel_id']),
+        ]
+    ),
+    (
+        4,
+        'Match type of the message responses',
+        [
+            "ALTER TABLE message_responses ADD COLUMN IF NOT EXISTS match_type VARCHAR(8) NOT NULL DEFAULT 'exact'",
+        ]
+    ),
+    (
+        5,
+        'Categories of events logged by modlogs',
+        [
+            # The ten categories of cache.ModlogEvent, so that guilds keep logging everything
+            'ALTER TABLE modlogs ADD COLUMN IF NOT EXISTS events INT NOT NULL DEFAULT 1023',
+        ]
+    ),
+    (
+        6,
+        'Pending actions of the scheduler',
+        [
+            'CREATE TABLE IF NOT EXISTS scheduled_actions('
+            'sn SERIAL PRIMARY KEY, guild_id BIGINT NOT NULL, member_id BIGINT NOT NULL, action VARCHAR(20) NOT NULL, '
+            'due_at TIMESTAMPTZ NOT NULL, channel_id BIGINT, reason VARCHAR(2000))',
+            'CREATE UNIQUE INDEX IF NOT EXISTS scheduled_actions_guild_id_member_id_action_key '
+            'ON scheduled_actions(guild_id, member_id, action)',
+            _index('scheduled_actions', ['due_at']),
+        ]
+    ),
+    (
+        7,
+        'Poll schedule of the YouTube channels',
+        [
+            'ALTER TABLE youtube ADD COLUMN IF NOT EXISTS poll_interval INT NOT NULL DEFAULT 300',
+            'ALTER TABLE youtube ADD COLUMN IF NOT EXISTS last_upload_at TIMESTAMPTZ',
+        ]
+    ),
+]
+
+
+def migrate(sql: SQL) -> list[int]:
+    """
+    Applies the migrations which have not been applied yet, in order.
+    Each migration runs in its own transaction together with its record in schema_migrations.
+
+    Parameters
+    ----------
+    sql : SQL
+        The SQL object of the database.
+
+    Returns
+    -------
+    list[int]
+        The versions applied.
+    """
+    sql.query(
+        'CREATE TABLE IF NOT EXISTS schema_migrations('
+        'version INT PRIMARY KEY, description VARCHAR(200) NOT NULL, applied_at TIMESTAMP NOT NULL DEFAULT NOW())'
+    )
+    applied = {row[0] for row in sql.select(['version'], 'schema_migrations')}
+
+    versions = []
+    for version, description, statements in sorted(MIGRATIONS):
+        if version in applied:
+            continue
+        with sql.transaction() as transaction:
+            for statement in statements:
+                transaction.query(statement)
+            # Fails on the primary key if another process applied the migration meanwhile
+            transaction.insert('schema_migrations', ['version', 'description'], [version, description])
+        versions.append(version)
+    return versions
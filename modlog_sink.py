@@ -0,0 +1,97 @@
+# Copyright (c) 2022 Sandeep Kanekal
+# Buffers modlog embeds and sends them in batches
+import asyncio
+import os
+import discord
+from cache import webhook_handles
+
+# Limits of a single webhook message
+MAX_EMBEDS = 10
+MAX_EMBED_CHARACTERS = 6000
+
+
+class ModlogSink(object):
+
+    def __init__(self, window: float = 1.0, max_queued: int = 1000) -> None:
+        """
+        Buffers the modlogs sent to each channel and sends consecutive embeds up to 10 per webhook message.
+        Each channel has a bounded queue drained in order by a single task, which waits for `window` seconds to let
+        a burst of events accumulate. A producer waits while its channel's queue is full.
+
+        Parameters
+        ----------
+        window : float, optional
+            Seconds to wait for more embeds before sending. The default is 1.0.
+        max_queued : int, optional
+            Maximum number of modlogs waiting for a channel. The default is 1000.
+        """
+        self.window = window
+        self.max_queued = max_queued
+        self._queues: dict[int, asyncio.Queue] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    async def put(self, channel: discord.TextChannel, message: discord.Embed | dict, username: str,
+                  avatar_url: str) -> None:
+        """
+        Queues a modlog for a channel.
+
+        Parameters
+        ----------
+        channel : discord.TextChannel
+            The modlogs channel.
+        message : discord.Embed | dict
+            An embed, batched with the embeds around it, or the arguments of a message sent on its own.
+        username : str
+            The username of the webhook messages.
+        avatar_url : str
+            The avatar of the webhook messages.
+
+        Returns
+        -------
+        None
+        """
+        queue = self._queues.get(channel.id)
+        if queue is None:
+            queue = self._queues[channel.id] = asyncio.Queue(self.max_queued)
+        await queue.put(message)  # Waits while the channel is too far behind
+
+        if channel.id not in self._tasks:
+            self._tasks[channel.id] = asyncio.create_task(self._drain(channel, queue, username, avatar_url))
+
+    @staticmethod
+    def _next(queue: asyncio.Queue, carried: discord.Embed | dict | None) -> tuple[dict, discord.Embed | dict | None]:
+        # Takes the arguments of the next webhook message off the queue, returning the modlog which did not fit
+        batch, characters = [], 0
+        while len(batch) < MAX_EMBEDS and (carried is not None or not queue.empty()):
+            message = carried if carried is not None else queue.get_nowait()
+            carried = None
+            if isinstance(message, dict):
+                if batch:
+                    return {'embeds': batch}, message
+                return message, None
+            if batch and characters + len(message) > MAX_EMBED_CHARACTERS:
+                return {'embeds': batch}, message
+            batch.append(message)
+            characters += len(message)
+        return {'embeds': batch}, carried
+
+    async def _drain(self, channel: discord.TextChannel, queue: asyncio.Queue, username: str,
+                     avatar_url: str) -> None:
+        carried = None
+        try:
+            while carried is not None or not queue.empty():
+                await asyncio.sleep(self.window)
+                while carried is not None or not queue.empty():
+                    message, carried = self._next(queue, carried)
+                    try:
+                        await webhook_handles.send(channel, username, username=username, avatar_url=avatar_url,
+                                                   **message)
+                    except discord.HTTPException as e:
+                        print(f'Could not send modlogs to {channel.guild.name} #{channel.name}: {e}')
+        finally:
+            del self._tasks[channel.id]
+            if queue.empty():
+                self._queues.pop(channel.id, None)
+
+
+modlog_sink = ModlogSink(float(os.getenv('modlog_flush_window', 1.0)), int(os.getenv('modlog_max_queued', 1000)))
@@ -0,0 +1,116 @@
+# Copyright (c) 2022 Sandeep Kanekal
+# Creates the Muted role and keeps its channel overwrites in place
+import asyncio
+import os
+import time
+import discord
+from typing import Awaitable, Callable
+
+MUTED_ROLE_NAME = 'Muted'
+
+
+class MutedRoleProvisioner(object):
+
+    def __init__(self, concurrency: int = 8, progress_interval: float = 2.0) -> None:
+        """
+        Provisions the Muted role of the guilds. The overwrites of a new role are applied to the channels
+        concurrently, at most `concurrency` at a time. Each channel has its own rate limit bucket, so the bound
+        mainly keeps the bot under the global rate limit, which the library waits on when it is hit.
+
+        Parameters
+        ----------
+        concurrency : int, optional
+            Maximum number of overwrites being applied at once. The default is 8.
+        progress_interval : float, optional
+            Minimum number of seconds between two progress reports. The default is 2.0.
+        """
+        self.progress_interval = progress_interval
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    @staticmethod
+    def get(guild: discord.Guild) -> discord.Role | None:
+        """
+        Returns the Muted role of a guild, None if there is none.
+
+        Parameters
+        ----------
+        guild : discord.Guild
+            The guild.
+
+        Returns
+        -------
+        discord.Role | None
+        """
+        return discord.utils.get(guild.roles, name=MUTED_ROLE_NAME)
+
+    async def get_or_create(self, guild: discord.Guild,
+                            progress: Callable[[int, int], Awaitable[None]] | None = None) -> discord.Role:
+        """
+        Returns the Muted role of a guild, creating it and applying its overwrites to every channel if there is none.
+        Concurrent calls for the same guild wait for a single provisioning.
+
+        Parameters
+        ----------
+        guild : discord.Guild
+            The guild.
+        progress : Callable[[int, int], Awaitable[None]] | None, optional
+            Called with the number of channels done and the total while the overwrites are applied.
+            The default is None.
+
+        Returns
+        -------
+        discord.Role
+        """
+        if role := self.get(guild):
+            return role
+
+        lock = self._locks.setdefault(guild.id, asyncio.Lock())
+        async with lock:
+            if role := self.get(guild):  # Created while waiting for the lock
+                return role
+            role = await guild.create_role(name=MUTED_ROLE_NAME)
+            await self._apply_all(guild.channels, role, progress)
+        self._locks.pop(guild.id, None)
+        return role
+
+    async def apply(self, channel: discord.abc.GuildChannel) -> None:
+        """
+        Applies the overwrite of the Muted role to a new channel, if the guild has the role.
+
+        Parameters
+        ----------
+        channel : discord.abc.GuildChannel
+            The channel.
+
+        Returns
+        -------
+        None
+        """
+        if role := self.get(channel.guild):
+            async with self._semaphore:
+                await channel.set_permissions(role, speak=False, send_messages=False)
+
+    async def _apply_all(self, channels: list[discord.abc.GuildChannel], role: discord.Role,
+                         progress: Callable[[int, int], Awaitable[None]] | None) -> None:
+        done, reported_at = 0, time.monotonic()
+
+        async def apply(channel: discord.abc.GuildChannel) -> None:
+            nonlocal done, reported_at
+            async with self._semaphore:
+                try:
+                    await channel.set_permissions(role, speak=False, send_messages=False)
+                except discord.HTTPException as e:  # A channel the bot cannot manage must not fail the mute
+                    print(f'Could not set the Muted role overwrite in {channel.guild.name} #{channel.name}: {e}')
+            done += 1
+            if progress and done < len(channels) and time.monotonic() - reported_at >= self.progress_interval:
+                reported_at = time.monotonic()
+                await progress(done, len(channels))
+
+        await asyncio.gather(*(apply(channel) for channel in channels))
+        if progress:
+            await progress(done, len(channels))
+
+
+muted_roles = MutedRoleProvisioner(int(os.getenv('muted_role_concurrency', 8)),
+                                   float(os.getenv('muted_role_progress_interval', 2.0)))
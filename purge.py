@@ -0,0 +1,123 @@
+# Copyright (c) 2022 Sandeep Kanekal
+# Deletes messages in bulk for the clear command
+import asyncio
+import datetime
+import os
+import discord
+from typing import Awaitable, Callable
+
+# Discord only deletes messages younger than 14 days in bulk, the margin covers clock skew
+BULK_DELETE_MAX_AGE = datetime.timedelta(days=14) - datetime.timedelta(minutes=1)
+
+
+class PurgeEngine(object):
+
+    def __init__(self, batch_size: int = 100, grace: float = 30.0) -> None:
+        """
+        Purges messages from a channel. The history is read one page at a time and the messages are deleted in
+        bulk batches of `batch_size`, only the messages too old for bulk deletion are deleted one by one.
+        The delete listeners skip the purged messages, the caller dispatches a single purge_complete event instead.
+        An interrupted purge keeps the messages already deleted, so running it again carries on where it stopped.
+
+        Parameters
+        ----------
+        batch_size : int, optional
+            Number of messages deleted per request, at most 100. The default is 100.
+        grace : float, optional
+            Seconds the purged messages stay suppressed after the purge, for the delete events arriving late.
+            The default is 30.0.
+        """
+        self.batch_size = min(batch_size, 100)
+        self.grace = grace
+        self._suppressed: set[int] = set()
+
+    def suppressed(self, message_id: int) -> bool:
+        """
+        Returns whether a message is deleted by a purge, in which case its delete event is not handled on its own.
+
+        Parameters
+        ----------
+        message_id : int
+            The ID of the message.
+
+        Returns
+        -------
+        bool
+        """
+        return message_id in self._suppressed
+
+    async def purge(self, channel: discord.TextChannel, limit: int,
+                    check: Callable[[discord.Message], bool] = lambda message: True,
+                    progress: Callable[[int], Awaitable[None]] | None = None,
+                    before: discord.abc.Snowflake | None = None,
+                    deleted: list[discord.Message] | None = None) -> list[discord.Message]:
+        """
+        Deletes the messages passing `check` among the last `limit` messages of a channel.
+
+        Parameters
+        ----------
+        channel : discord.TextChannel
+            The channel.
+        limit : int
+            The number of messages to look through.
+        check : Callable[[discord.Message], bool], optional
+            Whether a message is to be deleted. By default, every message is.
+        progress : Callable[[int], Awaitable[None]] | None, optional
+            Called with the number of messages deleted so far after each bulk batch, and after each `batch_size`
+            messages deleted one by one. The default is None.
+        before : discord.abc.Snowflake | None, optional
+            Only the messages sent before this one are looked through. The default is None, the latest messages.
+        deleted : list[discord.Message] | None, optional
+            Extended with the messages as they are deleted, so that the caller knows them if the purge fails.
+            The default is None.
+
+        Returns
+        -------
+        list[discord.Message]
+            The deleted messages.
+        """
+        deleted = [] if deleted is None else deleted
+        batch: list[discord.Message] = []
+        ids: set[int] = set()
+        cutoff = discord.utils.utcnow() - BULK_DELETE_MAX_AGE
+
+        async def delete(messages: list[discord.Message]) -> None:
+            ids.update(message.id for message in messages)
+            self._suppressed.update(message.id for message in messages)
+            if len(messages) == 1:
+                try:
+                    await messages[0].delete()
+                except discord.NotFound:  # Already deleted
+                    return
+            else:
+                await channel.delete_messages(messages)
+            deleted.extend(messages)
+            if progress and (len(messages) > 1 or len(deleted) % self.batch_size == 0):  # Old messages add up slowly
+                await progress(len(deleted))
+
+        try:
+            async for message in channel.history(limit=limit, before=before):
+                if not check(message):
+                    continue
+                if message.created_at > cutoff:
+                    batch.append(message)
+                    if len(batch) == self.batch_size:
+                        await delete(batch)
+                        batch = []
+                    continue
+
+                # The history is newest first, so every message from here on is too old for bulk deletion
+                if batch:
+                    await delete(batch)
+                    batch = []
+                await delete([message])
+
+            if batch:
+                await delete(batch)
+        finally:
+            asyncio.get_running_loop().call_later(self.grace, self._suppressed.difference_update, ids)
+
+        return deleted
+
+
+purge_engine = PurgeEngine(int(os.getenv('purge_batch_size', 100)), float(os.getenv('purge_grace', 30.0)))
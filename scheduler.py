@@ -0,0 +1,231 @@
+# Copyright (c) 2022 Sandeep Kanekal
+# Persistent scheduler of delayed moderation actions
+import asyncio
+import contextlib
+import datetime
+import heapq
+import itertools
+from typing import Awaitable, Callable
+from sql_tools import AsyncSQL
+
+
+class ScheduledAction(object):
+
+    def __init__(self, guild_id: int, member_id: int, action: str, due_at: datetime.datetime,
+                 channel_id: int | None = None, reason: str | None = None) -> None:
+        """
+        An action to be performed on a member once it is due, such as lifting a mute.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+        member_id : int
+            The ID of the member.
+        action : str
+            The name of the action, which selects its handler.
+        due_at : datetime.datetime
+            The time at which the action is due, timezone aware.
+        channel_id : int | None, optional
+            The channel to report to once the action is performed. The default is None.
+        reason : str | None, optional
+            The reason for the action. The default is None.
+        """
+        self.guild_id = guild_id
+        self.member_id = member_id
+        self.action = action
+        self.due_at = due_at
+        self.channel_id = channel_id
+        self.reason = reason
+
+    @property
+    def key(self) -> tuple[int, int, str]:
+        # A member has at most one pending action of each kind
+        return self.guild_id, self.member_id, self.action
+
+
+class Scheduler(object):
+
+    def __init__(self) -> None:
+        """
+        Performs actions at a later time. Pending actions are stored in the scheduled_actions table and kept in a
+        min-heap ordered by due time, which a single task sleeps on until the earliest one is due.
+        Rescheduled and cancelled actions are left in the heap and skipped when they are popped.
+        """
+        self._heap: list[tuple[datetime.datetime, int, ScheduledAction]] = []
+        self._pending: dict[tuple[int, int, str], ScheduledAction] = {}
+        self._performing: set[tuple[int, int, str]] = set()
+        self._handlers: dict[str, Callable[[ScheduledAction], Awaitable[None]]] = {}
+        self._counter = itertools.count()  # Breaks ties between actions due at the same time
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()  # The event loop only keeps weak references to the tasks performing
+        self._sql: AsyncSQL | None = None
+        self.loaded = False
+
+    def register(self, action: str, handler: Callable[[ScheduledAction], Awaitable[None]]) -> None:
+        """
+        Registers the coroutine function performing an action.
+
+        Parameters
+        ----------
+        action : str
+            The name of the action.
+        handler : Callable[[ScheduledAction], Awaitable[None]]
+            Called with the ScheduledAction once it is due.
+
+        Returns
+        -------
+        None
+        """
+        self._handlers[action] = handler
+
+    async def load(self, sql: AsyncSQL) -> None:
+        """
+        Restores the pending actions from the database and starts the timer. Actions which became due while the bot
+        was offline are performed right away.
+        Only the first call loads anything. on_ready fires again on every reconnect, when the scheduler already holds
+        every pending action and reloading could perform an action being performed a second time.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+
+        Returns
+        -------
+        None
+        """
+        if self.loaded:
+            return
+        self._sql = sql
+        for guild_id, member_id, action, due_at, channel_id, reason in await sql.select(
+                elements=['guild_id', 'member_id', 'action', 'due_at', 'channel_id', 'reason'],
+                table='scheduled_actions'):
+            key = (guild_id, member_id, action)
+            if key not in self._pending and key not in self._performing:  # Scheduled or being performed meanwhile
+                self._push(ScheduledAction(guild_id, member_id, action, due_at, channel_id, reason))
+        self.loaded = True
+        self._start()
+
+    async def schedule(self, sql: AsyncSQL, action: ScheduledAction) -> None:
+        """
+        Schedules an action, replacing the pending action of the same kind for the member.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+        action : ScheduledAction
+            The action.
+
+        Returns
+        -------
+        None
+        """
+        self._sql = sql
+        await sql.upsert(
+            table='scheduled_actions',
+            key_columns=['guild_id', 'member_id', 'action'],
+            columns=['guild_id', 'member_id', 'action', 'due_at', 'channel_id', 'reason'],
+            values=[action.guild_id, action.member_id, action.action, action.due_at, action.channel_id, action.reason]
+        )
+        self._push(action)
+        self._start()
+
+    async def cancel(self, sql: AsyncSQL, guild_id: int, member_id: int, action: str) -> bool:
+        """
+        Cancels the pending action of a member. Its row is deleted even if the action is not held in memory, which
+        is the case before the scheduler is loaded.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+        guild_id : int
+            The ID of the guild.
+        member_id : int
+            The ID of the member.
+        action : str
+            The name of the action.
+
+        Returns
+        -------
+        bool
+            Whether an action was pending.
+        """
+        pending = self._pending.pop((guild_id, member_id, action), None) is not None
+        deleted = await sql.delete(table='scheduled_actions',
+                                   where={'guild_id': guild_id, 'member_id': member_id, 'action': action})
+        return pending or deleted > 0
+
+    def remove_guild(self, guild_id: int) -> None:
+        """
+        Drops the pending actions of a guild. Their rows are deleted along with the rest of the guild's data.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+
+        Returns
+        -------
+        None
+        """
+        for key in [key for key in self._pending if key[0] == guild_id]:
+            del self._pending[key]
+
+    def _push(self, action: ScheduledAction) -> None:
+        self._pending[action.key] = action
+        heapq.heappush(self._heap, (action.due_at, next(self._counter), action))
+        self._wakeup.set()  # The new action may be due before the one the timer is sleeping on
+
+    def _start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        try:
+            while self._heap:
+                due_at, _, action = self._heap[0]
+                if self._pending.get(action.key) is not action:  # Rescheduled or cancelled
+                    heapq.heappop(self._heap)
+                    continue
+
+                delay = (due_at - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+                if delay > 0:
+                    self._wakeup.clear()
+                    with contextlib.suppress(asyncio.TimeoutError):
+                        await asyncio.wait_for(self._wakeup.wait(), delay)
+                    continue
+
+                heapq.heappop(self._heap)
+                del self._pending[action.key]
+                self._performing.add(action.key)
+                task = asyncio.create_task(self._perform(action))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            self._task = None
+
+    async def _perform(self, action: ScheduledAction) -> None:
+        try:
+            if handler := self._handlers.get(action.action):
+                await handler(action)
+            else:
+                print(f'No handler is registered for the scheduled action {action.action}')
+        except Exception as e:
+            print(f'The scheduled action {action.action} failed for {action.member_id} in {action.guild_id}: {e}')
+        finally:
+            # Matching the due time keeps a row written by a reschedule made in the meantime
+            try:
+                await self._sql.delete(
+                    table='scheduled_actions',
+                    where={'guild_id': action.guild_id, 'member_id': action.member_id, 'action': action.action,
+                           'due_at': action.due_at}
+                )
+            finally:
+                self._performing.discard(action.key)
+
+
+scheduler = Scheduler()
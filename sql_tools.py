@@ -1,21 +1,587 @@
 # Copyright (c) 2022 Sandeep Kanekal
 import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
 import os
-from typing import Any
+import re
+import time
+import itertools
+import asyncio
+import functools
+import threading
+import contextlib
+from collections import deque, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be acquired from the pool in time."""
+
+
+class PreparedConnection(psycopg2.extensions.connection):
+
+    def __init__(self, *args, **kwargs) -> None:
+        """
+        A connection which keeps a cache of server-side prepared statements.
+        Statements are prepared on first use and reused afterwards, so the server skips parsing and planning them.
+        The least recently used statement is deallocated once the cache holds `max_prepared` statements.
+        """
+        super().__init__(*args, **kwargs)
+        self.max_prepared = int(os.getenv('sql_max_prepared', 100))
+        self.prepared: OrderedDict[str, str] = OrderedDict()  # statement -> name of the prepared statement
+        self._names = itertools.count()
+
+    @staticmethod
+    def _number_placeholders(statement: str) -> str:
+        # PREPARE expects $1, $2, ... instead of psycopg2's %s
+        counter = itertools.count(1)
+        return re.sub(r'%(s|%)', lambda m: f'${next(counter)}' if m.group(1) == 's' else '%', statement)
+
+    def _statement_name(self, statement: str) -> tuple[str, bool]:
+        # Returns the name of the statement and whether it still has to be prepared
+        if statement in self.prepared:
+            self.prepared.move_to_end(statement)
+            return self.prepared[statement], False
+        name = f'b0ss_{next(self._names)}'
+        self.prepared[statement] = name
+        return name, True
+
+    def _evict(self, keep: set[str] = frozenset()) -> list[str]:
+        # Removes the least recently used statements past the cache size, never those in `keep`
+        evicted = []
+        for statement in list(self.prepared):
+            if len(self.prepared) <= self.max_prepared:
+                break
+            if statement not in keep:
+                evicted.append(self.prepared.pop(statement))
+        return evicted
+
+    @staticmethod
+    def _deallocate(cursor, names: list[str]) -> None:
+        # Prepared statements outlive transactions, so those which may exist on the server are deallocated one by
+        # one. The connection is in autocommit mode, a statement which does not exist does not affect the others
+        for name in names:
+            with contextlib.suppress(psycopg2.Error):
+                cursor.execute(f'DEALLOCATE {name}')
+
+    def execute_prepared(self, cursor, statement: str, args: tuple = ()) -> None:
+        """
+        Executes a statement with %s placeholders through the prepared statement cache.
+
+        Parameters
+        ----------
+        cursor : psycopg2.extensions.cursor
+            A cursor of this connection.
+        statement : str
+            The statement to execute.
+        args : tuple, optional
+            The values of the placeholders. The default is ().
+
+        Returns
+        -------
+        None
+        """
+        name, new = self._statement_name(statement)
+        if new:
+            try:
+                cursor.execute(f'PREPARE {name} AS {self._number_placeholders(statement)}')
+            except psycopg2.Error:
+                del self.prepared[statement]
+                raise
+            self._deallocate(cursor, self._evict(keep={statement}))
+
+        if args:
+            cursor.execute(f'EXECUTE {name}({", ".join(["%s"] * len(args))})', args)
+        else:
+            cursor.execute(f'EXECUTE {name}')
+
+    def execute_batch(self, cursor, statements: list[tuple[str, tuple | None]]) -> None:
+        """
+        Executes several statements in a single transaction and a single round trip.
+        The statements are sent as one BEGIN ... COMMIT block, preparing the ones that are not cached yet.
+
+        Parameters
+        ----------
+        cursor : psycopg2.extensions.cursor
+            A cursor of this connection.
+        statements : list[tuple[str, tuple | None]]
+            The statements with %s placeholders and their arguments. Statements whose arguments are None are sent
+            as they are instead of being prepared.
+
+        Returns
+        -------
+        None
+        """
+        encoding = psycopg2.extensions.encodings[self.encoding]
+        batch, new = ['BEGIN'], []
+        for statement, args in statements:
+            if args is None:
+                # Not a statement that can be prepared
+                batch.append(statement)
+                continue
+            name, is_new = self._statement_name(statement)
+            if is_new:
+                new.append(statement)
+                batch.append(f'PREPARE {name} AS {self._number_placeholders(statement)}')
+            if args:
+                batch.append(cursor.mogrify(f'EXECUTE {name}({", ".join(["%s"] * len(args))})', args).decode(encoding))
+            else:
+                batch.append(f'EXECUTE {name}')
+        evicted = self._evict(keep={statement for statement, args in statements if args is not None})
+        batch.extend(f'DEALLOCATE {name}' for name in evicted)
+        batch.append('COMMIT')
+
+        try:
+            cursor.execute(';\n'.join(batch))
+        except psycopg2.Error:
+            with contextlib.suppress(psycopg2.Error):
+                cursor.execute('ROLLBACK')
+            # The statements prepared before the failure and those evicted after it may still exist on the server,
+            # they are deallocated and prepared again on their next use
+            self._deallocate(cursor, [self.prepared.pop(statement) for statement in new] + evicted)
+            raise
+
+
+class ConnectionPool(object):
+
+    def __init__(self, database: str, min_size: int = 1, max_size: int = 10, max_idle: float = 300.0,
+                 health_check_interval: float = 30.0, timeout: float = 30.0) -> None:
+        """
+        A bounded, thread-safe pool of PostgreSQL connections.
+
+        Connections are handed out most-recently-used first so that the warm ones get reused, connections that
+        have been idle for longer than `health_check_interval` are pinged before being handed out, and
+        connections idle for longer than `max_idle` are closed down to `min_size`.
+
+        Parameters
+        ----------
+        database : str
+            The database to connect to.
+        min_size : int, optional
+            The number of idle connections that are never recycled. The default is 1.
+        max_size : int, optional
+            The maximum number of open connections. The default is 10.
+        max_idle : float, optional
+            Seconds after which an idle connection is closed. The default is 300.0.
+        health_check_interval : float, optional
+            Seconds of idleness after which a connection is pinged before reuse. The default is 30.0.
+        timeout : float, optional
+            Seconds to wait for a free connection before raising PoolTimeout. The default is 30.0.
+        """
+        self.database = database
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.timeout = timeout
+        self._idle: deque[tuple[Any, float]] = deque()  # (connection, last used)
+        self._in_use = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._executor: ThreadPoolExecutor | None = None
+        self._counters = {'created': 0, 'closed': 0, 'reconnects': 0, 'acquired': 0, 'waits': 0, 'timeouts': 0}
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """
+        The thread pool which runs blocking queries for AsyncSQL.
+        It has one worker per connection since more threads would only wait on the pool.
+        """
+        with self._condition:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix=f'sql-{self.database}')
+            return self._executor
+
+    def _connect(self):
+        conn = psycopg2.connect(user=os.getenv('sql_user'), password=os.getenv('sql_password'),
+                                database=self.database, host=os.getenv('sql_host'),
+                                connection_factory=PreparedConnection)
+        conn.autocommit = True  # Every statement commits on its own, saving a round trip per write
+        self._count('created')
+        return conn
+
+    def _close(self, conn) -> None:
+        with contextlib.suppress(psycopg2.Error):
+            conn.close()
+        self._count('closed')
+
+    def _count(self, counter: str) -> None:
+        # Connections are opened and closed outside the lock too, the condition's lock is reentrant
+        with self._condition:
+            self._counters[counter] += 1
+
+    @staticmethod
+    def _is_healthy(conn) -> bool:
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _recycle_idle(self) -> None:
+        # The oldest connections sit at the left of the deque
+        now = time.monotonic()
+        while self._idle and len(self._idle) + self._in_use > self.min_size and now - self._idle[0][1] > self.max_idle:
+            conn, _ = self._idle.popleft()
+            self._close(conn)
+
+    def acquire(self):
+        """
+        Acquires a connection, opening a new one if the pool is not full.
+
+        Returns
+        -------
+        psycopg2.extensions.connection
+        """
+        deadline = time.monotonic() + self.timeout
+        conn, last_used = None, 0.0
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise PoolTimeout('The connection pool is closed')
+                self._recycle_idle()
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    break
+                if self._in_use + len(self._idle) < self.max_size:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['timeouts'] += 1
+                    raise PoolTimeout(f'No connection available after {self.timeout} seconds')
+                self._counters['waits'] += 1
+                self._condition.wait(remaining)
+            self._in_use += 1
+            self._counters['acquired'] += 1
+
+        # Connect or health check outside the lock so that other threads are not blocked on network I/O
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif conn.closed or (time.monotonic() - last_used > self.health_check_interval
+                                 and not self._is_healthy(conn)):
+                self._close(conn)
+                conn = self._connect()
+                self._count('reconnects')
+        except Exception:
+            with self._condition:
+                self._in_use -= 1
+                self._condition.notify()
+            raise
+        return conn
+
+    def release(self, conn, discard: bool = False) -> None:
+        """
+        Returns a connection to the pool.
+
+        Parameters
+        ----------
+        conn : psycopg2.extensions.connection
+            The connection to return.
+        discard : bool, optional
+            Close the connection instead of reusing it. The default is False.
+
+        Returns
+        -------
+        None
+        """
+        with self._condition:
+            self._in_use -= 1
+            if discard or conn.closed or self._closed:
+                self._close(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    @contextlib.contextmanager
+    def connection(self, conn=None) -> Iterator[Any]:
+        """
+        Context manager which acquires a connection, unless one already acquired is given, and releases it on exit.
+        Connections that raised a connection-level error are discarded.
+        """
+        conn = conn or self.acquire()
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.release(conn, discard=True)
+            raise
+        except BaseException:
+            self.release(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def stats(self) -> dict[str, int | float]:
+        """
+        Returns the pool's current size and lifetime counters.
+
+        Returns
+        -------
+        dict[str, int | float]
+        """
+        with self._condition:
+            return {
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'in_use': self._in_use,
+                'idle': len(self._idle),
+                **self._counters
+            }
+
+    def close(self) -> None:
+        """
+        Closes every idle connection. Connections in use are closed as they are released.
+
+        Returns
+        -------
+        None
+        """
+        with self._condition:
+            self._closed = True
+            while self._idle:
+                self._close(self._idle.pop()[0])
+            self._condition.notify_all()
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+
+
+_pools: dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database: str) -> ConnectionPool:
+    """
+    Gets the process-wide connection pool for a database, creating it on first use.
+    Sizing is read from the sql_pool_min, sql_pool_max and sql_pool_max_idle environment variables.
+
+    Parameters
+    ----------
+    database : str
+        The database the pool connects to.
+
+    Returns
+    -------
+    ConnectionPool
+    """
+    with _pools_lock:
+        if database not in _pools:
+            _pools[database] = ConnectionPool(
+                database,
+                min_size=int(os.getenv('sql_pool_min', 1)),
+                max_size=int(os.getenv('sql_pool_max', 10)),
+                max_idle=float(os.getenv('sql_pool_max_idle', 300))
+            )
+        return _pools[database]
+
+
+def _where_clause(where: str | dict | None, args: tuple | None) -> tuple[str, tuple]:
+    # A dict is turned into an AND of equality checks, a string is used as is with its placeholder arguments
+    if where is None:
+        return '', ()
+    if isinstance(where, dict):
+        return ' WHERE ' + ' AND '.join(f'{column} = %s' for column in where), tuple(where.values())
+    return f' WHERE {where}', tuple(args or ())
+
+
+def _update_statement(table: str, column: str, value: Any, where: str | dict = None,
+                      args: tuple = None) -> tuple[str, tuple]:
+    where_str, where_args = _where_clause(where, args)
+    return f'UPDATE {table} SET {column} = %s{where_str}', (value, *where_args)
+
+
+def _insert_statement(table: str, columns: list, values: list) -> tuple[str, tuple]:
+    column_str = ', '.join(columns)
+    placeholder_str = ', '.join(['%s'] * len(values))
+    return f'INSERT INTO {table}({column_str}) VALUES({placeholder_str})', tuple(values)
+
+
+def _upsert_statement(table: str, key_columns: list, columns: list, values: list) -> tuple[str, tuple]:
+    statement, args = _insert_statement(table, columns, values)
+    updates = [column for column in columns if column not in key_columns]
+    action = 'UPDATE SET ' + ', '.join(f'{column} = EXCLUDED.{column}' for column in updates) if updates else 'NOTHING'
+    return f'{statement} ON CONFLICT ({", ".join(key_columns)}) DO {action}', args
+
+
+def _delete_statement(table: str, where: str | dict = None, args: tuple = None) -> tuple[str, tuple]:
+    where_str, where_args = _where_clause(where, args)
+    return f'DELETE FROM {table}{where_str}', where_args
+
+
+class Transaction(object):
+
+    def __init__(self, sql: 'SQL') -> None:
+        """
+        Queues write statements and executes them on one connection, in one transaction and one round trip.
+
+        Use it as a context manager, `with sql.transaction() as transaction:` for SQL or
+        `async with sql.transaction() as transaction:` for AsyncSQL. The queued statements are executed when the
+        block exits without an exception and discarded otherwise. Either all of them are committed or none.
+
+        Parameters
+        ----------
+        sql : SQL
+            The SQL object whose connection pool is used.
+        """
+        self.sql = sql
+        self.statements: list[tuple[str, tuple | None]] = []
+
+    def update(self, table: str, column: str, value: Any, where: str | dict = None, args: tuple = None) -> None:
+        """
+        Queues an update. See SQL.update.
+
+        Returns
+        -------
+        None
+        """
+        self.statements.append(_update_statement(table, column, value, where, args))
+
+    def insert(self, table: str, columns: list, values: list) -> None:
+        """
+        Queues an insert. See SQL.insert.
+
+        Returns
+        -------
+        None
+        """
+        self.statements.append(_insert_statement(table, columns, values))
+
+    def upsert(self, table: str, key_columns: list, columns: list, values: list) -> None:
+        """
+        Queues an upsert. See SQL.upsert.
+
+        Returns
+        -------
+        None
+        """
+        self.statements.append(_upsert_statement(table, key_columns, columns, values))
+
+    def delete(self, table: str, where: str | dict = None, args: tuple = None) -> None:
+        """
+        Queues a delete. See SQL.delete.
+
+        Returns
+        -------
+        None
+        """
+        self.statements.append(_delete_statement(table, where, args))
+
+    def query(self, q: str, args: tuple = None) -> None:
+        """
+        Queues a write query with %s placeholders. Like SQL.query, it is prepared only if arguments are given.
+
+        Returns
+        -------
+        None
+        """
+        self.statements.append((q, None if args is None else tuple(args)))
+
+    def execute(self) -> None:
+        """
+        Executes and commits the queued statements, then empties the queue.
+
+        Returns
+        -------
+        None
+        """
+        statements, self.statements = self.statements, []
+        if statements:
+            self.sql.execute_batch(statements)
+
+    def __enter__(self) -> 'Transaction':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.execute()
+        else:
+            self.statements.clear()
+
+    async def __aenter__(self) -> 'Transaction':
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.sql.pool.executor, self.execute)
+        else:
+            self.statements.clear()
 
 
 class SQL(object):
 
     def __init__(self, database: str) -> None:
         self.database = database
+        self.pool = get_pool(database)
 
-    @staticmethod
-    def commit_and_close_connection(conn, cursor):
-        conn.commit()
-        cursor.close()
-        conn.close()
+    def pool_stats(self) -> dict[str, int | float]:
+        """
+        Returns the statistics of the connection pool shared by every SQL object of this database.
+
+        Returns
+        -------
+        dict[str, int | float]
+        """
+        return self.pool.stats()
+
+    def _with_connection(self, func) -> Any:
+        # The call is retried once only if no connection could be opened or the one acquired was already closed,
+        # since a statement which failed may have run and may not be safe to run again
+        for attempt in range(2):
+            try:
+                conn = self.pool.acquire()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                if attempt:
+                    raise
+                continue
+            if conn.closed:
+                self.pool.release(conn, discard=True)
+                if attempt:
+                    raise psycopg2.InterfaceError('The connection acquired was already closed')
+                continue
+            with self.pool.connection(conn), conn.cursor() as cursor:
+                return func(conn, cursor)
+        return None
+
+    def _execute(self, statement: str, args: tuple = (), fetch: bool = False,
+                 prepare: bool = True) -> list[tuple[Any, ...]] | None:
+        def run(conn, cursor):
+            if prepare:
+                conn.execute_prepared(cursor, statement, args)
+            else:
+                cursor.execute(statement)
+            return cursor.fetchall() if fetch else None
+
+        return self._with_connection(run)
+
+    def execute_batch(self, statements: list[tuple[str, tuple | None]]) -> None:
+        """
+        Executes statements with %s placeholders in a single transaction and round trip.
+
+        Parameters
+        ----------
+        statements : list[tuple[str, tuple | None]]
+            The statements and their arguments. See PreparedConnection.execute_batch.
+
+        Returns
+        -------
+        None
+        """
+        self._with_connection(lambda conn, cursor: conn.execute_batch(cursor, statements))
+
+    def transaction(self) -> Transaction:
+        """
+        Returns a Transaction which queues statements and commits them together when its block exits.
 
-    def select(self, elements: list, table: str, where: str = None) -> list[tuple[Any, ...]]:
+        Returns
+        -------
+        Transaction
+        """
+        return Transaction(self)
+
+    def select(self, elements: list, table: str, where: str | dict = None,
+               args: tuple = None) -> list[tuple[Any, ...]]:
         """
         Selects elements from a database.
 
@@ -25,31 +591,22 @@ class SQL(object):
             The elements to select.
         table : str
             The table to select from.
-        where : str, optional
-            The where clause. The default is None.
+        where : str | dict, optional
+            The where clause, either as a mapping of columns to values or as a string with %s placeholders.
+            The default is None.
+        args : tuple, optional
+            The values of the placeholders in a string where clause. The default is None.
 
         Returns
         -------
         list[tuple[Any, ...]]
         """
-        # Connect to the database
-        conn = psycopg2.connect(user=os.getenv('sql_user'), password=os.getenv('sql_password'), database=self.database,
-                                host=os.getenv('sql_host'))
-        cursor = conn.cursor()
         element_str = ', '.join(elements)
+        where_str, where_args = _where_clause(where, args)
         # Select the elements
-        if where is None:
-            cursor.execute(f'SELECT {element_str} FROM {table}')
-        else:
-            cursor.execute(f'SELECT {element_str} FROM {table} WHERE {where}')
-        # Fetch the results
-        results = cursor.fetchall()
-        # Close the connection
-        cursor.close()
-        conn.close()
-        return results
+        return self._execute(f'SELECT {element_str} FROM {table}{where_str}', where_args, fetch=True)
 
-    def update(self, table: str, column: str, value: Any, where: str = None) -> None:
+    def update(self, table: str, column: str, value: Any, where: str | dict = None, args: tuple = None) -> None:
         """
         Updates a database.
 
@@ -61,23 +618,18 @@ class SQL(object):
             The column to update.
         value : Any
             The value to update.
-        where : str, optional
-            The where clause. The default is None.
+        where : str | dict, optional
+            The where clause, either as a mapping of columns to values or as a string with %s placeholders.
+            The default is None.
+        args : tuple, optional
+            The values of the placeholders in a string where clause. The default is None.
 
         Returns
         -------
         None
         """
-        # Connect to the database
-        conn = psycopg2.connect(user=os.getenv('sql_user'), password=os.getenv('sql_password'), database=self.database,
-                                host=os.getenv('sql_host'))
-        cursor = conn.cursor()
         # Update the database
-        if where is None:
-            cursor.execute(f'UPDATE {table} SET {column} = {value}')
-        else:
-            cursor.execute(f'UPDATE {table} SET {column} = {value} WHERE {where}')
-        self.commit_and_close_connection(conn, cursor)
+        self._execute(*_update_statement(table, column, value, where, args))
 
     def insert(self, table: str, columns: list, values: list) -> None:
         """
@@ -96,18 +648,58 @@ class SQL(object):
         -------
         None
         """
-        # Connect to the database
-        conn = psycopg2.connect(user=os.getenv('sql_user'), password=os.getenv('sql_password'), database=self.database,
-                                host=os.getenv('sql_host'))
-        cursor = conn.cursor()
-        # Converting to strings
-        column_str = ', '.join(columns)
-        value_str = ', '.join(values)
         # Insert into the database
-        cursor.execute(f'INSERT INTO {table}({column_str}) VALUES({value_str})')
-        self.commit_and_close_connection(conn, cursor)
+        self._execute(*_insert_statement(table, columns, values))
 
-    def delete(self, table: str, where: str = None) -> None:
+    def insert_many(self, table: str, columns: list, rows: list[list]) -> None:
+        """
+        Inserts several rows into a database with a single multi-row statement.
+
+        Parameters
+        ----------
+        table : str
+            The table to insert into.
+        columns : list
+            The columns to insert.
+        rows : list[list]
+            The values of each row to insert.
+
+        Returns
+        -------
+        None
+        """
+        if not rows:
+            return
+        statement = f'INSERT INTO {table}({", ".join(columns)}) VALUES %s'
+        # Not prepared, every number of rows would be a different statement
+        self._with_connection(
+            lambda conn, cursor: psycopg2.extras.execute_values(cursor, statement, rows, page_size=len(rows))
+        )
+
+    def upsert(self, table: str, key_columns: list, columns: list, values: list) -> None:
+        """
+        Inserts into a database, or updates the row which has the same key columns.
+        The key columns need a unique index, see migrations.py.
+
+        Parameters
+        ----------
+        table : str
+            The table to insert into.
+        key_columns : list
+            The columns which identify the row.
+        columns : list
+            The columns to insert, including the key columns.
+        values : list
+            The values to insert.
+
+        Returns
+        -------
+        None
+        """
+        # Insert or update in a single statement
+        self._execute(*_upsert_statement(table, key_columns, columns, values))
+
+    def delete(self, table: str, where: str | dict = None, args: tuple = None) -> int:
         """
         Deletes from a database.
 
@@ -115,45 +707,156 @@ class SQL(object):
         ----------
         table : str
             The table to delete from.
-        where : str, optional
-            The where clause. The default is None.
+        where : str | dict, optional
+            The where clause, either as a mapping of columns to values or as a string with %s placeholders.
+            The default is None.
+        args : tuple, optional
+            The values of the placeholders in a string where clause. The default is None.
 
         Returns
         -------
-        None
+        int
+            The number of rows deleted.
         """
-        # Connect to the database
-        conn = psycopg2.connect(user=os.getenv('sql_user'), password=os.getenv('sql_password'), database=self.database,
-                                host=os.getenv('sql_host'))
-        cursor = conn.cursor()
+        statement, statement_args = _delete_statement(table, where, args)
+
+        def run(conn, cursor):
+            conn.execute_prepared(cursor, statement, statement_args)
+            return cursor.rowcount
+
         # Delete from the database
-        cursor.execute(f'DELETE FROM {table} WHERE {where}' if where else f'DELETE FROM {table}')
-        self.commit_and_close_connection(conn, cursor)
+        return self._with_connection(run)
 
-    def query(self, q) -> Any:
+    def query(self, q: str, args: tuple = None) -> Any:
         """
         Queries a database.
+        Queries with arguments are prepared, queries without arguments are sent as they are since they may
+        contain several statements.
 
         Parameters
         ----------
         q : str
             The query to run.
+        args : tuple, optional
+            The values of the %s placeholders in the query. The default is None.
 
         Returns
         -------
         Any
         """
-        # Connect to the database
-        conn = psycopg2.connect(user=os.getenv('sql_user'), password=os.getenv('sql_password'), database=self.database,
-                                host=os.getenv('sql_host'))
-        cursor = conn.cursor()
-        # Query the database
-        cursor.execute(q)
-        # Fetch the results
-        results = cursor.fetchall() if q.startswith('SELECT') or q.startswith('select') else None
-        if not q.startswith('SELECT') or not q.startswith('select'):
-            conn.commit()  # Commit
-        # Close the connection
-        cursor.close()
-        conn.close()
-        return results
+        # Fetch the results only for SELECT queries
+        return self._execute(q, tuple(args or ()), fetch=q.startswith('SELECT') or q.startswith('select'),
+                             prepare=args is not None)
+
+
+class AsyncSQL(object):
+
+    def __init__(self, database: str) -> None:
+        """
+        An awaitable counterpart of SQL for use inside coroutines.
+        Every query runs on the connection pool's executor so that the event loop is never blocked by the database.
+
+        Parameters
+        ----------
+        database : str
+            The database to connect to.
+        """
+        self.database = database
+        self.sql = SQL(database)
+
+    async def _run(self, func, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.sql.pool.executor, functools.partial(func, *args, **kwargs))
+
+    def pool_stats(self) -> dict[str, int | float]:
+        """
+        Returns the statistics of the connection pool shared by every SQL object of this database.
+
+        Returns
+        -------
+        dict[str, int | float]
+        """
+        return self.sql.pool_stats()
+
+    async def select(self, elements: list, table: str, where: str | dict = None,
+                     args: tuple = None) -> list[tuple[Any, ...]]:
+        """
+        Selects elements from a database. See SQL.select.
+
+        Returns
+        -------
+        list[tuple[Any, ...]]
+        """
+        return await self._run(self.sql.select, elements, table, where, args)
+
+    async def update(self, table: str, column: str, value: Any, where: str | dict = None, args: tuple = None) -> None:
+        """
+        Updates a database. See SQL.update.
+
+        Returns
+        -------
+        None
+        """
+        await self._run(self.sql.update, table, column, value, where, args)
+
+    async def insert(self, table: str, columns: list, values: list) -> None:
+        """
+        Inserts into a database. See SQL.insert.
+
+        Returns
+        -------
+        None
+        """
+        await self._run(self.sql.insert, table, columns, values)
+
+    async def insert_many(self, table: str, columns: list, rows: list[list]) -> None:
+        """
+        Inserts several rows into a database. See SQL.insert_many.
+
+        Returns
+        -------
+        None
+        """
+        await self._run(self.sql.insert_many, table, columns, rows)
+
+    async def upsert(self, table: str, key_columns: list, columns: list, values: list) -> None:
+        """
+        Inserts into or updates a database. See SQL.upsert.
+
+        Returns
+        -------
+        None
+        """
+        await self._run(self.sql.upsert, table, key_columns, columns, values)
+
+    async def delete(self, table: str, where: str | dict = None, args: tuple = None) -> int:
+        """
+        Deletes from a database. See SQL.delete.
+
+        Returns
+        -------
+        int
+            The number of rows deleted.
+        """
+        return await self._run(self.sql.delete, table, where, args)
+
+    async def query(self, q: str, args: tuple = None) -> Any:
+        """
+        Queries a database. See SQL.query.
+
+        Returns
+        -------
+        Any
+        """
+        return await self._run(self.sql.query, q, args)
+
+    def transaction(self) -> Transaction:
+        """
+        Returns a Transaction to be used with `async with`. Its statements are committed on the executor.
+
+        Returns
+        -------
+        Transaction
+        """
+        return Transaction(self.sql)
+
@@ -2,6 +2,8 @@
 # Tools for making complex tasks easier
 import discord
 import datetime
+import functools
+import re
 import time
 import asyncpraw
 import requests
@@ -10,7 +12,6 @@ from discord.ext.commands import Bot
 from asyncpraw.reddit import Submission
 from typing import List, Dict
 from googleapiclient.discovery import build
-from googletrans import Translator
 
 
 # A function to send embeds when there are false calls or errors
@@ -184,19 +185,112 @@ def update_nick_name(nick_name: str) -> str:
     return " ".join(nick_name.split()[1:]) if '[AFK]' in nick_name.split() else nick_name
 
 
-def translate(text: str) -> str:
+# Words of the relative times shown by YouTube, in the languages it is commonly used in, with their length.
+# A word matches a unit if it starts with one of the prefixes or is one of the exact words.
+# Months and years are approximated as 30 and 365 days.
+_TIME_UNITS = [
+    (datetime.timedelta(seconds=1),
+     ('sec', 'sek', 'segund', 'secondo', 'secondi', 'секунд', '秒', 'सेकंड', 'saniye', '초'), ()),
+    (datetime.timedelta(minutes=1),
+     ('min', 'минут', '分', 'मिनट', 'dakika', '분'), ()),
+    (datetime.timedelta(hours=1),
+     ('hour', 'stunde', 'heure', 'hora', 'uur', 'час', '時間', '小时', '小時', 'घंट', 'saat', 'godzin', '시간'),
+     ('ora', 'ore')),
+    (datetime.timedelta(days=1),
+     ('day', 'tag', 'jour', 'día', 'dia', 'giorn', 'dag', 'дн', 'день', '日', '天', 'दिन', 'gün', 'dzie', 'dni', '일'),
+     ()),
+    (datetime.timedelta(weeks=1),
+     ('week', 'woche', 'semaine', 'semana', 'settiman', 'недел', '週', '周', 'सप्ताह', 'hafta', 'tydz', 'tygod', '주'),
+     ('weken',)),
+    (datetime.timedelta(days=30),
+     ('month', 'monat', 'mois', 'mes', 'mês', 'maand', 'месяц', 'か月', 'ヶ月', '个月', '個月', 'महीन', 'miesi', '개월'),
+     ('ay',)),
+    (datetime.timedelta(days=365),
+     ('year', 'jahr', 'año', 'ano', 'anni', 'anno', 'jaar', 'год', '年', 'वर्ष', 'साल', 'yıl', 'rok', '년'),
+     ('an', 'ans', 'jaren', 'лет', 'lat', 'lata')),
+]
+
+# Relative times as YouTube shows them in each of those languages, singular and plural, checked by running this module
+_RELATIVE_TIME_EXAMPLES = [
+    # English
+    ('1 second ago', datetime.timedelta(seconds=1)), ('5 minutes ago', datetime.timedelta(minutes=5)),
+    ('1 hour ago', datetime.timedelta(hours=1)), ('3 days ago', datetime.timedelta(days=3)),
+    ('2 weeks ago', datetime.timedelta(weeks=2)), ('1 month ago', datetime.timedelta(days=30)),
+    ('4 years ago', datetime.timedelta(days=4 * 365)),
+    # German
+    ('vor 2 Stunden', datetime.timedelta(hours=2)), ('vor 1 Tag', datetime.timedelta(days=1)),
+    ('vor 3 Wochen', datetime.timedelta(weeks=3)), ('vor 2 Monaten', datetime.timedelta(days=60)),
+    ('vor 2 Jahren', datetime.timedelta(days=730)),
+    # French
+    ('il y a 1 heure', datetime.timedelta(hours=1)), ('il y a 2 semaines', datetime.timedelta(weeks=2)),
+    ('il y a 3 mois', datetime.timedelta(days=90)), ('il y a 1 an', datetime.timedelta(days=365)),
+    ('il y a 5 ans', datetime.timedelta(days=5 * 365)),
+    # Spanish and Portuguese
+    ('hace 2 horas', datetime.timedelta(hours=2)), ('hace 1 día', datetime.timedelta(days=1)),
+    ('hace 3 meses', datetime.timedelta(days=90)), ('hace 2 años', datetime.timedelta(days=730)),
+    ('há 4 dias', datetime.timedelta(days=4)), ('há 1 mês', datetime.timedelta(days=30)),
+    ('há 2 anos', datetime.timedelta(days=730)),
+    # Italian
+    ('1 ora fa', datetime.timedelta(hours=1)), ('3 ore fa', datetime.timedelta(hours=3)),
+    ('2 giorni fa', datetime.timedelta(days=2)), ('2 settimane fa', datetime.timedelta(weeks=2)),
+    ('5 mesi fa', datetime.timedelta(days=150)), ('2 anni fa', datetime.timedelta(days=730)),
+    # Dutch
+    ('3 uur geleden', datetime.timedelta(hours=3)), ('2 dagen geleden', datetime.timedelta(days=2)),
+    ('1 week geleden', datetime.timedelta(weeks=1)), ('2 weken geleden', datetime.timedelta(weeks=2)),
+    ('4 maanden geleden', datetime.timedelta(days=120)), ('1 jaar geleden', datetime.timedelta(days=365)),
+    ('3 jaren geleden', datetime.timedelta(days=3 * 365)),
+    # Russian
+    ('5 минут назад', datetime.timedelta(minutes=5)), ('2 часа назад', datetime.timedelta(hours=2)),
+    ('3 дня назад', datetime.timedelta(days=3)), ('2 недели назад', datetime.timedelta(weeks=2)),
+    ('6 месяцев назад', datetime.timedelta(days=180)), ('5 лет назад', datetime.timedelta(days=5 * 365)),
+    # Polish
+    ('2 godziny temu', datetime.timedelta(hours=2)), ('3 dni temu', datetime.timedelta(days=3)),
+    ('2 tygodnie temu', datetime.timedelta(weeks=2)), ('5 miesięcy temu', datetime.timedelta(days=150)),
+    ('2 lata temu', datetime.timedelta(days=730)), ('5 lat temu', datetime.timedelta(days=5 * 365)),
+    # Turkish
+    ('3 saat önce', datetime.timedelta(hours=3)), ('2 hafta önce', datetime.timedelta(weeks=2)),
+    ('1 ay önce', datetime.timedelta(days=30)), ('2 yıl önce', datetime.timedelta(days=730)),
+    # Hindi
+    ('2 घंटे पहले', datetime.timedelta(hours=2)), ('3 महीने पहले', datetime.timedelta(days=90)),
+    # Japanese, Chinese and Korean
+    ('3時間前', datetime.timedelta(hours=3)), ('2 週間前', datetime.timedelta(weeks=2)),
+    ('1 か月前', datetime.timedelta(days=30)), ('2 小时前', datetime.timedelta(hours=2)),
+    ('3 天前', datetime.timedelta(days=3)), ('1 年前', datetime.timedelta(days=365)),
+    ('2시간 전', datetime.timedelta(hours=2)), ('3주 전', datetime.timedelta(weeks=3)),
+    ('1년 전', datetime.timedelta(days=365)),
+]
+
+# A number followed by a word, the space is optional for the languages which do not use one
+_RELATIVE_TIME = re.compile(r'(\d+)\s*([^\d\s]+)')
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_relative_time(text: str) -> datetime.timedelta | None:
     """
-    Translates the text to english
+    Parses a relative time such as '3 minutes ago', 'vor 2 Stunden' or '3時間前'.
+    The results are cached, since the same few texts are parsed over and over.
 
     Parameters
     ----------
     text : str
-        The text to translate
+        The relative time
 
     Returns
     -------
-    str
-        The translated text
+    datetime.timedelta | None
+        The time elapsed, None if the text could not be parsed
     """
-    tr = Translator()
-    return tr.translate(text).text
+    for number, word in _RELATIVE_TIME.findall(text.lower()):
+        for unit, prefixes, words in _TIME_UNITS:
+            if word.startswith(prefixes) or word in words:
+                return int(number) * unit
+    return None
+
+
+if __name__ == '__main__':
+    # Checks the relative time parser against the examples
+    failures = [(text, expected, parse_relative_time(text)) for text, expected in _RELATIVE_TIME_EXAMPLES
+                if parse_relative_time(text) != expected]
+    for text, expected, parsed in failures:
+        print(f'{text!r}: expected {expected}, parsed {parsed}')
+    print(f'{len(_RELATIVE_TIME_EXAMPLES) - len(failures)} of {len(_RELATIVE_TIME_EXAMPLES)} relative times parsed')
@@ -0,0 +1,233 @@
+# Copyright (c) 2022 Sandeep Kanekal
+# In-memory index of the message responses of the guilds
+from collections import deque
+from sql_tools import AsyncSQL
+from cache import guild_features, Feature
+
+MATCH_TYPES = ['exact', 'contains', 'word']
+
+
+class Automaton(object):
+
+    def __init__(self, patterns: list[str]) -> None:
+        """
+        An Aho-Corasick automaton, finding every occurrence of a set of patterns in a single pass over a text.
+
+        Parameters
+        ----------
+        patterns : list[str]
+            The patterns to search for.
+        """
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[list[str]] = [[]]
+
+        # Build the trie
+        for pattern in patterns:
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append(pattern)
+
+        # Link every state to its longest proper suffix in the trie, breadth first
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def search(self, text: str):
+        """
+        Yields the start index and the pattern of every occurrence, in the order they end.
+
+        Parameters
+        ----------
+        text : str
+            The text to search.
+
+        Returns
+        -------
+        Iterator[tuple[int, str]]
+        """
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern in self._output[state]:
+                yield index - len(pattern) + 1, pattern
+
+
+def _is_word(text: str, start: int, end: int) -> bool:
+    # Whether text[start:end] is not part of a longer word
+    before = text[start - 1] if start > 0 else ' '
+    after = text[end] if end < len(text) else ' '
+    return not (before.isalnum() or before == '_') and not (after.isalnum() or after == '_')
+
+
+class GuildTriggers(object):
+
+    def __init__(self) -> None:
+        """
+        The message responses of a guild. Exact triggers are looked up in a dict, contains and word triggers are
+        matched by an automaton which is rebuilt only when those triggers change.
+        """
+        self.exact: dict[str, str] = {}
+        self.patterns: dict[str, tuple[str, str]] = {}
+        self._automaton: Automaton | None = None
+
+    def add(self, message: str, response: str, match_type: str = 'exact') -> None:
+        self.remove(message)
+        if match_type == 'exact':
+            self.exact[message] = response
+        else:
+            self.patterns[message] = (match_type, response)
+            self._automaton = None
+
+    def remove(self, message: str) -> None:
+        self.exact.pop(message, None)
+        if self.patterns.pop(message, None) is not None:
+            self._automaton = None
+
+    def match(self, content: str) -> str | None:
+        if (response := self.exact.get(content)) is not None:
+            return response
+        if not self.patterns:
+            return None
+
+        if self._automaton is None:
+            self._automaton = Automaton(list(self.patterns))
+
+        # The leftmost occurrence wins, the longest one among those starting at the same index
+        best: tuple[int, int, str] | None = None
+        for start, pattern in self._automaton.search(content):
+            match_type, response = self.patterns[pattern]
+            if match_type == 'word' and not _is_word(content, start, start + len(pattern)):
+                continue
+            if best is None or (start, -len(pattern)) < (best[0], -best[1]):
+                best = (start, len(pattern), response)
+        return best[2] if best else None
+
+    def __bool__(self) -> bool:
+        return bool(self.exact or self.patterns)
+
+
+class TriggerIndex(object):
+
+    def __init__(self) -> None:
+        """
+        Holds the message responses of every guild. Commands changing the responses write to the database and
+        update the index of the guild.
+        """
+        self._guilds: dict[int, GuildTriggers] = {}
+
+    async def load(self, sql: AsyncSQL) -> None:
+        """
+        Loads the message responses of all the guilds from the database.
+
+        Parameters
+        ----------
+        sql : AsyncSQL
+            The AsyncSQL object of the database.
+
+        Returns
+        -------
+        None
+        """
+        guilds: dict[int, GuildTriggers] = {}
+        for guild_id, message, response, match_type in await sql.select(
+                elements=['guild_id', 'message', 'response', 'match_type'], table='message_responses'):
+            guilds.setdefault(int(guild_id), GuildTriggers()).add(message, response, match_type)
+        self._guilds = guilds
+        guild_features.reset(Feature.TRIGGERS, guilds)
+
+    def add(self, guild_id: int, message: str, response: str, match_type: str = 'exact') -> None:
+        """
+        Adds or replaces a message response of a guild.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+        message : str
+            The lowercase trigger.
+        response : str
+            The response.
+        match_type : str, optional
+            One of MATCH_TYPES. The default is 'exact'.
+
+        Returns
+        -------
+        None
+        """
+        self._guilds.setdefault(guild_id, GuildTriggers()).add(message, response, match_type)
+        guild_features.set(guild_id, Feature.TRIGGERS, True)
+
+    def remove(self, guild_id: int, message: str) -> None:
+        """
+        Removes a message response of a guild.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+        message : str
+            The lowercase trigger.
+
+        Returns
+        -------
+        None
+        """
+        if guild := self._guilds.get(guild_id):
+            guild.remove(message)
+            if not guild:
+                del self._guilds[guild_id]
+                guild_features.set(guild_id, Feature.TRIGGERS, False)
+
+    def remove_guild(self, guild_id: int) -> None:
+        """
+        Removes all the message responses of a guild.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+
+        Returns
+        -------
+        None
+        """
+        self._guilds.pop(guild_id, None)
+        guild_features.set(guild_id, Feature.TRIGGERS, False)
+
+    def match(self, guild_id: int, content: str) -> str | None:
+        """
+        Returns the response to a message, None if no trigger matches.
+
+        Parameters
+        ----------
+        guild_id : int
+            The ID of the guild.
+        content : str
+            The lowercase content of the message.
+
+        Returns
+        -------
+        str | None
+        """
+        if guild := self._guilds.get(guild_id):
+            return guild.match(content)
+        return None
+
+
+triggers = TriggerIndex()
@@ -8,6 +8,7 @@ import datetime
 from discord.ext import commands
 from tools import send_error_embed, get_quote
 from sql_tools import SQL
+from typing import Callable
 from asyncpraw.reddit import Submission
 
 
@@ -1328,11 +1329,13 @@ class MessageresponseView(discord.ui.View):
 
 # noinspection PyUnusedLocal
 class ClearView(discord.ui.View):
-    def __init__(self, sql: SQL, author: discord.Member, table: str, timeout: float | None = None):
+    def __init__(self, sql: SQL, author: discord.Member, table: str, timeout: float | None = None,
+                 on_clear: Callable[[int], None] | None = None):
         super().__init__(timeout=timeout)
         self.sql = sql
         self.author = author
         self.table = table
+        self.on_clear = on_clear  # Called with the guild ID once the data is deleted
 
     @discord.ui.button(label='Yes', style=discord.ButtonStyle.red)
     async def yes(self, button: discord.Button, interaction: discord.Interaction):
@@ -1342,8 +1345,10 @@ class ClearView(discord.ui.View):
 
         self.sql.delete(
             table=self.table,
-            where=f"guild_id = '{self.author.guild.id}'"
+            where={'guild_id': self.author.guild.id}
         )
+        if self.on_clear is not None:
+            self.on_clear(self.author.guild.id)
 
         for item in self.children:
             item.disabled = True
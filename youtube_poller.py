@@ -0,0 +1,355 @@
+# Copyright (c) 2022 Sandeep Kanekal
+# Fetches the uploads of the YouTube channels followed by the guilds
+import asyncio
+import datetime
+import heapq
+import os
+import random
+import threading
+import requests
+import scrapetube as youtube
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from tools import parse_relative_time
+
+# Videos published longer ago are not notified
+RECENT = datetime.timedelta(days=1)
+
+FEED_NAMESPACES = {'atom': 'http://www.w3.org/2005/Atom', 'yt': 'http://www.youtube.com/xml/schemas/2015'}
+
+
+class ChannelUploads(object):
+
+    def __init__(self, video_ids: list[str], dated_index: int | None = None,
+                 published_at: datetime.datetime | None = None) -> None:
+        """
+        The latest uploads of a YouTube channel.
+
+        Parameters
+        ----------
+        video_ids : list[str]
+            The IDs of the videos, the latest first.
+        dated_index : int | None, optional
+            The index of the latest video with a publish time, None if there is none. The default is None.
+        published_at : datetime.datetime | None, optional
+            When that video was published, timezone aware, None if it is unknown. The default is None.
+        """
+        self.video_ids = video_ids
+        self.dated_index = dated_index
+        self.published_at = published_at
+
+    @property
+    def recent(self) -> bool | None:
+        # Whether the latest video with a publish time was published recently, None if it is unknown
+        if self.published_at is None:
+            return None
+        return datetime.datetime.now(datetime.timezone.utc) - self.published_at < RECENT
+
+    def new_videos(self, latest_video_id: str) -> list[str]:
+        """
+        Returns the videos uploaded after a video, the latest first.
+        Nothing is returned if the latest new video with a publish time is not recent, so that old videos
+        reappearing in the uploads are not notified.
+
+        Parameters
+        ----------
+        latest_video_id : str
+            The ID of the latest video notified.
+
+        Returns
+        -------
+        list[str]
+        """
+        new_videos = []
+        for video_id in self.video_ids:
+            if video_id == latest_video_id:
+                break
+            new_videos.append(video_id)
+
+        if self.dated_index is not None and self.dated_index < len(new_videos) and self.recent is False:
+            return []
+        return new_videos
+
+
+def fetch_uploads(channel_id: str, limit: int = 20) -> ChannelUploads:
+    """
+    Fetches the latest uploads of a YouTube channel. Blocks while doing so.
+
+    Parameters
+    ----------
+    channel_id : str
+        The ID of the YouTube channel.
+    limit : int, optional
+        The number of videos to fetch. The default is 20.
+
+    Returns
+    -------
+    ChannelUploads
+    """
+    video_ids, dated_index, published_at = [], None, None
+    for video in youtube.get_channel(channel_id, limit=limit):
+        if dated_index is None and 'publishedTimeText' in video:
+            dated_index = len(video_ids)
+            if (age := parse_relative_time(video['publishedTimeText'].get('simpleText', ''))) is not None:
+                published_at = datetime.datetime.now(datetime.timezone.utc) - age
+        video_ids.append(video['videoId'])
+    return ChannelUploads(video_ids, dated_index, published_at)
+
+
+class FeedReader(object):
+
+    def __init__(self, url: str = 'https://www.youtube.com/feeds/videos.xml?channel_id={}', timeout: float = 30.0) -> None:
+        """
+        Reads the Atom feeds of YouTube channels, which list their 15 latest uploads with their publish times.
+        Feeds are requested conditionally with the ETag and Last-Modified of the previous response, so that an
+        unchanged feed costs a 304 and its previous uploads are reused.
+
+        Parameters
+        ----------
+        url : str, optional
+            The URL of the feeds, formatted with the channel ID. The default is YouTube's.
+        timeout : float, optional
+            Seconds to wait for a response. The default is 30.0.
+        """
+        self.url = url
+        self.timeout = timeout
+        self._validators: dict[str, tuple[dict[str, str], ChannelUploads]] = {}
+        self._local = threading.local()  # A session per thread of the poller
+
+    @property
+    def session(self) -> requests.Session:
+        if not hasattr(self._local, 'session'):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    @staticmethod
+    def parse(feed: bytes) -> ChannelUploads:
+        """
+        Parses the uploads of a channel out of its feed.
+
+        Parameters
+        ----------
+        feed : bytes
+            The Atom feed.
+
+        Returns
+        -------
+        ChannelUploads
+        """
+        video_ids, published_at = [], None
+        for entry in ElementTree.fromstring(feed).iterfind('atom:entry', FEED_NAMESPACES):
+            video_ids.append(entry.findtext('yt:videoId', namespaces=FEED_NAMESPACES))
+            if published_at is None and (published := entry.findtext('atom:published', namespaces=FEED_NAMESPACES)):
+                published_at = datetime.datetime.fromisoformat(published)
+        return ChannelUploads(video_ids, 0 if video_ids else None, published_at)
+
+    def fetch(self, channel_id: str) -> ChannelUploads:
+        """
+        Fetches the latest uploads of a YouTube channel. Blocks while doing so.
+
+        Parameters
+        ----------
+        channel_id : str
+            The ID of the YouTube channel.
+
+        Returns
+        -------
+        ChannelUploads
+        """
+        validators, uploads = self._validators.get(channel_id, ({}, None))
+        response = self.session.get(self.url.format(channel_id), headers=validators, timeout=self.timeout)
+        if response.status_code == 304 and uploads is not None:
+            return uploads
+        response.raise_for_status()
+
+        uploads = self.parse(response.content)
+        validators = {}
+        if etag := response.headers.get('ETag'):
+            validators['If-None-Match'] = etag
+        if last_modified := response.headers.get('Last-Modified'):
+            validators['If-Modified-Since'] = last_modified
+        self._validators[channel_id] = (validators, uploads)
+        return uploads
+
+
+class YoutubePoller(object):
+
+    def __init__(self, fetch: Callable[[str], ChannelUploads] = fetch_uploads, concurrency: int = 8,
+                 timeout: float = 30.0) -> None:
+        """
+        Fetches the uploads of YouTube channels on a pool of `concurrency` threads, so that the event loop is not
+        blocked and a poll takes about as long as its slowest channel.
+
+        Parameters
+        ----------
+        fetch : Callable[[str], ChannelUploads], optional
+            The blocking function fetching the uploads of a channel. The default scrapes the channel page.
+        concurrency : int, optional
+            Maximum number of channels fetched at once. The default is 8.
+        timeout : float, optional
+            Seconds after which a fetch is given up. Its thread finishes in the background. The default is 30.0.
+        """
+        self.fetch_uploads = fetch
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self._executor: ThreadPoolExecutor | None = None
+        self._semaphore = asyncio.Semaphore(concurrency)  # The timeout starts once a thread is free
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        # Created on first use
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='youtube')
+        return self._executor
+
+    async def fetch(self, channel_id: str) -> ChannelUploads:
+        """
+        Fetches the latest uploads of a YouTube channel.
+
+        Parameters
+        ----------
+        channel_id : str
+            The ID of the YouTube channel.
+
+        Returns
+        -------
+        ChannelUploads
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            If the fetch takes longer than the timeout.
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            return await asyncio.wait_for(loop.run_in_executor(self.executor, self.fetch_uploads, channel_id),
+                                          self.timeout)
+
+    async def poll(self, channel_ids: list[str]) -> dict[str, ChannelUploads | Exception]:
+        """
+        Fetches the latest uploads of several YouTube channels concurrently.
+
+        Parameters
+        ----------
+        channel_ids : list[str]
+            The IDs of the YouTube channels, each fetched once.
+
+        Returns
+        -------
+        dict[str, ChannelUploads | Exception]
+            The uploads of each channel, or the exception raised while fetching them.
+        """
+        channel_ids = list(dict.fromkeys(channel_ids))
+        results = await asyncio.gather(*(self.fetch(channel_id) for channel_id in channel_ids), return_exceptions=True)
+        return dict(zip(channel_ids, results))
+
+
+class PollSchedule(object):
+
+    def __init__(self, min_interval: int = 300, max_interval: int = 3600, ratio: float = 48.0) -> None:
+        """
+        Decides when each YouTube channel is polled. A channel is polled again after a fraction `1 / ratio` of the
+        time since its latest upload, between `min_interval` and `max_interval` seconds, so that channels which
+        uploaded recently are polled every few minutes and dormant ones hourly.
+        The channels are kept in a min-heap of their next poll times.
+
+        Parameters
+        ----------
+        min_interval : int, optional
+            Shortest interval in seconds. The default is 300.
+        max_interval : int, optional
+            Longest interval in seconds. The default is 3600.
+        ratio : float, optional
+            Time since the latest upload per second of interval. The default is 48.0.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.ratio = ratio
+        self._heap: list[tuple[datetime.datetime, str]] = []
+        self._next: dict[str, datetime.datetime] = {}
+
+    def interval(self, last_upload_at: datetime.datetime | None) -> int:
+        """
+        Returns the poll interval of a channel in seconds.
+
+        Parameters
+        ----------
+        last_upload_at : datetime.datetime | None
+            When the channel last uploaded, None if it is unknown.
+
+        Returns
+        -------
+        int
+        """
+        if last_upload_at is None:
+            return self.min_interval
+        idle = (datetime.datetime.now(datetime.timezone.utc) - last_upload_at).total_seconds()
+        return int(min(max(idle / self.ratio, self.min_interval), self.max_interval))
+
+    def due(self, channels: dict[str, tuple[int, datetime.datetime | None]]) -> list[str]:
+        """
+        Pops the channels whose poll is due, and drops the channels which are no longer followed.
+        Channels not seen before are seeded from their stored poll interval, at a random point within it, so that
+        the channels are not all due at once after a restart. Channels which were never polled are due right away.
+
+        Parameters
+        ----------
+        channels : dict[str, tuple[int, datetime.datetime | None]]
+            The stored poll interval and time of the latest upload of each YouTube channel followed.
+
+        Returns
+        -------
+        list[str]
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        for channel_id in channels.keys() - self._next.keys():
+            poll_interval, last_upload_at = channels[channel_id]
+            self.schedule(channel_id, 0 if last_upload_at is None else random.uniform(0, poll_interval), now)
+        for channel_id in self._next.keys() - channels.keys():
+            del self._next[channel_id]
+
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            poll_at, channel_id = heapq.heappop(self._heap)
+            if self._next.get(channel_id) == poll_at:  # Otherwise rescheduled or dropped
+                del self._next[channel_id]
+                due.append(channel_id)
+        return due
+
+    def schedule(self, channel_id: str, interval: float, now: datetime.datetime | None = None) -> None:
+        """
+        Schedules the next poll of a channel.
+
+        Parameters
+        ----------
+        channel_id : str
+            The ID of the YouTube channel.
+        interval : float
+            Seconds until the poll.
+        now : datetime.datetime | None, optional
+            The current time. The default is None, the time of the call.
+
+        Returns
+        -------
+        None
+        """
+        poll_at = (now or datetime.datetime.now(datetime.timezone.utc)) + datetime.timedelta(seconds=interval)
+        self._next[channel_id] = poll_at
+        heapq.heappush(self._heap, (poll_at, channel_id))
+
+
+def _backend(name: str, timeout: float) -> Callable[[str], ChannelUploads]:
+    # 'scrape' reads the channel pages, 'feed' the Atom feeds
+    if name == 'feed':
+        return FeedReader(os.getenv('youtube_feed_url', 'https://www.youtube.com/feeds/videos.xml?channel_id={}'),
+                          timeout).fetch
+    if name == 'scrape':
+        return fetch_uploads
+    raise ValueError(f'Unknown YouTube backend {name!r}, expected scrape or feed')
+
+
+_timeout = float(os.getenv('youtube_fetch_timeout', 30.0))
+youtube_poller = YoutubePoller(_backend(os.getenv('youtube_backend', 'scrape'), _timeout),
+                               int(os.getenv('youtube_concurrency', 8)), _timeout)
+poll_schedule = PollSchedule(int(os.getenv('youtube_min_interval', 300)), int(os.getenv('youtube_max_interval', 3600)))